@@ -0,0 +1,6 @@
+# Shared environment setup imported by every step file.
+# Python caches imported modules, so .env is parsed once per process
+# even when several steps are imported together (batch runs, profiling).
+from dotenv import load_dotenv
+
+load_dotenv()
@@ -0,0 +1,47 @@
+from langchain_google_genai import ChatGoogleGenerativeAI
+import asyncio
+import hashlib
+import os
+import sys
+import config as _env  # noqa: F401  (loads .env once)
+
+# Shared Gemini client for the step scripts
+llm = ChatGoogleGenerativeAI(model="gemini-2.0-flash-exp")
+
+# Retry transient provider errors (429/503) with exponential backoff and jitter
+llm_with_retry = llm.with_retry(wait_exponential_jitter=True, stop_after_attempt=5)
+
+# Bound concurrent LLM calls so batched runs stay under the provider's quota
+_LLM_SEM = asyncio.Semaphore(int(os.getenv("GEMINI_CONCURRENCY", "8")))
+
+async def safe_ainvoke(messages, model=llm_with_retry, config=None):
+    """Call the model under the shared concurrency limit"""
+    async with _LLM_SEM:
+        return await model.ainvoke(messages, config=config)
+
+# Exact-match response cache keyed by prompt hash
+_RESPONSE_CACHE: dict[str, str] = {}
+
+async def cached_ainvoke(prompt: str) -> str:
+    """Return the LLM answer for a prompt, reusing earlier answers to identical prompts"""
+    key = hashlib.sha1(prompt.encode()).hexdigest()
+    if key not in _RESPONSE_CACHE:
+        response = await safe_ainvoke(prompt)
+        _RESPONSE_CACHE[key] = response.content
+    return _RESPONSE_CACHE[key]
+
+# --- Batch CLI ---
+def load_prompts(path: str) -> list[str]:
+    """Read one prompt per non-empty line"""
+    with open(path) as f:
+        return [line.strip() for line in f if line.strip()]
+
+def run_batch_cli(run_batch, output_key: str, label: str = "🤖 Gemini:"):
+    """Handle `--batch prompts.txt`: run every prompt through run_batch, print the answers and exit"""
+    if len(sys.argv) > 2 and sys.argv[1] == "--batch":
+        prompts = load_prompts(sys.argv[2])
+        results = asyncio.run(run_batch(prompts))
+        for prompt, result in zip(prompts, results):
+            print("🧑 You:", prompt)
+            print(label, result[output_key])
+        sys.exit()
@@ -1,8 +1,4 @@
-from dotenv import load_dotenv
-import os
-
-load_dotenv()
-os.environ["GOOGLE_API_KEY"] = os.getenv("GOOGLE_API_KEY")
+import config as _env  # noqa: F401  (loads .env once)
 
 def main():
     print("Hello from langgraph-learning!")
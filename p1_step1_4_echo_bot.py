@@ -1,12 +1,8 @@
 from langgraph.graph import StateGraph
-from langchain_google_genai import ChatGoogleGenerativeAI
-from dotenv import load_dotenv
 from typing import TypedDict
-import os
-
-# Load Gemini API Key
-load_dotenv()
-os.environ["GOOGLE_API_KEY"] = os.getenv("GOOGLE_API_KEY")
+import asyncio
+import config as _env  # noqa: F401  (loads .env once)
+from llm_helpers import cached_ainvoke, run_batch_cli
 
 # Define proper state schema
 class EchoState(TypedDict):
@@ -14,12 +10,10 @@ class EchoState(TypedDict):
     output: str
 
 # Node function
-def echo_node(state: EchoState) -> EchoState:
+async def echo_node(state: EchoState) -> EchoState:
     user_input = state["input"]
-    llm = ChatGoogleGenerativeAI(model="gemini-2.0-flash-exp")
     try:
-        response = llm.invoke(user_input)
-        state["output"] = response.content
+        state["output"] = await cached_ainvoke(user_input)
         return state
     except Exception as e:
         return {"input": user_input, "output": f"❌ Error: {str(e)}"}
@@ -31,13 +25,39 @@ builder.set_entry_point("echo")
 builder.set_finish_point("echo")
 graph = builder.compile()
 
+# --- Streaming CLI helper ---
+async def stream_turn(state: EchoState) -> EchoState:
+    """Print Gemini tokens as they arrive and return the final graph state"""
+    result = state
+    streamed = False
+    print("🤖 Gemini: ", end="", flush=True)
+    async for mode, chunk in graph.astream(state, stream_mode=["messages", "values"]):
+        if mode == "messages":
+            print(chunk[0].content, end="", flush=True)
+            streamed = True
+        else:
+            result = chunk
+    # Cached and error responses never reach the model, so print them whole
+    if not streamed:
+        print(result["output"], end="")
+    print()
+    return result
+
+# --- Batch Driver ---
+async def run_batch(prompts: list[str]) -> list[EchoState]:
+    """Run many prompts through the graph concurrently"""
+    states = [{"input": prompt} for prompt in prompts]
+    return await graph.abatch(states)
+
 # Run
 if __name__ == "__main__":
+    # Batch mode: python p1_step1_4_echo_bot.py --batch prompts.txt
+    run_batch_cli(run_batch, "output")
+
     while True:
         text = input("🧑 You: ")
         if text.lower() in {"exit", "quit"}:
             break
         state = {"input": text}
-        result = graph.invoke(state)
-        # Print the output
-        print("🤖 Gemini:", result["output"])
+        # Stream the output as it is generated
+        asyncio.run(stream_turn(state))
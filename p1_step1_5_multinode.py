@@ -1,12 +1,8 @@
 from langgraph.graph import StateGraph
-from langchain_google_genai import ChatGoogleGenerativeAI
-from dotenv import load_dotenv
 from typing import TypedDict
-import os
-
-# Load Gemini API Key
-load_dotenv()
-os.environ["GOOGLE_API_KEY"] = os.getenv("GOOGLE_API_KEY")
+import asyncio
+import config as _env  # noqa: F401  (loads .env once)
+from llm_helpers import cached_ainvoke, run_batch_cli
 
 # --- State Definition ---
 class MultiNodeState(TypedDict):
@@ -14,23 +10,17 @@ class MultiNodeState(TypedDict):
     raw_response: str
     final_output: str
 
-# --- Node 1: Input Handler ---
-def input_handler(state: MultiNodeState) -> MultiNodeState:
+# --- Node 1: Gemini ---
+async def gemini_node(state: MultiNodeState) -> MultiNodeState:
     # (Here you could clean or validate the input, but we’ll just pass it through)
     print("📦 Preprocessing input...")
-    return state
-
-# --- Node 2: Gemini ---
-def gemini_node(state: MultiNodeState) -> MultiNodeState:
-    llm = ChatGoogleGenerativeAI(model="gemini-2.0-flash-exp")
     try:
-        response = llm.invoke(state["input"])
-        state["raw_response"] = response.content
+        state["raw_response"] = await cached_ainvoke(state["input"])
         return state
     except Exception as e:
         return {"input": state["input"], "raw_response": f"Error: {str(e)}", "final_output": ""}
 
-# --- Node 3: Postprocessor ---
+# --- Node 2: Postprocessor ---
 def postprocessor(state: MultiNodeState) -> MultiNodeState:
     print("🛠️ Postprocessing response...")
     state["final_output"] = state["raw_response"].strip()
@@ -40,21 +30,35 @@ def postprocessor(state: MultiNodeState) -> MultiNodeState:
 builder = StateGraph(MultiNodeState)
 
 # Add nodes
-builder.add_node("input_handler", input_handler)
 builder.add_node("gemini_node", gemini_node)
 builder.add_node("postprocessor", postprocessor)
 
 # Define edges
-builder.set_entry_point("input_handler")
-builder.add_edge("input_handler", "gemini_node")
+builder.set_entry_point("gemini_node")
 builder.add_edge("gemini_node", "postprocessor")
 builder.set_finish_point("postprocessor")
 
 # Compile the graph
 graph = builder.compile()
 
+# --- Batch Driver ---
+async def run_batch(prompts: list[str]) -> list[MultiNodeState]:
+    """Run many prompts through the graph concurrently"""
+    states = [
+        {
+            "input": prompt,
+            "raw_response": "",
+            "final_output": ""
+        }
+        for prompt in prompts
+    ]
+    return await graph.abatch(states)
+
 # --- CLI Loop to Run Agent ---
 if __name__ == "__main__":
+    # Batch mode: python p1_step1_5_multinode.py --batch prompts.txt
+    run_batch_cli(run_batch, "final_output")
+
     while True:
         user_input = input("\n🧑 You: ")
         if user_input.lower() in {"exit", "quit"}:
@@ -66,5 +70,5 @@ if __name__ == "__main__":
             "final_output": ""
         }
 
-        result = graph.invoke(state)
+        result = asyncio.run(graph.ainvoke(state))
         print("🤖 Gemini:", result["final_output"])
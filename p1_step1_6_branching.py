@@ -1,12 +1,8 @@
 from langgraph.graph import StateGraph
-from langchain_google_genai import ChatGoogleGenerativeAI
 from typing import TypedDict, Literal
-from dotenv import load_dotenv
-import os
-
-# Load API key
-load_dotenv()
-os.environ["GOOGLE_API_KEY"] = os.getenv("GOOGLE_API_KEY")
+import asyncio
+import config as _env  # noqa: F401  (loads .env once)
+from llm_helpers import cached_ainvoke, run_batch_cli
 
 # --- State ---
 class BranchState(TypedDict):
@@ -24,11 +20,9 @@ def classify_input(state: BranchState) -> str:
         return "execute_command"
 
 # --- Node A: Answer question using Gemini
-def answer_question(state: BranchState) -> BranchState:
-    llm = ChatGoogleGenerativeAI(model="gemini-2.0-flash-exp")
-    response = llm.invoke(state["input"])
+async def answer_question(state: BranchState) -> BranchState:
     state["type"] = "question"
-    state["result"] = response.content
+    state["result"] = await cached_ainvoke(state["input"])
     return state
 
 # --- Node B: Handle command
@@ -45,14 +39,15 @@ def postprocessor(state: BranchState) -> BranchState:
 # --- Build the Graph ---
 builder = StateGraph(BranchState)
 
-builder.add_node("router", lambda state: state)  # placeholder node
 builder.add_node("answer_question", answer_question)
 builder.add_node("execute_command", execute_command)
 builder.add_node("postprocessor", postprocessor)
 
-# Start at dummy router, which immediately branches
-builder.set_entry_point("router")
-builder.add_conditional_edges("router", classify_input)
+# Branch straight from the entry point, no placeholder router node needed
+builder.set_conditional_entry_point(
+    classify_input,
+    {"answer_question": "answer_question", "execute_command": "execute_command"}
+)
 
 # Merge branches into postprocessor
 builder.add_edge("answer_question", "postprocessor")
@@ -62,8 +57,25 @@ builder.set_finish_point("postprocessor")
 
 graph = builder.compile()
 
+# --- Batch Driver ---
+async def run_batch(prompts: list[str]) -> list[BranchState]:
+    """Run many prompts through the graph concurrently"""
+    states = [
+        {
+            "input": prompt,
+            "type": "command",
+            "result": "",
+            "final_output": ""
+        }
+        for prompt in prompts
+    ]
+    return await graph.abatch(states)
+
 # --- Run the Agent ---
 if __name__ == "__main__":
+    # Batch mode: python p1_step1_6_branching.py --batch prompts.txt
+    run_batch_cli(run_batch, "final_output")
+
     while True:
         text = input("\n🧑 You: ")
         if text.lower() in {"exit", "quit"}:
@@ -76,5 +88,5 @@ if __name__ == "__main__":
             "final_output": ""
         }
 
-        result = graph.invoke(state)
+        result = asyncio.run(graph.ainvoke(state))
         print("🤖 Gemini:", result["final_output"])
@@ -1,12 +1,8 @@
 from langgraph.graph import StateGraph
-from langchain_google_genai import ChatGoogleGenerativeAI
 from typing import TypedDict
-from dotenv import load_dotenv
-import os
-
-# Load Gemini API key
-load_dotenv()
-os.environ["GOOGLE_API_KEY"] = os.getenv("GOOGLE_API_KEY")
+import asyncio
+import config as _env  # noqa: F401  (loads .env once)
+from llm_helpers import cached_ainvoke, run_batch_cli, safe_ainvoke
 
 # --- State Definition ---
 class LoopState(TypedDict):
@@ -15,10 +11,13 @@ class LoopState(TypedDict):
     attempt: int
 
 # --- Node: Generate Gemini Output ---
-def generate_text(state: LoopState) -> LoopState:
-    llm = ChatGoogleGenerativeAI(model="gemini-2.0-flash-exp")
-    response = llm.invoke(state["input"])
-    state["output"] = response.content
+async def generate_text(state: LoopState) -> LoopState:
+    if state["attempt"] == 0:
+        state["output"] = await cached_ainvoke(state["input"])
+    else:
+        # Retries must reach the LLM, a cached answer would just repeat the failure
+        response = await safe_ainvoke(state["input"])
+        state["output"] = response.content
     state["attempt"] += 1
     return state
 
@@ -41,19 +40,24 @@ builder = StateGraph(LoopState)
 builder.add_node("generate_text", generate_text)
 builder.add_node("finish", finish)
 
-# Add a dummy router node
-builder.add_node("router", lambda state: state)
-builder.add_edge("generate_text", "router")
-
-# Conditional edge from router
-builder.add_conditional_edges("router", routing_logic)
+# Conditional edge straight from the generator
+builder.add_conditional_edges("generate_text", routing_logic)
 
 builder.set_entry_point("generate_text")
 builder.set_finish_point("finish")
 
 graph = builder.compile()
 
+# --- Batch Driver ---
+async def run_batch(prompts: list[str]) -> list[LoopState]:
+    """Run many prompts through the graph concurrently"""
+    states = [{"input": prompt, "output": "", "attempt": 0} for prompt in prompts]
+    return await graph.abatch(states)
+
 if __name__ == "__main__":
+    # Batch mode: python p1_step1_7_looping.py --batch prompts.txt
+    run_batch_cli(run_batch, "output", "🤖 Final Output:")
+
     while True:
         text = input("\n🧑 You: ")
         if text.lower() in {"exit", "quit"}:
@@ -65,6 +69,6 @@ if __name__ == "__main__":
             "attempt": 0
         }
 
-        result = graph.invoke(state)
+        result = asyncio.run(graph.ainvoke(state))
         print(f"🌀 Attempts: {result['attempt']}")
         print("🤖 Final Output:", result["output"])
@@ -1,43 +1,104 @@
 from langgraph.graph import StateGraph
-from langchain_google_genai import ChatGoogleGenerativeAI
-from langchain_core.messages import HumanMessage, AIMessage
-from dotenv import load_dotenv
+from langchain_google_genai import GoogleGenerativeAIEmbeddings
+from langchain_core.messages import HumanMessage, AIMessage, SystemMessage
 from typing import TypedDict, List
+from collections import OrderedDict, deque
+import asyncio
+import math
 import os
+import config as _env  # noqa: F401  (loads .env once)
+from llm_helpers import run_batch_cli, safe_ainvoke
 
-# Load Gemini API Key
-load_dotenv()
-os.environ["GOOGLE_API_KEY"] = os.getenv("GOOGLE_API_KEY")
+# Static system prompt kept as a fixed prefix so provider-side prompt caching can reuse it
+SYSTEM_PROMPT = SystemMessage(
+    content="You are a helpful conversational assistant. Use the earlier turns of the conversation to stay consistent and remember what the user told you."
+)
+
+# Semantic response cache: reuse answers to near-identical opening turns.
+# Only the first turn of a conversation is cached, since later turns depend on the history.
+# Entries are grouped by scope; opening turns carry no history, so they share one scope
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.95"))
+SEMANTIC_CACHE_SCOPES = 256
+embeddings = GoogleGenerativeAIEmbeddings(model="models/text-embedding-004")
+_SEMANTIC_CACHE: OrderedDict[str, deque[tuple[list[float], str]]] = OrderedDict()
+
+def _normalize(vector: list[float]) -> list[float]:
+    norm = math.sqrt(sum(x * x for x in vector)) or 1.0
+    return [x / norm for x in vector]
+
+async def semantic_cache_lookup(scope: str, text: str) -> tuple[list[float], str | None]:
+    """Embed text and return the embedding plus a cached answer in this scope if one is similar enough"""
+    vector = _normalize(await embeddings.aembed_query(text))
+    for cached_vector, answer in _SEMANTIC_CACHE.get(scope, ()):
+        if sum(a * b for a, b in zip(vector, cached_vector)) >= SEMANTIC_CACHE_THRESHOLD:
+            return vector, answer
+    return vector, None
+
+def semantic_cache_store(scope: str, vector: list[float], answer: str):
+    entries = _SEMANTIC_CACHE.setdefault(scope, deque(maxlen=32))
+    entries.append((vector, answer))
+    _SEMANTIC_CACHE.move_to_end(scope)
+    if len(_SEMANTIC_CACHE) > SEMANTIC_CACHE_SCOPES:
+        _SEMANTIC_CACHE.popitem(last=False)
+
+# Sliding window: once history exceeds MAX_HISTORY_MESSAGES, older turns are folded into a summary
+MAX_HISTORY_MESSAGES = 20
+KEEP_RECENT_MESSAGES = 10
+
+async def compact_history(messages: list) -> list:
+    """Replace all but the most recent messages with a single summary SystemMessage"""
+    if len(messages) <= MAX_HISTORY_MESSAGES:
+        return messages
+    older, recent = messages[:-KEEP_RECENT_MESSAGES], messages[-KEEP_RECENT_MESSAGES:]
+    transcript = "\n".join(f"{msg.type}: {msg.content}" for msg in older)
+    # Tagged "nostream" so the summary is not streamed to the user as if it were the answer
+    summary = await safe_ainvoke(
+        f"Summarize this conversation in a few sentences, keeping any facts the user shared:\n{transcript}",
+        config={"tags": ["nostream"]}
+    )
+    return [SystemMessage(content=f"Summary of earlier conversation: {summary.content}"), *recent]
 
 # Define state schema with conversation history
 class ConversationState(TypedDict):
-    messages: List[HumanMessage | AIMessage]
+    messages: List[HumanMessage | AIMessage | SystemMessage]
     current_input: str
     response: str
 
 # Node function with memory
-def conversation_node(state: ConversationState) -> ConversationState:
+async def conversation_node(state: ConversationState) -> ConversationState:
     current_input = state["current_input"]
     messages = state.get("messages", [])
     
     # Add current input to message history
+    first_turn = not messages
     messages.append(HumanMessage(content=current_input))
     
-    # Initialize LLM
-    llm = ChatGoogleGenerativeAI(model="gemini-2.0-flash-exp")
-    
     try:
-        # Pass full conversation history to LLM
-        response = llm.invoke(messages)
+        # Keep the history bounded before sending it upstream
+        messages = await compact_history(messages)
+        
+        # On an opening turn, reuse a cached answer for near-identical input;
+        # otherwise ask the LLM with full history. An opening turn has no history and
+        # carries nothing user-specific, so all conversations share one cache scope
+        vector = cached_answer = None
+        if first_turn:
+            vector, cached_answer = await semantic_cache_lookup("default", current_input)
+        if cached_answer is not None:
+            content = cached_answer
+        else:
+            response = await safe_ainvoke([SYSTEM_PROMPT, *messages])
+            content = response.content
+            if first_turn:
+                semantic_cache_store("default", vector, content)
         
         # Add AI response to message history
-        messages.append(AIMessage(content=response.content))
+        messages.append(AIMessage(content=content))
         
         # Update state
         return {
             "messages": messages,
             "current_input": current_input,
-            "response": response.content
+            "response": content
         }
     except Exception as e:
         error_msg = f"❌ Error: {str(e)}"
@@ -54,8 +115,45 @@ builder.set_entry_point("conversation")
 builder.set_finish_point("conversation")
 graph = builder.compile()
 
+# Display labels for the history command
+_ROLE = {HumanMessage: "🧑 Human", AIMessage: "🤖 AI", SystemMessage: "📝 Summary"}
+
+# --- Streaming CLI helper ---
+async def stream_turn(state: ConversationState) -> ConversationState:
+    """Print Gemini tokens as they arrive and return the final graph state"""
+    result = state
+    streamed = False
+    print("🤖 Gemini: ", end="", flush=True)
+    async for mode, chunk in graph.astream(state, stream_mode=["messages", "values"]):
+        if mode == "messages":
+            print(chunk[0].content, end="", flush=True)
+            streamed = True
+        else:
+            result = chunk
+    # Cached and error responses never reach the model, so print them whole
+    if not streamed:
+        print(result["response"], end="")
+    print()
+    return result
+
+# --- Batch Driver ---
+async def run_batch(prompts: list[str]) -> list[ConversationState]:
+    """Run many prompts through the graph concurrently"""
+    states = [
+        {
+            "messages": [],
+            "current_input": prompt,
+            "response": ""
+        }
+        for prompt in prompts
+    ]
+    return await graph.abatch(states)
+
 # Run with persistent memory
 if __name__ == "__main__":
+    # Batch mode: python p2_step2_1_memory_enabled_echo_bot.py --batch prompts.txt
+    run_batch_cli(run_batch, "response")
+
     print("🧠 Memory-Enabled Conversational Agent")
     print("Type 'history' to see conversation history")
     print("Type 'clear' to clear conversation history")
@@ -80,20 +178,16 @@ if __name__ == "__main__":
         elif user_input.lower() == "history":
             print("\n📜 Conversation History:")
             for i, msg in enumerate(persistent_state["messages"], 1):
-                role = "🧑 Human" if isinstance(msg, HumanMessage) else "🤖 AI"
-                print(f"{i}. {role}: {msg.content}")
+                print(f"{i}. {_ROLE.get(type(msg), '?')}: {msg.content}")
             print()
             continue
         
         # Update state with new input
         persistent_state["current_input"] = user_input
         
-        # Process through graph
-        result = graph.invoke(persistent_state)
+        # Process through graph, streaming the response as it is generated
+        result = asyncio.run(stream_turn(persistent_state))
         
         # Update persistent state with result
         persistent_state = result
-        
-        # Print response
-        print("🤖 Gemini:", result["response"])
         print(f"💾 Memory: {len(result['messages'])} messages stored\n")
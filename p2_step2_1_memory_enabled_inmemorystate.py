@@ -1,14 +1,63 @@
 from langgraph.graph import StateGraph
 from langgraph.store.memory import InMemoryStore
-from langchain_google_genai import ChatGoogleGenerativeAI
-from langchain_core.messages import HumanMessage, AIMessage
-from dotenv import load_dotenv
+from langchain_google_genai import GoogleGenerativeAIEmbeddings
+from langchain_core.messages import HumanMessage, AIMessage, SystemMessage
 from typing import TypedDict, List
+from collections import OrderedDict, deque
+import asyncio
+import math
 import os
+import config as _env  # noqa: F401  (loads .env once)
+from llm_helpers import run_batch_cli, safe_ainvoke
 
-# Load Gemini API Key
-load_dotenv()
-os.environ["GOOGLE_API_KEY"] = os.getenv("GOOGLE_API_KEY")
+# Static system prompt kept as a fixed prefix so provider-side prompt caching can reuse it
+SYSTEM_PROMPT = SystemMessage(
+    content="You are a helpful conversational assistant. Use the earlier turns of the conversation to stay consistent and remember what the user told you."
+)
+
+# Semantic response cache: reuse answers to near-identical opening turns.
+# Only the first turn of a conversation is cached, since later turns depend on the history.
+# Entries are grouped by scope; opening turns carry no history, so they share one scope
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.95"))
+SEMANTIC_CACHE_SCOPES = 256
+embeddings = GoogleGenerativeAIEmbeddings(model="models/text-embedding-004")
+_SEMANTIC_CACHE: OrderedDict[str, deque[tuple[list[float], str]]] = OrderedDict()
+
+def _normalize(vector: list[float]) -> list[float]:
+    norm = math.sqrt(sum(x * x for x in vector)) or 1.0
+    return [x / norm for x in vector]
+
+async def semantic_cache_lookup(scope: str, text: str) -> tuple[list[float], str | None]:
+    """Embed text and return the embedding plus a cached answer in this scope if one is similar enough"""
+    vector = _normalize(await embeddings.aembed_query(text))
+    for cached_vector, answer in _SEMANTIC_CACHE.get(scope, ()):
+        if sum(a * b for a, b in zip(vector, cached_vector)) >= SEMANTIC_CACHE_THRESHOLD:
+            return vector, answer
+    return vector, None
+
+def semantic_cache_store(scope: str, vector: list[float], answer: str):
+    entries = _SEMANTIC_CACHE.setdefault(scope, deque(maxlen=32))
+    entries.append((vector, answer))
+    _SEMANTIC_CACHE.move_to_end(scope)
+    if len(_SEMANTIC_CACHE) > SEMANTIC_CACHE_SCOPES:
+        _SEMANTIC_CACHE.popitem(last=False)
+
+# Sliding window: once history exceeds MAX_HISTORY_MESSAGES, older turns are folded into a summary
+MAX_HISTORY_MESSAGES = 20
+KEEP_RECENT_MESSAGES = 10
+
+async def compact_history(messages: list) -> list:
+    """Replace all but the most recent messages with a single summary SystemMessage"""
+    if len(messages) <= MAX_HISTORY_MESSAGES:
+        return messages
+    older, recent = messages[:-KEEP_RECENT_MESSAGES], messages[-KEEP_RECENT_MESSAGES:]
+    transcript = "\n".join(f"{msg.type}: {msg.content}" for msg in older)
+    # Tagged "nostream" so the summary is not streamed to the user as if it were the answer
+    summary = await safe_ainvoke(
+        f"Summarize this conversation in a few sentences, keeping any facts the user shared:\n{transcript}",
+        config={"tags": ["nostream"]}
+    )
+    return [SystemMessage(content=f"Summary of earlier conversation: {summary.content}"), *recent]
 
 # Define state schema
 class ConversationState(TypedDict):
@@ -20,13 +69,10 @@ class ConversationState(TypedDict):
 store = InMemoryStore()
 
 # Node function with InMemoryStore
-def conversation_node(state: ConversationState) -> ConversationState:
+async def conversation_node(state: ConversationState) -> ConversationState:
     current_input = state["current_input"]
     user_id = state["user_id"]
     
-    # Initialize LLM
-    llm = ChatGoogleGenerativeAI(model="gemini-2.0-flash-exp")
-    
     try:
         # Get conversation history from store
         namespace = "messages"
@@ -39,24 +85,41 @@ def conversation_node(state: ConversationState) -> ConversationState:
             messages = stored_item.value if stored_item else []
         except Exception:
             # If key doesn't exist, start with empty list
+            stored_item = None
             messages = []
         
         # Add current input to message history
+        first_turn = not messages
         messages.append(HumanMessage(content=current_input))
         
-        # Pass full conversation history to LLM
-        response = llm.invoke(messages)
+        # Keep the history bounded before sending it upstream
+        messages = await compact_history(messages)
+        
+        # On an opening turn, reuse a cached answer for near-identical input;
+        # otherwise ask the LLM with full history. Each user has one opening turn, so a per-user
+        # scope would never hit; the opening turn carries nothing user-specific, so all users share one
+        vector = cached_answer = None
+        if first_turn:
+            vector, cached_answer = await semantic_cache_lookup("default", current_input)
+        if cached_answer is not None:
+            content = cached_answer
+        else:
+            response = await safe_ainvoke([SYSTEM_PROMPT, *messages])
+            content = response.content
+            if first_turn:
+                semantic_cache_store("default", vector, content)
         
         # Add AI response to message history
-        messages.append(AIMessage(content=response.content))
+        messages.append(AIMessage(content=content))
         
-        # Store updated conversation history
-        store.put(namespace, memory_key, messages)
+        # The store already holds this list by reference; only put when it is new or was compacted
+        if stored_item is None or stored_item.value is not messages:
+            store.put(namespace, memory_key, messages)
         
         # Update state
         return {
             "current_input": current_input,
-            "response": response.content,
+            "response": content,
             "user_id": user_id
         }
     except Exception as e:
@@ -77,6 +140,8 @@ builder.set_finish_point("conversation")
 graph = builder.compile(store=store)
 
 # Utility functions for memory management
+_ROLE = {HumanMessage: "🧑 Human", AIMessage: "🤖 AI", SystemMessage: "📝 Summary"}
+
 def show_conversation_history(user_id: str):
     """Display conversation history for a user"""
     namespace = "messages"
@@ -94,8 +159,7 @@ def show_conversation_history(user_id: str):
     
     print("\n📜 Conversation History:")
     for i, msg in enumerate(messages, 1):
-        role = "🧑 Human" if isinstance(msg, HumanMessage) else "🤖 AI"
-        print(f"{i}. {role}: {msg.content}")
+        print(f"{i}. {_ROLE.get(type(msg), '?')}: {msg.content}")
     print()
 
 def clear_conversation_history(user_id: str):
@@ -117,8 +181,43 @@ def get_message_count(user_id: str) -> int:
     except Exception:
         return 0
 
+# --- Streaming CLI helper ---
+async def stream_turn(state: ConversationState) -> ConversationState:
+    """Print Gemini tokens as they arrive and return the final graph state"""
+    result = state
+    streamed = False
+    print("🤖 Gemini: ", end="", flush=True)
+    async for mode, chunk in graph.astream(state, stream_mode=["messages", "values"]):
+        if mode == "messages":
+            print(chunk[0].content, end="", flush=True)
+            streamed = True
+        else:
+            result = chunk
+    # Cached and error responses never reach the model, so print them whole
+    if not streamed:
+        print(result["response"], end="")
+    print()
+    return result
+
+# --- Batch Driver ---
+async def run_batch(prompts: list[str]) -> list[ConversationState]:
+    """Run many prompts through the graph concurrently"""
+    # Each prompt gets its own user id so batched conversations don't share history
+    states = [
+        {
+            "current_input": prompt,
+            "response": "",
+            "user_id": f"batch_{i}"
+        }
+        for i, prompt in enumerate(prompts)
+    ]
+    return await graph.abatch(states)
+
 # Run with InMemoryStore
 if __name__ == "__main__":
+    # Batch mode: python p2_step2_1_memory_enabled_inmemorystate.py --batch prompts.txt
+    run_batch_cli(run_batch, "response")
+
     print("🧠 LangGraph InMemoryStore Conversational Agent")
     print("Commands:")
     print("  'history' - Show conversation history")
@@ -156,11 +255,8 @@ if __name__ == "__main__":
             "user_id": user_id
         }
         
-        # Process through graph
-        result = graph.invoke(state)
-        
-        # Print response
-        print("🤖 Gemini:", result["response"])
+        # Process through graph, streaming the response as it is generated
+        asyncio.run(stream_turn(state))
         
         # Show memory info
         message_count = get_message_count(user_id)
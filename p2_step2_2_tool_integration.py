@@ -1,18 +1,37 @@
-from langgraph.graph import StateGraph
+from langgraph.graph import StateGraph, END
 from langgraph.store.memory import InMemoryStore
 from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain_core.messages import HumanMessage, AIMessage, ToolMessage
 from langchain_core.tools import tool
-from dotenv import load_dotenv
+from langchain_core.utils.function_calling import convert_to_openai_tool
 from typing import TypedDict, List, Literal
-import os
+from functools import lru_cache
+import asyncio
 import math
+import re
 import datetime
 import random
+import config as _env  # noqa: F401  (loads .env once)
+from llm_helpers import run_batch_cli, safe_ainvoke
 
-# Load Gemini API Key
-load_dotenv()
-os.environ["GOOGLE_API_KEY"] = os.getenv("GOOGLE_API_KEY")
+# Names available to calculator expressions, built once at import
+_CALC_ENV = {k: v for k, v in math.__dict__.items() if not k.startswith("__")}
+_CALC_ENV.update({"abs": abs, "round": round, "min": min, "max": max})
+
+# Cache compiled calculator expressions so repeated inputs skip parsing
+@lru_cache(maxsize=512)
+def _compile_expression(expression: str):
+    return compile(expression, "<calc>", "eval")
+
+# Simulated search results, matched with one precompiled alternation
+SEARCH_RESULTS = {
+    "weather": "Today's weather: Sunny, 25°C with light breeze",
+    "news": "Latest news: Technology sector shows growth in Q4",
+    "python": "Python is a high-level programming language known for simplicity",
+    "ai": "AI developments continue to advance with new LLM models",
+    "stock": "Stock market: Mixed performance with tech stocks leading",
+}
+_SEARCH_KEY_RE = re.compile("|".join(map(re.escape, SEARCH_RESULTS)))
 
 # Define Tools
 @tool
@@ -24,12 +43,7 @@ def calculator(expression: str) -> str:
     """
     try:
         # Safe evaluation with math functions
-        allowed_names = {
-            k: v for k, v in math.__dict__.items() if not k.startswith("__")
-        }
-        allowed_names.update({"abs": abs, "round": round, "min": min, "max": max})
-        
-        result = eval(expression, {"__builtins__": {}}, allowed_names)
+        result = eval(_compile_expression(expression), {"__builtins__": {}}, _CALC_ENV)
         return f"Result: {result}"
     except Exception as e:
         return f"Error in calculation: {str(e)}"
@@ -46,20 +60,10 @@ def web_search_simulator(query: str) -> str:
     Simulate a web search (for demonstration purposes).
     In a real implementation, this would call actual search APIs.
     """
-    # Simulated search results
-    search_results = {
-        "weather": "Today's weather: Sunny, 25°C with light breeze",
-        "news": "Latest news: Technology sector shows growth in Q4",
-        "python": "Python is a high-level programming language known for simplicity",
-        "ai": "AI developments continue to advance with new LLM models",
-        "stock": "Stock market: Mixed performance with tech stocks leading",
-    }
-    
-    # Find relevant result
-    query_lower = query.lower()
-    for key, result in search_results.items():
-        if key in query_lower:
-            return f"Search result for '{query}': {result}"
+    # Find relevant result in a single pass over the query
+    match = _SEARCH_KEY_RE.search(query.lower())
+    if match:
+        return f"Search result for '{query}': {SEARCH_RESULTS[match.group(0)]}"
     
     return f"Search result for '{query}': No specific information found in simulation"
 
@@ -74,16 +78,29 @@ class ToolAgentState(TypedDict):
 # Initialize store and tools
 store = InMemoryStore()
 tools = [calculator, get_current_time, web_search_simulator]
+TOOL_REGISTRY = {t.name: t for t in tools}
+# Tool JSON schemas are generated once and reused for binding
+_TOOL_SPECS = [convert_to_openai_tool(t) for t in tools]
 
 # Create LLM with tools
 llm = ChatGoogleGenerativeAI(
     model="gemini-2.0-flash-exp",
     temperature=0.1
 )
-llm_with_tools = llm.bind_tools(tools)
+
+# Retry transient provider errors (429/503) with exponential backoff and jitter
+llm_with_retry = llm.with_retry(wait_exponential_jitter=True, stop_after_attempt=5)
+llm_with_tools = llm.bind_tools(_TOOL_SPECS).with_retry(wait_exponential_jitter=True, stop_after_attempt=5)
+
+async def run_tool(tool_name: str, tool_args: dict) -> str:
+    """Run a registered tool in a worker thread so independent calls overlap"""
+    tool_fn = TOOL_REGISTRY.get(tool_name)
+    if tool_fn is None:
+        return f"Unknown tool: {tool_name}"
+    return await asyncio.to_thread(tool_fn.invoke, tool_args)
 
 # Tool execution node
-def tool_execution_node(state: ToolAgentState) -> ToolAgentState:
+async def tool_execution_node(state: ToolAgentState) -> ToolAgentState:
     """Execute any tool calls made by the LLM"""
     messages = state["messages"]
     tool_calls_made = []
@@ -92,28 +109,19 @@ def tool_execution_node(state: ToolAgentState) -> ToolAgentState:
     last_message = messages[-1]
     
     if hasattr(last_message, 'tool_calls') and last_message.tool_calls:
-        for tool_call in last_message.tool_calls:
-            # Find and execute the tool
-            tool_name = tool_call["name"]
-            tool_args = tool_call["args"]
-            
-            # Execute the appropriate tool
-            if tool_name == "calculator":
-                result = calculator.invoke(tool_args)
-            elif tool_name == "get_current_time":
-                result = get_current_time.invoke(tool_args)
-            elif tool_name == "web_search_simulator":
-                result = web_search_simulator.invoke(tool_args)
-            else:
-                result = f"Unknown tool: {tool_name}"
-            
+        # Run all requested tools concurrently; results come back in call order
+        results = await asyncio.gather(
+            *(run_tool(tool_call["name"], tool_call["args"]) for tool_call in last_message.tool_calls)
+        )
+        
+        for tool_call, result in zip(last_message.tool_calls, results):
             # Add tool result to messages
             tool_message = ToolMessage(
                 content=result,
                 tool_call_id=tool_call["id"]
             )
             messages.append(tool_message)
-            tool_calls_made.append(f"{tool_name}({tool_args})")
+            tool_calls_made.append(f"{tool_call['name']}({tool_call['args']})")
     
     return {
         "messages": messages,
@@ -124,7 +132,7 @@ def tool_execution_node(state: ToolAgentState) -> ToolAgentState:
     }
 
 # Main conversation node
-def conversation_node(state: ToolAgentState) -> ToolAgentState:
+async def conversation_node(state: ToolAgentState) -> ToolAgentState:
     """Main conversation node with tool calling capability"""
     current_input = state["current_input"]
     user_id = state["user_id"]
@@ -141,11 +149,12 @@ def conversation_node(state: ToolAgentState) -> ToolAgentState:
         messages.append(HumanMessage(content=current_input))
         
         # Get LLM response (may include tool calls)
-        response = llm_with_tools.invoke(messages)
+        response = await safe_ainvoke(messages, llm_with_tools)
         messages.append(response)
         
-        # Store updated conversation history
-        store.put(namespace, memory_key, messages)
+        # The store already holds this list by reference; only put a new history
+        if stored_item is None:
+            store.put(namespace, memory_key, messages)
         
         return {
             "messages": messages,
@@ -164,7 +173,7 @@ def conversation_node(state: ToolAgentState) -> ToolAgentState:
         }
 
 # Final response node
-def final_response_node(state: ToolAgentState) -> ToolAgentState:
+async def final_response_node(state: ToolAgentState) -> ToolAgentState:
     """Generate final response after tool execution"""
     messages = state["messages"]
     user_id = state["user_id"]
@@ -172,13 +181,15 @@ def final_response_node(state: ToolAgentState) -> ToolAgentState:
     try:
         # If tools were called, get final response from LLM
         if state["tool_calls_made"]:
-            final_response = llm.invoke(messages)
+            final_response = await safe_ainvoke(messages, llm_with_retry)
             messages.append(final_response)
             
-            # Store updated conversation
+            # Store updated conversation unless the store already holds this list
             namespace = "messages"
             memory_key = f"conversation_{user_id}"
-            store.put(namespace, memory_key, messages)
+            stored_item = store.get(namespace, memory_key)
+            if stored_item is None or stored_item.value is not messages:
+                store.put(namespace, memory_key, messages)
             
             return {
                 "messages": messages,
@@ -200,12 +211,12 @@ def final_response_node(state: ToolAgentState) -> ToolAgentState:
         }
 
 # Conditional edge function
-def should_use_tools(state: ToolAgentState) -> Literal["tools", "final"]:
-    """Determine if we need to execute tools"""
+def should_use_tools(state: ToolAgentState) -> Literal["tools", "end"]:
+    """Determine if we need to execute tools; without tool calls the turn is already answered"""
     messages = state["messages"]
     if messages and hasattr(messages[-1], 'tool_calls') and messages[-1].tool_calls:
         return "tools"
-    return "final"
+    return "end"
 
 # Build the graph
 builder = StateGraph(ToolAgentState)
@@ -220,7 +231,7 @@ builder.set_entry_point("conversation")
 builder.add_conditional_edges(
     "conversation",
     should_use_tools,
-    {"tools": "tools", "final": "final"}
+    {"tools": "tools", "end": END}
 )
 builder.add_edge("tools", "final")
 builder.set_finish_point("final")
@@ -229,6 +240,8 @@ builder.set_finish_point("final")
 graph = builder.compile(store=store)
 
 # Utility functions
+_ROLE = {HumanMessage: "🧑 Human", AIMessage: "🤖 AI", ToolMessage: "🔧 Tool"}
+
 def show_conversation_history(user_id: str):
     """Display conversation history"""
     namespace = "messages"
@@ -246,12 +259,7 @@ def show_conversation_history(user_id: str):
     
     print("\n📜 Conversation History:")
     for i, msg in enumerate(messages, 1):
-        if isinstance(msg, HumanMessage):
-            print(f"{i}. 🧑 Human: {msg.content}")
-        elif isinstance(msg, AIMessage):
-            print(f"{i}. 🤖 AI: {msg.content}")
-        elif isinstance(msg, ToolMessage):
-            print(f"{i}. 🔧 Tool: {msg.content}")
+        print(f"{i}. {_ROLE.get(type(msg), '?')}: {msg.content}")
     print()
 
 def clear_conversation_history(user_id: str):
@@ -261,8 +269,27 @@ def clear_conversation_history(user_id: str):
     store.put(namespace, memory_key, [])
     print("🧹 Conversation history cleared!")
 
+# --- Batch Driver ---
+async def run_batch(prompts: list[str]) -> list[ToolAgentState]:
+    """Run many prompts through the graph concurrently"""
+    # Each prompt gets its own user id so batched conversations don't share history
+    states = [
+        {
+            "messages": [],
+            "current_input": prompt,
+            "response": "",
+            "user_id": f"batch_{i}",
+            "tool_calls_made": []
+        }
+        for i, prompt in enumerate(prompts)
+    ]
+    return await graph.abatch(states)
+
 # Main execution
 if __name__ == "__main__":
+    # Batch mode: python p2_step2_2_tool_integration.py --batch prompts.txt
+    run_batch_cli(run_batch, "response")
+
     print("🔧 Multi-Tool Agent with Memory")
     print("Available tools:")
     print("  🧮 Calculator - Perform mathematical calculations")
@@ -303,7 +330,7 @@ if __name__ == "__main__":
         }
         
         # Process through graph
-        result = graph.invoke(state)
+        result = asyncio.run(graph.ainvoke(state))
         
         # Print response
         print("🤖 Gemini:", result["response"])
@@ -3,15 +3,19 @@ from langgraph.store.memory import InMemoryStore
 from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain_core.messages import HumanMessage, AIMessage
 from langchain_core.tools import tool
-from dotenv import load_dotenv
+from pydantic import BaseModel, Field
 from typing import TypedDict, List, Literal
-import os
+from functools import lru_cache
+from collections import OrderedDict, deque
+from types import MappingProxyType
+import ast
+import asyncio
+import math
 import re
-import json
-
-# Load Gemini API Key
-load_dotenv()
-os.environ["GOOGLE_API_KEY"] = os.getenv("GOOGLE_API_KEY")
+import sys
+import time
+import config as _env  # noqa: F401  (loads .env once)
+from llm_helpers import load_prompts
 
 # Define state schema
 class SmartAgentState(TypedDict):
@@ -27,71 +31,205 @@ class SmartAgentState(TypedDict):
 store = InMemoryStore()
 llm = ChatGoogleGenerativeAI(model="gemini-2.0-flash-exp", temperature=0.1)
 
+class _CachedStore:
+    """Read-through cache over a store; a put drops the cached entry for that key.
+    Entries expire after ttl seconds and the least recently used are evicted past maxsize,
+    so reads from a shared backend are at most ttl seconds stale."""
+    
+    def __init__(self, backend, maxsize: int = 1024, ttl: float = 30.0):
+        self.backend = backend
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._items: OrderedDict[tuple[str, str], tuple[float, object]] = OrderedDict()
+    
+    def get(self, namespace: str, key: str):
+        cache_key = (namespace, key)
+        now = time.monotonic()
+        entry = self._items.get(cache_key)
+        if entry is not None and now - entry[0] < self.ttl:
+            self._items.move_to_end(cache_key)
+            return entry[1]
+        item = self.backend.get(namespace, key)
+        self._items[cache_key] = (now, item)
+        self._items.move_to_end(cache_key)
+        if len(self._items) > self.maxsize:
+            self._items.popitem(last=False)
+        return item
+    
+    def put(self, namespace: str, key: str, value):
+        self._items.pop((namespace, key), None)
+        self.backend.put(namespace, key, value)
+
+# Handlers read and write through this so repeated lookups skip the backing store
+cached_store = _CachedStore(store)
+
+async def _llm_acall(prompt: str) -> str:
+    """Async single-prompt LLM call, for nodes that overlap it with other work"""
+    return (await llm.ainvoke(prompt)).content
+
+# Structured outputs, parsed by the model's function calling instead of regex + json.loads
+class IntentOut(BaseModel):
+    intent: Literal["MATH", "WEATHER", "PERSONAL", "CREATIVE", "HELP", "GENERAL"]
+    confidence: float = Field(description="Confidence between 0 and 1")
+    reasoning: str = Field(description="Brief explanation")
+
+class PersonalAction(BaseModel):
+    action: Literal["STORE", "RETRIEVE"]
+    key: str = Field(default="general", description="name/preference/etc")
+    value: str = Field(default="", description="The value, if storing")
+
+_classifier_llm = llm.with_structured_output(IntentOut)
+_personal_llm = llm.with_structured_output(PersonalAction)
+
+# Precompiled patterns used by the handler nodes
+_MATH_EXPR_RE = re.compile(r"[\d+\-*/().\s]+")
+# A greeting only short-circuits when it is the whole input ("hello, my name is Alice" is not one)
+_GREETING_RE = re.compile(r"^\s*(hi|hello|hey|thanks|info|clear)\W*$")
+
+# Keyword rules for structurally obvious inputs; first match wins, anything else goes to the LLM.
+# HELP is checked before CREATIVE ("how do i write a cover letter" is a how-to), and CREATIVE
+# matches creative forms rather than the bare verb "write"
+_FAST_RULES = [
+    (re.compile(r"\b(calculate|compute)\b|\d+\s*[+\-*/]"), "MATH"),
+    (re.compile(r"\b(weather|temperature|forecast)\b"), "WEATHER"),
+    (re.compile(r"\bmy (name|favorite)\b|\bremember\b"), "PERSONAL"),
+    (re.compile(r"\bhow (do|to|can) i\b"), "HELP"),
+    (re.compile(r"\b(stor(y|ies)|poems?|haikus?)\b"), "CREATIVE"),
+]
+
+# Names available to calculator expressions, built once at import
+_MATH_NAMES = {k: v for k, v in math.__dict__.items() if not k.startswith("__")}
+_MATH_NAMES.update({"abs": abs, "round": round, "min": min, "max": max})
+
+# Only plain arithmetic and calls to the names above are allowed in expressions
+_ALLOWED_MATH_NODES = (
+    ast.Expression, ast.BinOp, ast.UnaryOp, ast.Constant, ast.Call, ast.Name, ast.Load,
+    ast.Add, ast.Sub, ast.Mult, ast.Div, ast.FloorDiv, ast.Pow, ast.Mod, ast.USub, ast.UAdd
+)
+
+@lru_cache(maxsize=512)
+def _compile_math(expression: str):
+    """Parse, validate and compile an expression once; repeats are a cache hit"""
+    tree = ast.parse(expression.strip(), mode="eval")
+    for node in ast.walk(tree):
+        if not isinstance(node, _ALLOWED_MATH_NODES):
+            raise ValueError(f"Unsupported syntax: {type(node).__name__}")
+        if isinstance(node, ast.Name) and node.id not in _MATH_NAMES:
+            raise ValueError(f"Unknown name: {node.id}")
+        if isinstance(node, ast.Call) and not isinstance(node.func, ast.Name):
+            raise ValueError("Only direct calls to math functions are allowed")
+    return compile(tree, "<math>", "eval")
+
 # Intent Classification Tools
 @tool
 def math_calculator(expression: str) -> str:
     """Perform mathematical calculations"""
     try:
-        import math
-        allowed_names = {
-            k: v for k, v in math.__dict__.items() if not k.startswith("__")
-        }
-        allowed_names.update({"abs": abs, "round": round, "min": min, "max": max})
-        result = eval(expression, {"__builtins__": {}}, allowed_names)
+        result = eval(_compile_math(expression), {"__builtins__": {}}, _MATH_NAMES)
         return f"Calculation result: {result}"
     except Exception as e:
         return f"Math error: {str(e)}"
 
+# Simulated weather table keyed by lowercased city, plus one alternation for substring lookups
+_WEATHER_DATA = {
+    "new york": "New York: 22°C, Partly cloudy with light rain expected",
+    "london": "London: 15°C, Overcast with occasional drizzle",
+    "tokyo": "Tokyo: 28°C, Sunny with high humidity",
+    "sydney": "Sydney: 25°C, Clear skies with gentle breeze"
+}
+_WEATHER_CITY_RE = re.compile(r"\b(" + "|".join(map(re.escape, _WEATHER_DATA)) + r")\b")
+
 @tool
 def get_weather_info(location: str) -> str:
     """Get weather information (simulated)"""
-    weather_data = {
-        "new york": "New York: 22°C, Partly cloudy with light rain expected",
-        "london": "London: 15°C, Overcast with occasional drizzle",
-        "tokyo": "Tokyo: 28°C, Sunny with high humidity",
-        "sydney": "Sydney: 25°C, Clear skies with gentle breeze"
-    }
-    location_lower = location.lower()
-    for city, weather in weather_data.items():
-        if city in location_lower:
-            return weather
+    location_lower = location.lower().strip()
+    if location_lower in _WEATHER_DATA:
+        return _WEATHER_DATA[location_lower]
+    match = _WEATHER_CITY_RE.search(location_lower)
+    if match:
+        return _WEATHER_DATA[match.group(1)]
     return f"Weather info for {location}: Not available in simulation"
 
+# Prompt templates, defined once; each turn only fills in the placeholders
+_CLASSIFICATION_PROMPT = """\
+Analyze the user's input and classify it into one of these categories:
+
+1. MATH - Mathematical calculations, arithmetic, algebra
+2. WEATHER - Weather queries, climate information
+3. PERSONAL - Personal information, preferences, memory-related
+4. GENERAL - General conversation, questions, chitchat
+5. CREATIVE - Creative writing, stories, poems
+6. HELP - Help requests, instructions, how-to questions
+
+User input: "{inp}"
+"""
+
+_MATH_PROMPT = """\
+Extract and solve the mathematical expression from: "{inp}"
+If it's a word problem, convert it to a mathematical expression first.
+Provide the calculation and result.
+"""
+
+_LOCATION_PROMPT = """\
+Extract the location from this weather query: "{inp}"
+If no specific location is mentioned, assume "current location".
+Respond with just the location name.
+"""
+
+_ANALYSIS_PROMPT = """\
+Analyze if the user is:
+1. STORING personal information (telling me about themselves)
+2. RETRIEVING personal information (asking about what I know about them)
+
+User input: "{inp}"
+Current stored info: {info}
+"""
+
+_CREATIVE_PROMPT = """\
+The user is asking for creative content: "{inp}"
+
+Provide a creative response - this could be:
+- A short story or poem
+- Creative writing
+- Imaginative scenarios
+- Artistic descriptions
+
+Be creative and engaging!
+"""
+
+_HELP_PROMPT = """\
+The user is asking for help: "{inp}"
+
+Provide helpful, step-by-step instructions or guidance.
+Be practical and actionable.
+"""
+
+# Intent Classification
+@lru_cache(maxsize=1024)
+def _classify(text: str) -> tuple[str, float, str]:
+    """Classify normalized input; repeated inputs are answered from the cache"""
+    # Bare greetings and short commands never need the LLM
+    if _GREETING_RE.match(text):
+        return "GENERAL", 0.95, "greeting"
+    for pattern, intent in _FAST_RULES:
+        if pattern.search(text):
+            return intent, 0.9, "keyword match"
+    
+    # Intent classification prompt
+    classification_prompt = _CLASSIFICATION_PROMPT.format_map({"inp": text})
+    
+    result = _classifier_llm.invoke(classification_prompt)
+    if result is None:
+        return "GENERAL", 0.5, "Failed to parse classification"
+    return result.intent, result.confidence, result.reasoning
+
 # Intent Classification Node
 def intent_classifier_node(state: SmartAgentState) -> SmartAgentState:
     """Classify user intent using LLM"""
     current_input = state["current_input"]
     
-    # Intent classification prompt
-    classification_prompt = f"""
-    Analyze the user's input and classify it into one of these categories:
-    
-    1. MATH - Mathematical calculations, arithmetic, algebra
-    2. WEATHER - Weather queries, climate information
-    3. PERSONAL - Personal information, preferences, memory-related
-    4. GENERAL - General conversation, questions, chitchat
-    5. CREATIVE - Creative writing, stories, poems
-    6. HELP - Help requests, instructions, how-to questions
-    
-    User input: "{current_input}"
-    
-    Respond with ONLY a JSON object in this format:
-    {{"intent": "CATEGORY", "confidence": 0.85, "reasoning": "brief explanation"}}
-    """
-    
     try:
-        response = llm.invoke(classification_prompt)
-        # Extract JSON from response
-        json_match = re.search(r'\{.*\}', response.content, re.DOTALL)
-        if json_match:
-            classification = json.loads(json_match.group())
-            intent = classification.get("intent", "GENERAL")
-            confidence = classification.get("confidence", 0.5)
-            reasoning = classification.get("reasoning", "Default classification")
-        else:
-            intent = "GENERAL"
-            confidence = 0.5
-            reasoning = "Failed to parse classification"
+        intent, confidence, reasoning = _classify(current_input.lower().strip())
         
         return {
             "current_input": current_input,
@@ -114,89 +252,59 @@ def intent_classifier_node(state: SmartAgentState) -> SmartAgentState:
         }
 
 # Specialized Handler Nodes
-def math_handler_node(state: SmartAgentState) -> SmartAgentState:
+async def math_handler_node(state: SmartAgentState) -> SmartAgentState:
     """Handle mathematical queries"""
     current_input = state["current_input"]
-    user_id = state["user_id"]
     
     try:
         # Extract mathematical expression
-        math_prompt = f"""
-        Extract and solve the mathematical expression from: "{current_input}"
-        If it's a word problem, convert it to a mathematical expression first.
-        Provide the calculation and result.
-        """
-        
-        response = llm.invoke(math_prompt)
+        math_prompt = _MATH_PROMPT.format_map({"inp": current_input})
         
         # Try to find and execute any mathematical expressions
-        expressions = re.findall(r'[\d+\-*/().\s]+', current_input)
+        expressions = _MATH_EXPR_RE.findall(current_input)
         if expressions:
-            calc_result = math_calculator.invoke({"expression": expressions[0].strip()})
-            final_response = f"🧮 {response.content}\n\n{calc_result}"
+            # The explanation and the local calculation are independent, so run them together
+            response, calc_result = await asyncio.gather(
+                _llm_acall(math_prompt),
+                asyncio.to_thread(math_calculator.invoke, {"expression": expressions[0].strip()})
+            )
+            final_response = f"🧮 {response}\n\n{calc_result}"
         else:
-            final_response = f"🧮 {response.content}"
+            response = await _llm_acall(math_prompt)
+            final_response = f"🧮 {response}"
         
-        return {
-            "current_input": current_input,
-            "response": final_response,
-            "user_id": user_id,
-            "intent": state["intent"],
-            "confidence": state["confidence"],
-            "context": state["context"],
-            "conversation_history": state["conversation_history"]
-        }
+        return {"response": final_response}
     except Exception as e:
-        return {
-            "current_input": current_input,
-            "response": f"🧮 Math handler error: {str(e)}",
-            "user_id": user_id,
-            "intent": state["intent"],
-            "confidence": state["confidence"],
-            "context": state["context"],
-            "conversation_history": state["conversation_history"]
-        }
+        return {"response": f"🧮 Math handler error: {str(e)}"}
 
-def weather_handler_node(state: SmartAgentState) -> SmartAgentState:
+async def weather_handler_node(state: SmartAgentState) -> SmartAgentState:
     """Handle weather queries"""
     current_input = state["current_input"]
-    user_id = state["user_id"]
     
     try:
         # Extract location from input
-        location_prompt = f"""
-        Extract the location from this weather query: "{current_input}"
-        If no specific location is mentioned, assume "current location".
-        Respond with just the location name.
-        """
+        location_prompt = _LOCATION_PROMPT.format_map({"inp": current_input})
         
-        location_response = llm.invoke(location_prompt)
-        location = location_response.content.strip()
+        # Look up the raw input while the LLM extracts the location; a known city
+        # named in the input is answered without a second tool call
+        location_response, weather_info = await asyncio.gather(
+            _llm_acall(location_prompt),
+            asyncio.to_thread(get_weather_info.invoke, {"location": current_input})
+        )
+        location = location_response.strip()
         
         # Get weather info
-        weather_info = get_weather_info.invoke({"location": location})
+        if "Not available" in weather_info:
+            weather_info = await asyncio.to_thread(get_weather_info.invoke, {"location": location})
         
         response = f"🌤️ {weather_info}"
         
         return {
-            "current_input": current_input,
             "response": response,
-            "user_id": user_id,
-            "intent": state["intent"],
-            "confidence": state["confidence"],
-            "context": {**state["context"], "location": location},
-            "conversation_history": state["conversation_history"]
+            "context": {**state["context"], "location": location}
         }
     except Exception as e:
-        return {
-            "current_input": current_input,
-            "response": f"🌤️ Weather handler error: {str(e)}",
-            "user_id": user_id,
-            "intent": state["intent"],
-            "confidence": state["confidence"],
-            "context": state["context"],
-            "conversation_history": state["conversation_history"]
-        }
+        return {"response": f"🌤️ Weather handler error: {str(e)}"}
 
 def personal_handler_node(state: SmartAgentState) -> SmartAgentState:
     """Handle personal information and memory queries"""
@@ -208,34 +316,21 @@ def personal_handler_node(state: SmartAgentState) -> SmartAgentState:
         namespace = "personal_info"
         memory_key = f"user_{user_id}"
         
-        stored_item = store.get(namespace, memory_key)
+        stored_item = cached_store.get(namespace, memory_key)
         personal_info = stored_item.value if stored_item else {}
         
         # Analyze if this is storing or retrieving personal info
-        analysis_prompt = f"""
-        Analyze if the user is:
-        1. STORING personal information (telling me about themselves)
-        2. RETRIEVING personal information (asking about what I know about them)
-        
-        User input: "{current_input}"
-        Current stored info: {personal_info}
-        
-        Respond with JSON: {{"action": "STORE" or "RETRIEVE", "key": "name/preference/etc", "value": "if storing"}}
-        """
+        analysis_prompt = _ANALYSIS_PROMPT.format_map({"inp": current_input, "info": personal_info})
         
-        response = llm.invoke(analysis_prompt)
+        action_data = _personal_llm.invoke(analysis_prompt)
         
-        # Extract action
-        json_match = re.search(r'\{.*\}', response.content, re.DOTALL)
-        if json_match:
-            action_data = json.loads(json_match.group())
-            action = action_data.get("action", "RETRIEVE")
-            key = action_data.get("key", "general")
-            value = action_data.get("value", "")
+        if action_data is not None:
+            key = action_data.key
+            value = action_data.value
             
-            if action == "STORE" and value:
+            if action_data.action == "STORE" and value:
                 personal_info[key] = value
-                store.put(namespace, memory_key, personal_info)
+                cached_store.put(namespace, memory_key, personal_info)
                 response_text = f"👤 Got it! I'll remember that {key}: {value}"
             else:
                 if personal_info:
@@ -247,99 +342,37 @@ def personal_handler_node(state: SmartAgentState) -> SmartAgentState:
             response_text = "👤 I understand you're sharing something personal, but I couldn't parse the details."
         
         return {
-            "current_input": current_input,
             "response": response_text,
-            "user_id": user_id,
-            "intent": state["intent"],
-            "confidence": state["confidence"],
-            "context": {**state["context"], "personal_info": personal_info},
-            "conversation_history": state["conversation_history"]
+            "context": {**state["context"], "personal_info": personal_info}
         }
     except Exception as e:
-        return {
-            "current_input": current_input,
-            "response": f"👤 Personal handler error: {str(e)}",
-            "user_id": user_id,
-            "intent": state["intent"],
-            "confidence": state["confidence"],
-            "context": state["context"],
-            "conversation_history": state["conversation_history"]
-        }
+        return {"response": f"👤 Personal handler error: {str(e)}"}
 
-def creative_handler_node(state: SmartAgentState) -> SmartAgentState:
+async def creative_handler_node(state: SmartAgentState) -> SmartAgentState:
     """Handle creative writing requests"""
     current_input = state["current_input"]
-    user_id = state["user_id"]
     
     try:
-        creative_prompt = f"""
-        The user is asking for creative content: "{current_input}"
+        creative_prompt = _CREATIVE_PROMPT.format_map({"inp": current_input})
         
-        Provide a creative response - this could be:
-        - A short story or poem
-        - Creative writing
-        - Imaginative scenarios
-        - Artistic descriptions
+        response = await _llm_acall(creative_prompt)
         
-        Be creative and engaging!
-        """
-        
-        response = llm.invoke(creative_prompt)
-        
-        return {
-            "current_input": current_input,
-            "response": f"✨ {response.content}",
-            "user_id": user_id,
-            "intent": state["intent"],
-            "confidence": state["confidence"],
-            "context": state["context"],
-            "conversation_history": state["conversation_history"]
-        }
+        return {"response": f"✨ {response}"}
     except Exception as e:
-        return {
-            "current_input": current_input,
-            "response": f"✨ Creative handler error: {str(e)}",
-            "user_id": user_id,
-            "intent": state["intent"],
-            "confidence": state["confidence"],
-            "context": state["context"],
-            "conversation_history": state["conversation_history"]
-        }
+        return {"response": f"✨ Creative handler error: {str(e)}"}
 
-def help_handler_node(state: SmartAgentState) -> SmartAgentState:
+async def help_handler_node(state: SmartAgentState) -> SmartAgentState:
     """Handle help and instruction requests"""
     current_input = state["current_input"]
-    user_id = state["user_id"]
     
     try:
-        help_prompt = f"""
-        The user is asking for help: "{current_input}"
-        
-        Provide helpful, step-by-step instructions or guidance.
-        Be practical and actionable.
-        """
+        help_prompt = _HELP_PROMPT.format_map({"inp": current_input})
         
-        response = llm.invoke(help_prompt)
+        response = await _llm_acall(help_prompt)
         
-        return {
-            "current_input": current_input,
-            "response": f"🆘 {response.content}",
-            "user_id": user_id,
-            "intent": state["intent"],
-            "confidence": state["confidence"],
-            "context": state["context"],
-            "conversation_history": state["conversation_history"]
-        }
+        return {"response": f"🆘 {response}"}
     except Exception as e:
-        return {
-            "current_input": current_input,
-            "response": f"🆘 Help handler error: {str(e)}",
-            "user_id": user_id,
-            "intent": state["intent"],
-            "confidence": state["confidence"],
-            "context": state["context"],
-            "conversation_history": state["conversation_history"]
-        }
+        return {"response": f"🆘 Help handler error: {str(e)}"}
 
 def general_handler_node(state: SmartAgentState) -> SmartAgentState:
     """Handle general conversation"""
@@ -351,59 +384,38 @@ def general_handler_node(state: SmartAgentState) -> SmartAgentState:
         namespace = "general_conversation"
         memory_key = f"user_{user_id}"
         
-        stored_item = store.get(namespace, memory_key)
-        history = stored_item.value if stored_item else []
+        stored_item = cached_store.get(namespace, memory_key)
+        # Bounded deque keeps only the last 5 exchanges; the oldest drops on append
+        history = deque(stored_item.value if stored_item else [], maxlen=5)
         
         # Add current exchange to history
-        history.append({"user": current_input, "timestamp": str(os.times())})
-        
-        # Keep only last 5 exchanges
-        history = history[-5:]
-        store.put(namespace, memory_key, history)
+        history.append({"user": current_input, "ts_ns": time.monotonic_ns()})
+        history = list(history)
+        cached_store.put(namespace, memory_key, history)
         
-        response = llm.invoke(current_input)
+        response = llm.invoke(current_input).content
         
         return {
-            "current_input": current_input,
-            "response": f"💬 {response.content}",
-            "user_id": user_id,
-            "intent": state["intent"],
-            "confidence": state["confidence"],
-            "context": state["context"],
+            "response": f"💬 {response}",
             "conversation_history": history
         }
     except Exception as e:
-        return {
-            "current_input": current_input,
-            "response": f"💬 General handler error: {str(e)}",
-            "user_id": user_id,
-            "intent": state["intent"],
-            "confidence": state["confidence"],
-            "context": state["context"],
-            "conversation_history": state["conversation_history"]
-        }
+        return {"response": f"💬 General handler error: {str(e)}"}
+
+# Intent -> handler node, built once and read-only
+_ROUTING_MAP = MappingProxyType({
+    "MATH": "math",
+    "WEATHER": "weather",
+    "PERSONAL": "personal",
+    "CREATIVE": "creative",
+    "HELP": "help",
+    "GENERAL": "general"
+})
 
 # Conditional routing function
 def route_by_intent(state: SmartAgentState) -> Literal["math", "weather", "personal", "creative", "help", "general"]:
-    """Route to appropriate handler based on intent"""
-    intent = state["intent"]
-    confidence = state["confidence"]
-    
-    # If confidence is too low, route to general
-    if confidence < 0.6:
-        return "general"
-    
-    # Route based on intent
-    routing_map = {
-        "MATH": "math",
-        "WEATHER": "weather", 
-        "PERSONAL": "personal",
-        "CREATIVE": "creative",
-        "HELP": "help",
-        "GENERAL": "general"
-    }
-    
-    return routing_map.get(intent, "general")
+    """Route to appropriate handler based on intent; low confidence goes to general"""
+    return "general" if state["confidence"] < 0.6 else _ROUTING_MAP.get(state["intent"], "general")
 
 # Build the graph
 builder = StateGraph(SmartAgentState)
@@ -450,7 +462,7 @@ def show_personal_info(user_id: str):
     memory_key = f"user_{user_id}"
     
     try:
-        stored_item = store.get(namespace, memory_key)
+        stored_item = cached_store.get(namespace, memory_key)
         personal_info = stored_item.value if stored_item else {}
         
         if personal_info:
@@ -468,11 +480,62 @@ def clear_personal_info(user_id: str):
     """Clear personal information"""
     namespace = "personal_info"
     memory_key = f"user_{user_id}"
-    store.put(namespace, memory_key, {})
+    cached_store.put(namespace, memory_key, {})
     print("🧹 Personal information cleared!")
 
+# --- Streaming CLI helper ---
+# Long-form handlers whose tokens are printed as they arrive
+_STREAMED_NODES = {"creative", "help"}
+
+async def stream_turn(state: SmartAgentState) -> SmartAgentState:
+    """Print creative/help tokens as they arrive and return the final graph state"""
+    result = state
+    streamed = False
+    print("🤖 Agent: ", end="", flush=True)
+    async for mode, chunk in graph.astream(state, stream_mode=["messages", "values"]):
+        if mode == "messages":
+            message, metadata = chunk
+            if metadata.get("langgraph_node") in _STREAMED_NODES:
+                print(message.content, end="", flush=True)
+                streamed = True
+        else:
+            result = chunk
+    # Other handlers return short answers, so print them whole
+    if not streamed:
+        print(result["response"], end="")
+    print()
+    return result
+
+# --- Batch Driver ---
+async def run_batch(prompts: list[str]) -> list[SmartAgentState]:
+    """Run many prompts through the graph concurrently so LLM calls overlap"""
+    # Each prompt gets its own user id so batched requests don't share memory
+    states = [
+        {
+            "current_input": prompt,
+            "response": "",
+            "user_id": f"batch_{i}",
+            "intent": "",
+            "confidence": 0.0,
+            "context": {},
+            "conversation_history": []
+        }
+        for i, prompt in enumerate(prompts)
+    ]
+    return await graph.abatch(states)
+
 # Main execution
 if __name__ == "__main__":
+    # Batch mode: python p2_step2_3_conditional_branching.py --batch prompts.txt
+    if len(sys.argv) > 2 and sys.argv[1] == "--batch":
+        prompts = load_prompts(sys.argv[2])
+        results = asyncio.run(run_batch(prompts))
+        for prompt, result in zip(prompts, results):
+            print(f"🧑 You: {prompt}")
+            print(f"🤖 Agent: {result['response']}")
+            print(f"📊 Intent: {result['intent']} (confidence: {result['confidence']:.2f})\n")
+        sys.exit()
+
     print("🧠 Smart Conditional Branching Agent")
     print("This agent can handle different types of queries:")
     print("  🧮 Math - Calculations and math problems")
@@ -519,11 +582,10 @@ if __name__ == "__main__":
             "conversation_history": []
         }
         
-        # Process through graph
-        result = graph.invoke(state)
+        # Process through graph, streaming long-form responses as they are generated
+        result = asyncio.run(stream_turn(state))
         
-        # Print response with intent information
-        print(f"🤖 Agent: {result['response']}")
+        # Print intent information
         print(f"📊 Intent: {result['intent']} (confidence: {result['confidence']:.2f})")
         
         if result['context'].get('reasoning'):
@@ -1,27 +1,53 @@
 from langgraph.graph import StateGraph, END
 from langchain_google_genai import ChatGoogleGenerativeAI
-from dotenv import load_dotenv
-from typing import TypedDict, Literal, Optional
+from langchain_core.messages import HumanMessage, SystemMessage
+from typing import Literal, Optional
+from dataclasses import dataclass, field
+import asyncio
+import logging
+import logging.handlers
 import os
-import time
+import queue
 import random
 from datetime import datetime
-
-# Load Gemini API Key
-load_dotenv()
-os.environ["GOOGLE_API_KEY"] = os.getenv("GOOGLE_API_KEY")
+import config as _env  # noqa: F401  (loads .env once)
 
 # Enhanced state schema with error handling
-class RobustAgentState(TypedDict):
+# A slotted dataclass: nodes mutate it in place on every attempt, and slot
+# attribute access is cheaper than dict lookups. Graph input/output stay plain dicts.
+@dataclass(slots=True)
+class RobustAgentState:
     input: str
-    output: str
-    error_count: int
-    max_retries: int
-    last_error: Optional[str]
-    attempt_history: list[str]
-    fallback_used: bool
-    current_node: str
-    has_success: bool  # Track if we've succeeded
+    output: str = ""
+    error_count: int = 0
+    max_retries: int = 3
+    last_error: Optional[str] = None
+    attempt_history: list[str] = field(default_factory=list)
+    fallback_used: bool = False
+    current_node: str = ""
+    has_success: bool = False  # Track if we've succeeded
+
+# Node events go to a logger that is silent unless a handler is attached (see enable_event_log)
+log = logging.getLogger(__name__)
+log.addHandler(logging.NullHandler())
+
+def enable_event_log(level: int = logging.DEBUG) -> logging.handlers.QueueListener:
+    """Print node events from a background thread; nodes only enqueue records"""
+    records = queue.SimpleQueue()
+    listener = logging.handlers.QueueListener(records, logging.StreamHandler())
+    log.addHandler(logging.handlers.QueueHandler(records))
+    log.setLevel(level)
+    listener.start()
+    return listener
+
+# Static instruction sent as a fixed prefix on every attempt, so provider-side prompt caching can reuse it
+SYSTEM_PROMPT = SystemMessage(content="Process this request professionally.")
+
+# Optional explicit Gemini context cache holding SYSTEM_PROMPT (a cachedContents/... name)
+CACHED_CONTENT = os.getenv("GEMINI_CACHED_CONTENT")
+
+# Initialize LLM once; retries reuse the same client
+llm = ChatGoogleGenerativeAI(model="gemini-2.0-flash-exp", cached_content=CACHED_CONTENT)
 
 # Simulate different types of errors for demonstration
 class SimulatedError(Exception):
@@ -29,130 +55,127 @@ class SimulatedError(Exception):
 
 def primary_processing_node(state: RobustAgentState) -> RobustAgentState:
     """Primary node that might fail - simulates API calls or complex operations"""
-    current_attempt = state["error_count"] + 1
-    print(f"🔄 Attempting primary processing (attempt {current_attempt})")
+    current_attempt = state.error_count + 1
     
     # Simulate random failures for demonstration (30% failure rate)
     if random.random() < 0.3:
         error_msg = f"Simulated API failure at {datetime.now().strftime('%H:%M:%S')}"
-        print(f"❌ Primary processing failed: {error_msg}")
         
         # Update error state
-        state["error_count"] += 1
-        state["last_error"] = error_msg
-        state["attempt_history"].append(f"Attempt {current_attempt}: Failed - {error_msg}")
-        state["current_node"] = "primary_processing"
-        state["has_success"] = False
+        state.error_count += 1
+        state.last_error = error_msg
+        state.attempt_history.append(f"Attempt {current_attempt}: Failed - {error_msg}")
+        state.current_node = "primary_processing"
+        state.has_success = False
         
+        log.debug("primary_processing attempt=%d outcome=simulated_failure error=%r", current_attempt, error_msg)
         return state
     
     # Success case
-    user_input = state["input"]
-    llm = ChatGoogleGenerativeAI(model="gemini-2.0-flash-exp")
+    user_input = state.input
     
     try:
-        response = llm.invoke(f"Process this request professionally: {user_input}")
-        state["output"] = f"✅ Primary Success: {response.content}"
-        state["attempt_history"].append(f"Attempt {current_attempt}: Success")
-        state["current_node"] = "primary_processing"
-        state["has_success"] = True  # Mark as successful
-        print("✅ Primary processing succeeded")
+        # A cached context already carries the instruction, and Gemini rejects sending it twice
+        messages = [HumanMessage(content=user_input)]
+        if not CACHED_CONTENT:
+            messages.insert(0, SYSTEM_PROMPT)
+        response = llm.invoke(messages)
+        state.output = f"✅ Primary Success: {response.content}"
+        state.attempt_history.append(f"Attempt {current_attempt}: Success")
+        state.current_node = "primary_processing"
+        state.has_success = True  # Mark as successful
+        log.debug("primary_processing attempt=%d outcome=success", current_attempt)
         return state
         
     except Exception as e:
         # Real API error
         error_msg = f"Real API error: {str(e)}"
-        print(f"❌ Real API error: {error_msg}")
         
-        state["error_count"] += 1
-        state["last_error"] = error_msg
-        state["attempt_history"].append(f"Attempt {current_attempt}: API Error - {error_msg}")
-        state["current_node"] = "primary_processing"
-        state["has_success"] = False
+        state.error_count += 1
+        state.last_error = error_msg
+        state.attempt_history.append(f"Attempt {current_attempt}: API Error - {error_msg}")
+        state.current_node = "primary_processing"
+        state.has_success = False
         
+        log.debug("primary_processing attempt=%d outcome=api_error error=%r", current_attempt, error_msg)
         return state
 
 def route_decision(state: RobustAgentState) -> Literal["retry", "fallback", "final_output"]:
     """Routing function that contains all the decision logic"""
-    print(f"🤔 Deciding next action... (errors: {state['error_count']}, max: {state['max_retries']}, success: {state['has_success']})")
-    
     # If we have success, go to final output
-    if state["has_success"]:
-        print("✅ Success achieved, proceeding to final output")
-        return "final_output"
+    if state.has_success:
+        decision = "final_output"
     # If we have errors and haven't hit retry limit, retry
-    elif state["error_count"] > 0 and state["error_count"] < state["max_retries"]:
-        print(f"🔄 Will retry (attempt {state['error_count'] + 1}/{state['max_retries']})")
-        return "retry"
+    elif state.error_count > 0 and state.error_count < state.max_retries:
+        decision = "retry"
     # If retry limit exceeded, use fallback
-    elif state["error_count"] >= state["max_retries"]:
-        print("🛡️ Max retries reached, using fallback")
-        return "fallback"
+    elif state.error_count >= state.max_retries:
+        decision = "fallback"
     else:
         # First attempt (error_count = 0, no success yet) - shouldn't happen
-        print("⚠️ Unexpected state, proceeding to final output")
-        return "final_output"
+        decision = "final_output"
+    
+    log.debug(
+        "route_decision errors=%d max_retries=%d success=%s next=%s",
+        state.error_count, state.max_retries, state.has_success, decision
+    )
+    return decision
 
-def retry_node(state: RobustAgentState) -> RobustAgentState:
+async def retry_node(state: RobustAgentState) -> RobustAgentState:
     """Retry the primary operation with exponential backoff"""
-    print(f"🔄 Retry node: Preparing for attempt {state['error_count'] + 1}")
-    
     # Exponential backoff (optional)
-    delay = min(2 ** (state["error_count"] - 1), 8)  # Max 8 seconds, starts at 1 second
-    print(f"⏱️ Waiting {delay} seconds before retry...")
-    time.sleep(delay)
+    delay = min(2 ** (state.error_count - 1), 8)  # Max 8 seconds, starts at 1 second
+    await asyncio.sleep(delay)
     
     # Don't increment error count here - let primary_processing handle it
-    state["current_node"] = "retry"
+    state.current_node = "retry"
+    log.debug("retry next_attempt=%d delay_s=%d", state.error_count + 1, delay)
     return state
 
 def fallback_node(state: RobustAgentState) -> RobustAgentState:
     """Fallback mechanism when primary processing fails"""
-    print("🛡️ Executing fallback processing")
-    
-    user_input = state["input"]
+    user_input = state.input
     
     # Simple fallback: basic string processing without LLM
     try:
         # Simulate a simpler, more reliable fallback
         fallback_response = f"Fallback response for: '{user_input}' (processed locally without AI)"
         
-        state["output"] = f"⚠️ Fallback Used: {fallback_response}"
-        state["fallback_used"] = True
-        state["attempt_history"].append("Fallback processing succeeded")
-        state["current_node"] = "fallback"
+        state.output = f"⚠️ Fallback Used: {fallback_response}"
+        state.fallback_used = True
+        state.attempt_history.append("Fallback processing succeeded")
+        state.current_node = "fallback"
         
-        print("✅ Fallback processing succeeded")
+        log.debug("fallback outcome=success")
         return state
         
     except Exception as e:
         # Even fallback failed - this is rare but possible
         error_msg = f"Fallback failed: {str(e)}"
-        print(f"❌ Fallback failed: {error_msg}")
         
-        state["output"] = f"❌ Complete Failure: {error_msg}"
-        state["attempt_history"].append(f"Fallback failed: {error_msg}")
-        state["current_node"] = "fallback"
+        state.output = f"❌ Complete Failure: {error_msg}"
+        state.attempt_history.append(f"Fallback failed: {error_msg}")
+        state.current_node = "fallback"
         
+        log.debug("fallback outcome=failure error=%r", error_msg)
         return state
 
 def final_output_node(state: RobustAgentState) -> RobustAgentState:
     """Final output node with summary of attempts"""
-    print("📋 Generating final output with attempt summary")
-    
     # Add attempt summary to output
     summary = f"\n\n📊 Execution Summary:\n"
-    summary += f"• Total attempts: {len(state['attempt_history'])}\n"
-    summary += f"• Errors encountered: {state['error_count']}\n"
-    summary += f"• Fallback used: {'Yes' if state['fallback_used'] else 'No'}\n"
-    summary += f"• Attempt history: {' → '.join(state['attempt_history'])}"
+    summary += f"• Total attempts: {len(state.attempt_history)}\n"
+    summary += f"• Errors encountered: {state.error_count}\n"
+    summary += f"• Fallback used: {'Yes' if state.fallback_used else 'No'}\n"
+    summary += f"• Attempt history: {' → '.join(state.attempt_history)}"
     
-    if state["output"]:
-        state["output"] += summary
+    if state.output:
+        state.output += summary
     else:
-        state["output"] = f"No output generated{summary}"
+        state.output = f"No output generated{summary}"
     
-    state["current_node"] = "final_output"
+    state.current_node = "final_output"
+    log.debug("final_output attempts=%d fallback_used=%s", len(state.attempt_history), state.fallback_used)
     return state
 
 # Build the robust graph with error handling
@@ -194,7 +217,7 @@ def build_robust_graph() -> StateGraph:
     return builder.compile()
 
 # Demo function
-def demo_error_handling():
+async def demo_error_handling():
     """Demonstrate different error handling scenarios"""
     
     graph = build_robust_graph()
@@ -217,13 +240,9 @@ def demo_error_handling():
         }
     ]
     
-    for i, test_case in enumerate(test_cases, 1):
-        print(f"\n{'='*60}")
-        print(f"🧪 Test Case {i}: {test_case['description']}")
-        print(f"{'='*60}")
-        
-        # Initialize state
-        initial_state = {
+    # Initialize one state per test case
+    initial_states = [
+        {
             "input": test_case["input"],
             "output": "",
             "error_count": 0,
@@ -234,19 +253,28 @@ def demo_error_handling():
             "current_node": "",
             "has_success": False
         }
+        for test_case in test_cases
+    ]
+    
+    # Run all test cases concurrently so their LLM calls and backoffs overlap
+    print(f"\n🚀 Running {len(test_cases)} test cases concurrently...")
+    results = await asyncio.gather(
+        *(graph.ainvoke(initial_state) for initial_state in initial_states),
+        return_exceptions=True
+    )
+    
+    for i, (test_case, result) in enumerate(zip(test_cases, results), 1):
+        print(f"\n{'='*60}")
+        print(f"🧪 Test Case {i}: {test_case['description']}")
+        print(f"{'='*60}")
         
-        # Run the graph
-        try:
-            result = graph.invoke(initial_state)
-            print(f"\n🎯 Final Result:")
-            print(f"Input: {result['input']}")
-            print(f"Output: {result['output']}")
-            
-        except Exception as e:
-            print(f"❌ Graph execution failed: {str(e)}")
+        if isinstance(result, Exception):
+            print(f"❌ Graph execution failed: {str(result)}")
+            continue
         
-        print(f"\n⏱️ Waiting 2 seconds before next test...")
-        time.sleep(2)
+        print(f"\n🎯 Final Result:")
+        print(f"Input: {result['input']}")
+        print(f"Output: {result['output']}")
 
 # Interactive mode
 def interactive_mode():
@@ -268,7 +296,7 @@ def interactive_mode():
                 break
             
             if text.lower() == "demo":
-                demo_error_handling()
+                asyncio.run(demo_error_handling())
                 continue
             
             # Get retry settings
@@ -293,7 +321,7 @@ def interactive_mode():
             print(f"\n🚀 Processing with max {max_retries} retries...")
             
             # Run the graph
-            result = graph.invoke(initial_state)
+            result = asyncio.run(graph.ainvoke(initial_state))
             
             print(f"\n🤖 Agent Response:")
             print(result["output"])
@@ -305,6 +333,9 @@ def interactive_mode():
             print(f"❌ Unexpected error: {str(e)}")
 
 if __name__ == "__main__":
+    # Show node events on the console; the listener thread does the writing
+    listener = enable_event_log()
+    
     print("Choose mode:")
     print("1. Interactive mode")
     print("2. Demo mode (automated tests)")
@@ -312,6 +343,8 @@ if __name__ == "__main__":
     choice = input("Enter choice (1/2): ").strip()
     
     if choice == "2":
-        demo_error_handling()
+        asyncio.run(demo_error_handling())
     else:
         interactive_mode()
+    
+    listener.stop()
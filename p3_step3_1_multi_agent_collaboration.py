@@ -1,156 +1,237 @@
 from langgraph.graph import StateGraph, START, END
+from langgraph.checkpoint.memory import MemorySaver
 from langchain_google_genai import ChatGoogleGenerativeAI
-from dotenv import load_dotenv
-from typing import TypedDict, List, Literal
-import os
-
-# Load Gemini API Key
-load_dotenv()
-os.environ["GOOGLE_API_KEY"] = os.getenv("GOOGLE_API_KEY")
+from langchain_core.prompts import ChatPromptTemplate
+from langchain_core.caches import InMemoryCache
+from typing import List, Literal
+from dataclasses import dataclass
+import asyncio
+import hashlib
+import sys
+import config as _env  # noqa: F401  (loads .env once)
+from semantic_cache import CachedLLM
+from llm_helpers import load_prompts
 
 # Define comprehensive state schema for multi-agent collaboration
-class ResearchState(TypedDict):
+# A slotted dataclass: agents read and write it on every hop of the improvement loop,
+# and slot attribute access is cheaper than dict lookups. Graph input/output stay plain dicts.
+@dataclass(slots=True)
+class ResearchState:
     user_query: str
-    research_plan: str
-    research_results: str
-    verification_status: str
-    final_answer: str
-    iterations: int
-    max_iterations: int
+    research_plan: str = ""
+    research_results: str = ""
+    verification_status: str = ""
+    final_answer: str = ""
+    draft_answer: str = ""  # Speculative finalizer output produced alongside verification
+    iterations: int = 0
+    max_iterations: int = 2
+
+# Initialize LLM behind a semantic cache so near-duplicate agent prompts skip the model.
+# Revision passes call chat_llm directly: they must produce new results, not a cached copy
+chat_llm = ChatGoogleGenerativeAI(model="gemini-2.0-flash-exp", temperature=0.7)
+llm = CachedLLM(chat_llm)
+
+# Verifier and finalizer are pure functions of their inputs: run them at temperature 0
+# behind an exact-match cache so re-verifying unchanged results costs nothing
+_REVIEW_CACHE = InMemoryCache(maxsize=1024)
+review_llm = ChatGoogleGenerativeAI(
+    model="gemini-2.0-flash-exp",
+    temperature=0,
+    cache=_REVIEW_CACHE
+)
+
+# The verdict is one short APPROVED / NEEDS_IMPROVEMENT line, so cap its output budget
+verifier_llm = ChatGoogleGenerativeAI(
+    model="gemini-2.0-flash-exp",
+    temperature=0,
+    max_output_tokens=128,
+    cache=_REVIEW_CACHE
+)
+
+# Agent instructions are static system messages sent first; the query, plan and
+# results follow in a human message, so every call shares a byte-identical prefix
+# that provider-side prompt caching can reuse. Templates are parsed once at import.
+PLANNER_SYSTEM = """You are a Research Planner Agent. Your job is to create a detailed research plan.
+
+Create a structured research plan with:
+1. Key topics to investigate
+2. Specific questions to answer
+3. Research approach/methodology
+4. Success criteria for verification
+
+Be concise but comprehensive. Format as a numbered list."""
+
+EXECUTOR_SYSTEM = """You are a Research Executor Agent. Follow the research plan to provide comprehensive answers.
+
+Execute the research plan step by step:
+- Address each point in the plan
+- Provide detailed, factual information
+- Use your knowledge base to answer thoroughly
+- Structure your response clearly
+
+Focus on being accurate and comprehensive."""
+
+VERIFIER_SYSTEM = """You are a Research Verifier Agent. Evaluate the research results for quality and completeness.
+
+Evaluate:
+1. Does the research answer the original query?
+2. Are all points from the plan addressed?
+3. Is the information accurate and well-structured?
+4. Are there any gaps or missing information?
+
+Respond with either:
+- "APPROVED: [brief reason]" if the research is satisfactory
+- "NEEDS_IMPROVEMENT: [specific issues to address]" if it needs more work"""
+
+FINALIZER_SYSTEM = """You are a Finalizer Agent. Create a polished, user-friendly final answer.
+
+Create a final answer that:
+- Directly addresses the user's query
+- Is well-structured and easy to read
+- Includes key insights from the research
+- Is concise but comprehensive
+
+Format as a professional response."""
 
-# Initialize LLM
-llm = ChatGoogleGenerativeAI(model="gemini-2.0-flash-exp", temperature=0.7)
+PLANNER_TMPL = ChatPromptTemplate.from_messages([
+    ("system", PLANNER_SYSTEM),
+    ("human", "User Query: {user_query}")
+])
+EXECUTOR_TMPL = ChatPromptTemplate.from_messages([
+    ("system", EXECUTOR_SYSTEM),
+    ("human", "Original Query: {user_query}\nResearch Plan: {research_plan}")
+])
+# Revision pass: the executor sees its previous results and the verifier's feedback
+EXECUTOR_REVISION_TMPL = ChatPromptTemplate.from_messages([
+    ("system", EXECUTOR_SYSTEM),
+    ("human", "Original Query: {user_query}\nResearch Plan: {research_plan}\n"
+              "Previous Research Results: {research_results}\n"
+              "Verifier Feedback (revision {iteration}): {verification_status}\n"
+              "Revise the research results to address this feedback.")
+])
+VERIFIER_TMPL = ChatPromptTemplate.from_messages([
+    ("system", VERIFIER_SYSTEM),
+    ("human", "Original Query: {user_query}\nResearch Plan: {research_plan}\nResearch Results: {research_results}")
+])
+FINALIZER_TMPL = ChatPromptTemplate.from_messages([
+    ("system", FINALIZER_SYSTEM),
+    ("human", "Original Query: {user_query}\nResearch Results: {research_results}\nVerification: {verification_status}")
+])
 
 # AGENT 1: PLANNER - Creates research strategy
-def planner_agent(state: ResearchState) -> ResearchState:
+async def planner_agent(state: ResearchState) -> ResearchState:
     """
     The Planner Agent analyzes the user query and creates a structured research plan.
     """
-    user_query = state["user_query"]
+    user_query = state.user_query
     
-    planner_prompt = f"""
-    You are a Research Planner Agent. Your job is to create a detailed research plan.
-    
-    User Query: {user_query}
-    
-    Create a structured research plan with:
-    1. Key topics to investigate
-    2. Specific questions to answer
-    3. Research approach/methodology
-    4. Success criteria for verification
-    
-    Be concise but comprehensive. Format as a numbered list.
-    """
+    planner_prompt = PLANNER_TMPL.format_messages(user_query=user_query)
     
     try:
-        response = llm.invoke(planner_prompt)
-        state["research_plan"] = response.content
+        response = await llm.ainvoke(planner_prompt)
+        state.research_plan = response.content
         print("📋 PLANNER: Research plan created")
         return state
     except Exception as e:
-        state["research_plan"] = f"❌ Planning Error: {str(e)}"
+        state.research_plan = f"❌ Planning Error: {str(e)}"
         return state
 
 # AGENT 2: EXECUTOR - Conducts the research
-def executor_agent(state: ResearchState) -> ResearchState:
+async def executor_agent(state: ResearchState) -> ResearchState:
     """
     The Executor Agent follows the research plan and generates results.
     """
-    user_query = state["user_query"]
-    research_plan = state["research_plan"]
-    
-    executor_prompt = f"""
-    You are a Research Executor Agent. Follow the research plan to provide comprehensive answers.
-    
-    Original Query: {user_query}
-    Research Plan: {research_plan}
-    
-    Execute the research plan step by step:
-    - Address each point in the plan
-    - Provide detailed, factual information
-    - Use your knowledge base to answer thoroughly
-    - Structure your response clearly
-    
-    Focus on being accurate and comprehensive.
-    """
+    user_query = state.user_query
+    research_plan = state.research_plan
     
     try:
-        response = llm.invoke(executor_prompt)
-        state["research_results"] = response.content
+        if state.iterations > 0:
+            # Sent back by the verifier: revise using its feedback, bypassing the cache
+            executor_prompt = EXECUTOR_REVISION_TMPL.format_messages(
+                user_query=user_query, research_plan=research_plan,
+                research_results=state.research_results,
+                verification_status=state.verification_status, iteration=state.iterations
+            )
+            response = await chat_llm.ainvoke(executor_prompt)
+        else:
+            executor_prompt = EXECUTOR_TMPL.format_messages(user_query=user_query, research_plan=research_plan)
+            response = await llm.ainvoke(executor_prompt)
+        state.research_results = response.content
         print("🔍 EXECUTOR: Research completed")
         return state
     except Exception as e:
-        state["research_results"] = f"❌ Execution Error: {str(e)}"
+        state.research_results = f"❌ Execution Error: {str(e)}"
         return state
 
 # AGENT 3: VERIFIER - Checks quality and completeness
-def verifier_agent(state: ResearchState) -> ResearchState:
+async def verifier_agent(state: ResearchState) -> ResearchState:
     """
     The Verifier Agent evaluates the research results and determines if they're satisfactory.
     """
-    user_query = state["user_query"]
-    research_plan = state["research_plan"]
-    research_results = state["research_results"]
-    
-    verifier_prompt = f"""
-    You are a Research Verifier Agent. Evaluate the research results for quality and completeness.
+    user_query = state.user_query
+    research_plan = state.research_plan
+    research_results = state.research_results
     
-    Original Query: {user_query}
-    Research Plan: {research_plan}
-    Research Results: {research_results}
+    verifier_prompt = VERIFIER_TMPL.format_messages(
+        user_query=user_query, research_plan=research_plan, research_results=research_results
+    )
     
-    Evaluate:
-    1. Does the research answer the original query?
-    2. Are all points from the plan addressed?
-    3. Is the information accurate and well-structured?
-    4. Are there any gaps or missing information?
+    # Speculatively draft the final answer while verification runs; kept only if
+    # the verifier does not ask for another round
+    draft_prompt = build_finalizer_prompt(user_query, research_results, "Pending review")
     
-    Respond with either:
-    - "APPROVED: [brief reason]" if the research is satisfactory
-    - "NEEDS_IMPROVEMENT: [specific issues to address]" if it needs more work
-    """
+    # Each verification closes one improvement cycle
+    state.iterations += 1
+    print(f"🔄 Iteration {state.iterations}/{state.max_iterations}")
     
     try:
-        response = llm.invoke(verifier_prompt)
-        state["verification_status"] = response.content
+        response, draft = await asyncio.gather(
+            verifier_llm.ainvoke(verifier_prompt),
+            review_llm.ainvoke(draft_prompt),
+            return_exceptions=True
+        )
+        if isinstance(response, Exception):
+            raise response
+        state.verification_status = response.content
+        needs_work = response.content.startswith("NEEDS_IMPROVEMENT")
+        state.draft_answer = "" if needs_work or isinstance(draft, Exception) else draft.content
         print("✅ VERIFIER: Results evaluated")
         return state
     except Exception as e:
-        state["verification_status"] = f"❌ Verification Error: {str(e)}"
+        state.verification_status = f"❌ Verification Error: {str(e)}"
+        state.draft_answer = ""
         return state
 
 # FINALIZER - Prepares the final answer
-def finalizer_agent(state: ResearchState) -> ResearchState:
+def build_finalizer_prompt(user_query: str, research_results: str, verification_status: str) -> list:
+    """
+    Build the finalizer prompt; shared by the finalizer and the verifier's speculative draft.
+    """
+    return FINALIZER_TMPL.format_messages(
+        user_query=user_query, research_results=research_results, verification_status=verification_status
+    )
+
+async def finalizer_agent(state: ResearchState) -> ResearchState:
     """
     The Finalizer Agent prepares the final polished answer for the user.
     """
-    user_query = state["user_query"]
-    research_results = state["research_results"]
-    verification_status = state["verification_status"]
-    
-    finalizer_prompt = f"""
-    You are a Finalizer Agent. Create a polished, user-friendly final answer.
-    
-    Original Query: {user_query}
-    Research Results: {research_results}
-    Verification: {verification_status}
-    
-    Create a final answer that:
-    - Directly addresses the user's query
-    - Is well-structured and easy to read
-    - Includes key insights from the research
-    - Is concise but comprehensive
+    # Reuse the draft written while the verifier was running, if it was kept
+    if state.draft_answer:
+        state.final_answer = state.draft_answer
+        print("📝 FINALIZER: Final answer prepared (from speculative draft)")
+        return state
     
-    Format as a professional response.
-    """
+    finalizer_prompt = build_finalizer_prompt(
+        state.user_query, state.research_results, state.verification_status
+    )
     
     try:
-        response = llm.invoke(finalizer_prompt)
-        state["final_answer"] = response.content
+        response = await review_llm.ainvoke(finalizer_prompt)
+        state.final_answer = response.content
         print("📝 FINALIZER: Final answer prepared")
         return state
     except Exception as e:
-        state["final_answer"] = f"❌ Finalizer Error: {str(e)}"
+        state.final_answer = f"❌ Finalizer Error: {str(e)}"
         return state
 
 # CONDITIONAL LOGIC - Determines next step based on verification
@@ -158,9 +239,9 @@ def should_continue(state: ResearchState) -> Literal["continue", "finalize"]:
     """
     Decision function: Continue improving or finalize based on verification.
     """
-    verification = state["verification_status"]
-    iterations = state["iterations"]
-    max_iterations = state["max_iterations"]
+    verification = state.verification_status
+    iterations = state.iterations
+    max_iterations = state.max_iterations
     
     # Check if we've hit max iterations
     if iterations >= max_iterations:
@@ -178,19 +259,11 @@ def should_continue(state: ResearchState) -> Literal["continue", "finalize"]:
         print("⚠️ Unclear verification - finalizing")
         return "finalize"
 
-# ITERATION COUNTER - Tracks improvement cycles
-def increment_iteration(state: ResearchState) -> ResearchState:
-    """
-    Increment iteration counter for improvement cycles.
-    """
-    state["iterations"] += 1
-    print(f"🔄 Iteration {state['iterations']}/{state['max_iterations']}")
-    return state
-
 # BUILD THE MULTI-AGENT GRAPH
-def build_research_graph():
+def build_research_graph(checkpointer=None):
     """
     Build the multi-agent research graph with conditional flows.
+    With a checkpointer, every node's output is saved per thread so runs can be resumed or reused.
     """
     # Create the StateGraph
     builder = StateGraph(ResearchState)
@@ -199,18 +272,16 @@ def build_research_graph():
     builder.add_node("planner", planner_agent)
     builder.add_node("executor", executor_agent)
     builder.add_node("verifier", verifier_agent)
-    builder.add_node("increment", increment_iteration)
     builder.add_node("finalizer", finalizer_agent)
     
     # Define the flow
     builder.add_edge(START, "planner")
     builder.add_edge("planner", "executor")
     builder.add_edge("executor", "verifier")
-    builder.add_edge("verifier", "increment")
     
     # Conditional branching after verification
     builder.add_conditional_edges(
-        "increment",
+        "verifier",
         should_continue,
         {
             "continue": "executor",  # Go back to executor for improvement
@@ -221,15 +292,83 @@ def build_research_graph():
     builder.add_edge("finalizer", END)
     
     # Compile the graph
-    return builder.compile()
+    return builder.compile(checkpointer=checkpointer)
+
+# BATCH DRIVER
+def make_initial_state(user_query: str) -> dict:
+    """
+    Build the starting state for one research question.
+    """
+    return {
+        "user_query": user_query,
+        "research_plan": "",
+        "research_results": "",
+        "verification_status": "",
+        "final_answer": "",
+        "draft_answer": "",
+        "iterations": 0,
+        "max_iterations": 2  # Allow up to 2 improvement cycles
+    }
+
+async def run_batch(queries: list[str]) -> list[dict]:
+    """
+    Run many research questions through the graph concurrently.
+    """
+    graph = build_research_graph()
+    states = [make_initial_state(query) for query in queries]
+    return await graph.abatch(states, config={"max_concurrency": 16})
+
+# STREAMING - Show the plan and the final answer as they are generated
+_STREAMED_AGENTS = {"planner": "📋 RESEARCH PLAN:", "finalizer": "📝 FINAL ANSWER:"}
+
+def research_thread_id(user_query: str) -> str:
+    """
+    Stable checkpoint thread id for a query, so asking it again finds the earlier run.
+    """
+    return hashlib.sha1(user_query.strip().lower().encode()).hexdigest()
+
+async def stream_research(graph, initial_state: dict) -> tuple[dict, set[str]]:
+    """
+    Run the graph, printing planner and finalizer tokens as they arrive.
+    Returns the final state and the agents whose output was streamed.
+    """
+    result = initial_state
+    streamed = set()
+    run_input = initial_state
+    run_config = None
+    
+    # With a checkpointer: reuse a finished run for the same query, or resume one that stopped midway
+    if graph.checkpointer is not None:
+        run_config = {"configurable": {"thread_id": research_thread_id(initial_state["user_query"])}}
+        snapshot = await graph.aget_state(run_config)
+        if snapshot.values and not snapshot.next:
+            print("♻️ Reusing the completed run for this query")
+            return snapshot.values, streamed
+        if snapshot.next:
+            print(f"⏯️ Resuming the earlier run at: {', '.join(snapshot.next)}")
+            run_input = None
+    
+    async for mode, chunk in graph.astream(run_input, run_config, stream_mode=["messages", "values"]):
+        if mode == "messages":
+            message, metadata = chunk
+            node = metadata.get("langgraph_node")
+            if node in _STREAMED_AGENTS:
+                if node not in streamed:
+                    print(f"\n{_STREAMED_AGENTS[node]}")
+                    streamed.add(node)
+                print(message.content, end="", flush=True)
+        else:
+            result = chunk
+    print()
+    return result, streamed
 
 # MAIN EXECUTION
 def main():
     """
     Main function to run the multi-agent research system.
     """
-    # Build the graph
-    graph = build_research_graph()
+    # Build the graph; the checkpointer keeps each query's run for this session
+    graph = build_research_graph(checkpointer=MemorySaver())
     
     print("🚀 Multi-Agent Research Assistant Ready!")
     print("This system uses specialized agents: Planner → Executor → Verifier → Finalizer")
@@ -243,37 +382,44 @@ def main():
             break
         
         # Initialize state
-        initial_state = {
-            "user_query": user_query,
-            "research_plan": "",
-            "research_results": "",
-            "verification_status": "",
-            "final_answer": "",
-            "iterations": 0,
-            "max_iterations": 2  # Allow up to 2 improvement cycles
-        }
+        initial_state = make_initial_state(user_query)
         
         print(f"\n🔍 Processing: {user_query}")
         print("=" * 50)
         
         try:
-            # Run the multi-agent system
-            result = graph.invoke(initial_state)
+            # Run the multi-agent system, streaming the plan and final answer
+            result, streamed = asyncio.run(stream_research(graph, initial_state))
             
-            # Display results
+            # Display results; cached or drafted outputs were not streamed, so print them whole
             print("\n" + "=" * 50)
-            print("📋 RESEARCH PLAN:")
-            print(result["research_plan"])
-            print("\n" + "-" * 30)
+            if "planner" not in streamed:
+                print("📋 RESEARCH PLAN:")
+                print(result["research_plan"])
+                print("\n" + "-" * 30)
             print("✅ VERIFICATION:")
             print(result["verification_status"])
-            print("\n" + "-" * 30)
-            print("📝 FINAL ANSWER:")
-            print(result["final_answer"])
+            if "finalizer" not in streamed:
+                print("\n" + "-" * 30)
+                print("📝 FINAL ANSWER:")
+                print(result["final_answer"])
             print("\n" + "=" * 50)
-            
+
+        except KeyboardInterrupt:
+            # Stay in the loop so the checkpointer survives; asking the same question resumes the run
+            print("\n⏸️ Interrupted. Ask the same question again to resume where it stopped.")
         except Exception as e:
             print(f"❌ System Error: {str(e)}")
 
 if __name__ == "__main__":
+    # Batch mode: python p3_step3_1_multi_agent_collaboration.py --batch queries.txt
+    if len(sys.argv) > 2 and sys.argv[1] == "--batch":
+        queries = load_prompts(sys.argv[2])
+        results = asyncio.run(run_batch(queries))
+        for query, result in zip(queries, results):
+            print(f"🧑 Query: {query}")
+            print(f"📝 FINAL ANSWER:\n{result['final_answer']}")
+            print("=" * 50)
+        sys.exit()
+    
     main()
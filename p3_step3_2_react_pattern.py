@@ -17,54 +17,90 @@
 
 from langgraph.graph import StateGraph, END
 from langchain_google_genai import ChatGoogleGenerativeAI
-from dotenv import load_dotenv
-from typing import TypedDict, List, Dict, Any
-import os
-import json
+from langchain_core.prompts import ChatPromptTemplate
+from typing import Set, Dict, Any, Optional
+from dataclasses import dataclass, field, replace
+from functools import lru_cache
+import ast
+import asyncio
 import math
+import re
 import requests
-
-# Load Gemini API Key
-load_dotenv()
-os.environ["GOOGLE_API_KEY"] = os.getenv("GOOGLE_API_KEY")
+import config as _env  # noqa: F401  (loads .env once)
+from semantic_cache import CachedLLM
 
 # Define ReAct State Schema
-class ReActState(TypedDict):
+# A slotted dataclass: the reasoning/action loop touches these fields on every step,
+# and slot attribute access is cheaper than dict lookups
+@dataclass(slots=True)
+class ReActState:
     input: str
-    thought: str
-    action: str
-    action_input: str
-    observation: str
-    final_answer: str
-    step_count: int
-    max_steps: int
-    finished: bool
-    tools_used: List[str]  # Track which tools were used
+    thought: str = ""
+    action: str = ""
+    action_input: str = ""
+    observation: str = ""
+    final_answer: str = ""
+    step_count: int = 0
+    max_steps: int = 5
+    finished: bool = False
+    tools_used: Set[str] = field(default_factory=set)  # Track which tools were used
+
+# Names available to calculator expressions, built once at import
+_CALC_NAMES = {k: v for k, v in math.__dict__.items() if not k.startswith("__")}
+_CALC_NAMES.update({"abs": abs, "round": round, "min": min, "max": max})
+_CALC_GLOBALS = {"__builtins__": {}}
+
+# Arithmetic plus direct calls to the math functions above; anything else is rejected
+_ALLOWED_CALC_NODES = (
+    ast.Expression, ast.BinOp, ast.UnaryOp, ast.Constant, ast.Call, ast.Name, ast.Load,
+    ast.Add, ast.Sub, ast.Mult, ast.Div, ast.FloorDiv, ast.Pow, ast.Mod, ast.USub, ast.UAdd
+)
+
+@lru_cache(maxsize=512)
+def compile_expr(expression: str):
+    """Parse, validate and compile an expression once; repeats are a cache hit"""
+    tree = ast.parse(expression.strip(), mode="eval")
+    for node in ast.walk(tree):
+        if not isinstance(node, _ALLOWED_CALC_NODES):
+            raise ValueError(f"Invalid syntax in expression: {type(node).__name__}")
+        if isinstance(node, ast.Name) and node.id not in _CALC_NAMES:
+            raise ValueError(f"Unknown name in expression: {node.id}")
+        if isinstance(node, ast.Call) and not isinstance(node.func, ast.Name):
+            raise ValueError("Only direct calls to math functions are allowed")
+    return compile(tree, "<calculator>", "eval")
 
 # Tool definitions
 def calculator_tool(expression: str) -> str:
     """Calculate mathematical expressions safely"""
     try:
-        # Simple eval for basic math - in production, use a proper math parser
-        allowed_chars = set('0123456789+-*/.() ')
-        if not all(c in allowed_chars for c in expression):
-            return "Error: Invalid characters in expression"
-        result = eval(expression)
+        result = eval(compile_expr(expression), _CALC_GLOBALS, _CALC_NAMES)
         return f"Result: {result}"
     except Exception as e:
         return f"Error: {str(e)}"
 
+# Mock search results, matched with one precompiled alternation
+MOCK_RESULTS = {
+    "weather": "Current weather in New York: 72°F, partly cloudy",
+    "python": "Python is a high-level programming language known for its simplicity",
+    "langgraph": "LangGraph is a framework for building stateful, multi-agent applications"
+}
+# Keys are lowercased once here so they always match the lowercased query
+MOCK_RESULTS = {key.lower(): value for key, value in MOCK_RESULTS.items()}
+_MOCK_KEY_RE = re.compile("|".join(map(re.escape, MOCK_RESULTS)))
+
+# Extracts Thought / Action / Action Input from a reasoning response in one pass.
+# The action input stops at an Observation/Thought line the model may invent after it
+_REACT_RE = re.compile(
+    r"^Thought:\s*(.*?)\s*^Action:\s*(.*?)\s*^Action Input:\s*(.*?)\s*(?=^Observation:|^Thought:|\Z)",
+    re.DOTALL | re.MULTILINE
+)
+
 def web_search_tool(query: str) -> str:
     """Mock web search tool - replace with real API in production"""
-    mock_results = {
-        "weather": "Current weather in New York: 72°F, partly cloudy",
-        "python": "Python is a high-level programming language known for its simplicity",
-        "langgraph": "LangGraph is a framework for building stateful, multi-agent applications"
-    }
-    
-    for key, value in mock_results.items():
-        if key.lower() in query.lower():
-            return value
+    # Find relevant result in a single pass over the query
+    match = _MOCK_KEY_RE.search(query.lower())
+    if match:
+        return MOCK_RESULTS[match.group(0)]
     return f"Search results for '{query}': No specific results found"
 
 # Available tools registry
@@ -73,30 +109,19 @@ TOOLS = {
     "web_search": web_search_tool
 }
 
-def reasoning_node(state: ReActState) -> ReActState:
-    """Agent thinks about what to do next"""
-    llm = ChatGoogleGenerativeAI(model="gemini-2.0-flash-exp")
-    
-    # Build context from previous steps
-    context = f"""
-You are a helpful assistant that uses the ReAct pattern (Reasoning + Acting).
-You have access to these tools: {list(TOOLS.keys())}
+# Initialize LLM behind a semantic cache so repeated reasoning steps skip the model
+llm = CachedLLM(ChatGoogleGenerativeAI(model="gemini-2.0-flash-exp"))
 
-Task: {state['input']}
-Current step: {state['step_count']}
+# Tool catalog rendered once from the registry; it is part of the static system prefix
+TOOL_CATALOG = "\n".join(f"- {name}: {tool.__doc__}" for name, tool in TOOLS.items())
 
-Previous steps:
-"""
-    
-    if state.get('thought'):
-        context += f"Thought: {state['thought']}\n"
-    if state.get('action'):
-        context += f"Action: {state['action']}\n"
-    if state.get('observation'):
-        context += f"Observation: {state['observation']}\n"
-    
-    context += """
-Now think step by step about what to do next. You should:
+# ReAct instructions are static, so the template is parsed once at import;
+# each step only fills in the task and the previous step
+REASONING_SYSTEM = f"""You are a helpful assistant that uses the ReAct pattern (Reasoning + Acting).
+You have access to these tools:
+{TOOL_CATALOG}
+
+Think step by step about what to do next. You should:
 1. Reason about the current situation
 2. Decide if you need to use a tool or if you can provide a final answer
 3. If using a tool, specify which tool and what input to give it
@@ -104,74 +129,231 @@ Now think step by step about what to do next. You should:
 Respond in this format:
 Thought: [Your reasoning about what to do next]
 Action: [tool_name OR "final_answer"]
-Action Input: [input for the tool OR your final answer]
-"""
+Action Input: [input for the tool OR your final answer]"""
+
+REASONING_TMPL = ChatPromptTemplate.from_messages([
+    ("system", REASONING_SYSTEM.replace("{", "{{").replace("}", "}}")),
+    ("human", "Task: {input}\nCurrent step: {step_count}\n\nPrevious steps:\n{previous_steps}")
+])
+
+# Plan templates: queries of a recurring shape ("What is 15% of 250?", "area of a circle
+# with radius 5", "latest news about ...") get the same first step, with only the numbers
+# changed, so that step is replayed from a template instead of asking the model
+_PLAN_CLASSES = {
+    "percent": re.compile(r"\d+\s*%"),
+    "area": re.compile(r"\barea of\b", re.IGNORECASE),
+    "search": re.compile(r"\b(?:latest|current|news)\b", re.IGNORECASE)
+}
+_NUMBER_RE = re.compile(r"\d+(?:\.\d+)?")
+
+class PlanCache:
+    """First reasoning step per query shape; the tool input is stored with its numbers as slots"""
+    
+    def __init__(self):
+        self._plans: Dict[tuple, tuple[str, str]] = {}
+    
+    def _key(self, query: str) -> Optional[tuple]:
+        for name, pattern in _PLAN_CLASSES.items():
+            if pattern.search(query):
+                # Same class and same wording once numbers are blanked out
+                return name, " ".join(_NUMBER_RE.sub("#", query.lower()).split())
+        return None
+    
+    def get(self, query: str) -> Optional[tuple[str, str, str]]:
+        """Return (thought, action, action_input) for this query, or None"""
+        key = self._key(query)
+        plan = self._plans.get(key) if key else None
+        if plan is None:
+            return None
+        action, template = plan
+        thought = f"This matches an earlier {key[0]} question; reusing its first step."
+        return thought, action, template.format(*_NUMBER_RE.findall(query))
+    
+    def put(self, query: str, action: str, action_input: str):
+        """Store a first step if its tool input can be rebuilt from another query's numbers.
+        Numbers from the query become slots and other whole numbers (100, 2) stay as they are;
+        a derived decimal such as 0.15 for "15%" cannot be rebuilt, so that plan is not stored.
+        Neither is a plan where a query number occurs twice: in "radius 2" -> pi * 2**2 the
+        exponent is a constant that happens to equal the radius, and slotting both would be wrong."""
+        key = self._key(query)
+        if key is None or action not in TOOLS:
+            return
+        numbers = _NUMBER_RE.findall(query)
+        used = _NUMBER_RE.findall(action_input)
+        if len(set(numbers)) != len(numbers) or any(used.count(number) > 1 for number in numbers):
+            return
+        
+        def slot(match: re.Match) -> str:
+            if match.group(0) in numbers:
+                return f"{{{numbers.index(match.group(0))}}}"
+            if "." in match.group(0):
+                raise ValueError(match.group(0))
+            return match.group(0)
+        
+        try:
+            template = _NUMBER_RE.sub(slot, action_input.replace("{", "{{").replace("}", "}}"))
+        except ValueError:
+            return
+        self._plans[key] = (action, template)
+    
+    def invalidate(self, query: str):
+        """Drop the plan for this query's shape (e.g. it led to no answer)"""
+        key = self._key(query)
+        if key:
+            self._plans.pop(key, None)
+
+plan_cache = PlanCache()
+
+async def reasoning_node(state: ReActState) -> ReActState:
+    """Agent thinks about what to do next"""
+    # First step of a familiar query shape: replay the cached plan without the model
+    if state.step_count == 0:
+        plan = plan_cache.get(state.input)
+        if plan is not None:
+            state.thought, state.action, state.action_input = plan
+            state.step_count += 1
+            return state
+    
+    # Build context from previous steps
+    previous_steps = []
+    if state.thought:
+        previous_steps.append(f"Thought: {state.thought}")
+    if state.action:
+        previous_steps.append(f"Action: {state.action}")
+    if state.observation:
+        previous_steps.append(f"Observation: {state.observation}")
+    
+    context = REASONING_TMPL.format_messages(
+        input=state.input,
+        step_count=state.step_count,
+        previous_steps="\n".join(previous_steps)
+    )
     
     try:
-        response = llm.invoke(context)
+        response = await llm.ainvoke(context)
         content = response.content
         
         # Parse the response
-        thought = ""
-        action = ""
-        action_input = ""
+        match = _REACT_RE.search(content)
+        if match:
+            thought, action, action_input = (field.strip() for field in match.groups())
+        else:
+            thought, action, action_input = "", "", ""
         
-        for line in content.split('\n'):
-            if line.startswith('Thought:'):
-                thought = line.replace('Thought:', '').strip()
-            elif line.startswith('Action:'):
-                action = line.replace('Action:', '').strip()
-            elif line.startswith('Action Input:'):
-                action_input = line.replace('Action Input:', '').strip()
+        if state.step_count == 0:
+            plan_cache.put(state.input, action, action_input)
         
-        state['thought'] = thought
-        state['action'] = action
-        state['action_input'] = action_input
-        state['step_count'] += 1
+        state.thought = thought
+        state.action = action
+        state.action_input = action_input
+        state.step_count += 1
         
         return state
         
     except Exception as e:
-        state['thought'] = f"Error in reasoning: {str(e)}"
-        state['action'] = "final_answer"
-        state['action_input'] = "I encountered an error while processing your request."
+        state.thought = f"Error in reasoning: {str(e)}"
+        state.action = "final_answer"
+        state.action_input = "I encountered an error while processing your request."
         return state
 
 def action_node(state: ReActState) -> ReActState:
     """Execute the planned action"""
-    action = state['action']
-    action_input = state['action_input']
+    action = state.action
+    action_input = state.action_input
     
     if action == "final_answer":
-        state['final_answer'] = action_input
-        state['finished'] = True
+        state.final_answer = action_input
+        state.finished = True
         return state
     
     # Execute tool
     if action in TOOLS:
         try:
             result = TOOLS[action](action_input)
-            state['observation'] = result
+            state.observation = result
             # Track tool usage
-            if action not in state['tools_used']:
-                state['tools_used'].append(action)
+            state.tools_used.add(action)
         except Exception as e:
-            state['observation'] = f"Tool error: {str(e)}"
+            state.observation = f"Tool error: {str(e)}"
     else:
-        state['observation'] = f"Unknown tool: {action}"
+        state.observation = f"Unknown tool: {action}"
     
     return state
 
 def should_continue(state: ReActState) -> str:
     """Decide whether to continue or finish"""
-    if state['finished']:
+    if state.finished:
         return "end"
-    if state['step_count'] >= state['max_steps']:
-        # Force finish if max steps reached
-        state['final_answer'] = "I've reached the maximum number of steps. Based on my analysis so far, I cannot complete this task fully."
+    if state.step_count >= state.max_steps:
+        # Force finish if max steps reached; the plan that got us here is not worth replaying
+        plan_cache.invalidate(state.input)
+        state.final_answer = "I've reached the maximum number of steps. Based on my analysis so far, I cannot complete this task fully."
         return "end"
     return "continue"
 
+# Speculative reasoning: observations from earlier identical tool calls predict the next one
+_OBSERVATIONS: Dict[tuple, str] = {}
+
+async def act_and_speculate(state: ReActState) -> tuple[ReActState, Optional[ReActState]]:
+    """Run the planned tool; when its result is predictable, reason about the next step meanwhile.
+    Returns the new state and the next reasoning step if the prediction held, else None."""
+    key = (state.action, state.action_input)
+    predicted = _OBSERVATIONS.get(key)
+    if predicted is None:
+        state = await asyncio.to_thread(action_node, state)
+        _OBSERVATIONS[key] = state.observation
+        return state, None
+    
+    # Reason on a copy that assumes the predicted observation while the real tool call runs
+    guess = replace(state, observation=predicted)
+    state, speculative = await asyncio.gather(
+        asyncio.to_thread(action_node, state),
+        reasoning_node(guess)
+    )
+    _OBSERVATIONS[key] = state.observation
+    if state.observation != predicted:
+        return state, None
+    speculative.tools_used = state.tools_used
+    return state, speculative
+
+async def run_react(state: ReActState) -> ReActState:
+    """Run the ReAct loop step by step, printing each thought, action and observation"""
+    speculative = None
+    
+    for step in range(state.max_steps):
+        print(f"\n🔄 Step {step + 1}:")
+        
+        # Reasoning step (already done if the last tool call's speculation held)
+        if speculative is not None:
+            state, speculative = speculative, None
+            print("⚡ Reasoned during the previous tool call")
+        else:
+            state = await reasoning_node(state)
+        print(f"💭 Thought: {state.thought}")
+        print(f"🎯 Planned Action: {state.action}")
+        print(f"📥 Action Input: {state.action_input}")
+        
+        # Action step
+        if state.action == "final_answer":
+            print(f"✅ Final Answer: {state.action_input}")
+            break
+        elif state.action in TOOLS:
+            print(f"🔧 Using Tool: {state.action}")
+            state, speculative = await act_and_speculate(state)
+            print(f"📤 Tool Result: {state.observation}")
+        else:
+            state = action_node(state)
+            print(f"❌ Tool Error: {state.observation}")
+        
+        # Check if we should continue
+        if state.finished or state.step_count >= state.max_steps:
+            if not state.finished:
+                print(f"⏰ Reached max steps ({state.max_steps})")
+                plan_cache.invalidate(state.input)
+            break
+    
+    return state
+
 # Build the ReAct Graph
 def create_react_agent():
     builder = StateGraph(ReActState)
@@ -208,57 +390,19 @@ if __name__ == "__main__":
         if user_input.lower() in {"exit", "quit"}:
             break
         
-        # Initial state
-        initial_state = {
-            "input": user_input,
-            "thought": "",
-            "action": "",
-            "action_input": "",
-            "observation": "",
-            "final_answer": "",
-            "step_count": 0,
-            "max_steps": 5,
-            "finished": False,
-            "tools_used": []  # Initialize empty tools list
-        }
+        # Initial state (empty fields and tools set come from the dataclass defaults)
+        initial_state = ReActState(input=user_input, max_steps=5)
         
         print("\n🔄 ReAct Process:")
         print("-" * 50)
         
         # Run the agent with step-by-step streaming
-        current_state = initial_state
-        
-        for step in range(initial_state["max_steps"]):
-            print(f"\n🔄 Step {step + 1}:")
-            
-            # Reasoning step
-            current_state = reasoning_node(current_state)
-            print(f"💭 Thought: {current_state['thought']}")
-            print(f"🎯 Planned Action: {current_state['action']}")
-            print(f"📥 Action Input: {current_state['action_input']}")
-            
-            # Action step
-            if current_state['action'] == "final_answer":
-                print(f"✅ Final Answer: {current_state['action_input']}")
-                break
-            elif current_state['action'] in TOOLS:
-                print(f"🔧 Using Tool: {current_state['action']}")
-                current_state = action_node(current_state)
-                print(f"📤 Tool Result: {current_state['observation']}")
-            else:
-                current_state = action_node(current_state)
-                print(f"❌ Tool Error: {current_state['observation']}")
-            
-            # Check if we should continue
-            if current_state['finished'] or current_state['step_count'] >= current_state['max_steps']:
-                if not current_state['finished']:
-                    print(f"⏰ Reached max steps ({current_state['max_steps']})")
-                break
+        current_state = asyncio.run(run_react(initial_state))
         
         # Summary
         print(f"\n📊 Summary:")
-        print(f"   Tools Used: {current_state['tools_used'] if current_state['tools_used'] else 'None'}")
-        print(f"   Total Steps: {current_state['step_count']}")
+        print(f"   Tools Used: {', '.join(sorted(current_state.tools_used)) or 'None'}")
+        print(f"   Total Steps: {current_state.step_count}")
         print("-" * 50)
         print()
 
@@ -1,12 +1,10 @@
 from langgraph.graph import StateGraph, END
 from langchain_google_genai import ChatGoogleGenerativeAI
-from dotenv import load_dotenv
 from typing import TypedDict, List
-import os
-
-# Load Gemini API Key
-load_dotenv()
-os.environ["GOOGLE_API_KEY"] = os.getenv("GOOGLE_API_KEY")
+from pydantic import BaseModel, Field
+from types import MappingProxyType
+import asyncio
+import config as _env  # noqa: F401  (loads .env once)
 
 # Define state schema for recursive essay writing
 class EssayState(TypedDict):
@@ -21,7 +19,15 @@ class EssayState(TypedDict):
 # Initialize LLM
 llm = ChatGoogleGenerativeAI(model="gemini-2.0-flash-exp")
 
-def write_initial_essay(state: EssayState) -> EssayState:
+# Critique and rewrite come back together from one call, parsed by the model's function calling
+class EssayRevision(BaseModel):
+    critique: str = Field(description="Constructive criticism of the essay")
+    satisfied: bool = Field(description="True if the essay is already excellent and needs no changes")
+    improved_essay: str = Field(default="", description="The rewritten essay, empty if satisfied")
+
+_revision_llm = llm.with_structured_output(EssayRevision)
+
+async def write_initial_essay(state: EssayState) -> EssayState:
     """Generate the first draft of the essay"""
     print(f"📝 Writing initial essay (Iteration {state['iteration_count'] + 1})")
     
@@ -36,23 +42,23 @@ def write_initial_essay(state: EssayState) -> EssayState:
     """
     
     try:
-        response = llm.invoke(prompt)
+        response = await llm.ainvoke(prompt)
         state["current_essay"] = response.content
         state["iteration_count"] = 1
         state["improvement_history"].append(f"Initial essay written")
-        print("✅ Initial essay completed")
+        print("\n✅ Initial essay completed")
         return state
     except Exception as e:
         state["current_essay"] = f"❌ Error writing essay: {str(e)}"
         state["is_satisfied"] = True  # Stop on error
         return state
 
-def critique_essay(state: EssayState) -> EssayState:
-    """Analyze the current essay and provide detailed critique"""
-    print(f"🔍 Critiquing essay (Iteration {state['iteration_count']})")
+async def critique_and_improve_essay(state: EssayState) -> EssayState:
+    """Critique the current essay and rewrite it to address the critique in a single call"""
+    print(f"🔍 Critiquing and improving essay (Iteration {state['iteration_count']})")
     
     prompt = f"""
-    Analyze this essay and provide constructive criticism:
+    Analyze this essay and provide constructive criticism, then rewrite it addressing the critique:
     
     ESSAY:
     {state['current_essay']}
@@ -64,52 +70,36 @@ def critique_essay(state: EssayState) -> EssayState:
     4. Engagement and flow
     5. Areas for improvement
     
-    Provide specific suggestions for improvement. If the essay is already excellent, say "SATISFIED".
+    If the essay is already excellent, mark it satisfied and leave the rewrite empty.
+    Otherwise rewrite the essay addressing all the points in your critique.
+    Make it better while maintaining the core message and topic.
     """
     
     try:
-        response = llm.invoke(prompt)
-        state["critique"] = response.content
+        revision = await _revision_llm.ainvoke(prompt)
+        state["critique"] = revision.critique
         
         # Check if AI is satisfied with the essay
-        if "SATISFIED" in response.content.upper():
+        if revision.satisfied:
             state["is_satisfied"] = True
             print("✅ AI is satisfied with the essay quality!")
-        else:
-            print("📋 Critique completed - improvements needed")
-            
-        return state
-    except Exception as e:
-        state["critique"] = f"❌ Error critiquing essay: {str(e)}"
-        state["is_satisfied"] = True  # Stop on error
-        return state
+            return state
 
-def improve_essay(state: EssayState) -> EssayState:
-    """Improve the essay based on the critique"""
-    print(f"🔧 Improving essay (Iteration {state['iteration_count']})")
-    
-    prompt = f"""
-    Improve this essay based on the critique provided:
-    
-    CURRENT ESSAY:
-    {state['current_essay']}
-    
-    CRITIQUE:
-    {state['critique']}
-    
-    Please rewrite the essay addressing all the points mentioned in the critique.
-    Make it better while maintaining the core message and topic.
-    """
-    
-    try:
-        response = llm.invoke(prompt)
-        state["current_essay"] = response.content
+        # Unsatisfied with no rewrite means truncated or malformed output, not approval:
+        # keep the current essay and spend an iteration so the loop retries within its bound
+        if not revision.improved_essay:
+            state["iteration_count"] += 1
+            state["improvement_history"].append(f"Iteration {state['iteration_count'] - 1}: Rewrite missing, essay kept")
+            print("⚠️ Critique came back without a rewrite; retrying")
+            return state
+
+        state["current_essay"] = revision.improved_essay
         state["iteration_count"] += 1
         state["improvement_history"].append(f"Iteration {state['iteration_count'] - 1}: Improved based on critique")
         print("✅ Essay improved")
         return state
     except Exception as e:
-        state["current_essay"] = f"❌ Error improving essay: {str(e)}"
+        state["critique"] = f"❌ Error critiquing essay: {str(e)}"
         state["is_satisfied"] = True  # Stop on error
         return state
 
@@ -151,30 +141,59 @@ def build_recursive_essay_graph():
     
     # Add nodes
     builder.add_node("write_initial", write_initial_essay)
-    builder.add_node("critique", critique_essay)
-    builder.add_node("improve", improve_essay)
+    builder.add_node("critique_and_improve", critique_and_improve_essay)
     builder.add_node("finalize", finalize_essay)
     
     # Define the flow
     builder.set_entry_point("write_initial")
-    builder.add_edge("write_initial", "critique")
     
-    # Conditional branching based on critique
+    # Check the iteration limit before every critique, including the first, so no
+    # critique is requested that could not be acted on
     builder.add_conditional_edges(
-        "critique",
+        "write_initial",
         should_continue,
         {
-            "continue": "improve",
+            "continue": "critique_and_improve",
+            "finish": "finalize"
+        }
+    )
+    
+    # Conditional branching based on critique; continuing loops back for another revision
+    builder.add_conditional_edges(
+        "critique_and_improve",
+        should_continue,
+        {
+            "continue": "critique_and_improve",
             "finish": "finalize"
         }
     )
     
-    # After improvement, go back to critique (creating the loop)
-    builder.add_edge("improve", "critique")
     builder.add_edge("finalize", END)
     
     return builder.compile()
 
+# Fields every run starts with; read-only so a turn cannot leak changes into the next.
+# improvement_history is left out on purpose: each run needs its own list
+_ESSAY_TEMPLATE = MappingProxyType({
+    "current_essay": "",
+    "critique": "",
+    "iteration_count": 0,
+    "is_satisfied": False
+})
+
+# Streaming: the first draft is plain text, so print it as it is written
+async def stream_essay(graph, initial_state: EssayState) -> EssayState:
+    """Run the graph, printing the initial draft's tokens as they arrive"""
+    result = initial_state
+    async for mode, chunk in graph.astream(initial_state, stream_mode=["messages", "values"]):
+        if mode == "messages":
+            message, metadata = chunk
+            if metadata.get("langgraph_node") == "write_initial":
+                print(message.content, end="", flush=True)
+        else:
+            result = chunk
+    return result
+
 # Run the recursive essay writer
 if __name__ == "__main__":
     graph = build_recursive_essay_graph()
@@ -193,16 +212,8 @@ if __name__ == "__main__":
         except ValueError:
             max_iterations = 3
         
-        # Initialize state
-        initial_state = {
-            "topic": topic,
-            "current_essay": "",
-            "critique": "",
-            "iteration_count": 0,
-            "max_iterations": max_iterations,
-            "improvement_history": [],
-            "is_satisfied": False
-        }
+        # Initialize state from the template, with a fresh history list per run
+        initial_state = dict(_ESSAY_TEMPLATE, topic=topic, max_iterations=max_iterations, improvement_history=[])
         
         print(f"\n🎯 Starting recursive essay writing process...")
         print(f"Topic: {topic}")
@@ -211,7 +222,7 @@ if __name__ == "__main__":
         
         # Run the graph
         try:
-            result = graph.invoke(initial_state)
+            result = asyncio.run(stream_essay(graph, initial_state))
             print(f"\n✅ Process completed successfully!")
         except Exception as e:
             print(f"\n❌ Error during execution: {str(e)}")
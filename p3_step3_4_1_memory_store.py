@@ -1,15 +1,12 @@
 from langgraph.graph import StateGraph
 from langchain_google_genai import ChatGoogleGenerativeAI
-from dotenv import load_dotenv
+from langchain_core.messages import SystemMessage, HumanMessage, AIMessage
 from typing import TypedDict, List, Dict, Any
-import os
 import json
 import datetime
 from pathlib import Path
-
-# Load Gemini API Key
-load_dotenv()
-os.environ["GOOGLE_API_KEY"] = os.getenv("GOOGLE_API_KEY")
+import config as _env  # noqa: F401  (loads .env once)
+from semantic_cache import CachedLLM
 
 # Define state schema with memory
 class MemoryState(TypedDict):
@@ -25,20 +22,34 @@ class LocalMemoryStore:
     def __init__(self, storage_path: str = "memory_store"):
         self.storage_path = Path(storage_path)
         self.storage_path.mkdir(exist_ok=True)
+        # Parsed conversations, loaded from disk on first access and kept in sync on append
+        self._cache: Dict[str, List[Dict[str, Any]]] = {}
+        # Running user-message count per session, so summaries need not rescan the history
+        self._user_counts: Dict[str, int] = {}
+    
+    def _file_path(self, session_id: str) -> Path:
+        return self.storage_path / f"{session_id}.jsonl"
     
-    def save_conversation(self, session_id: str, conversation: List[Dict[str, Any]]):
-        """Save conversation to local file"""
-        file_path = self.storage_path / f"{session_id}.json"
-        with open(file_path, 'w') as f:
-            json.dump(conversation, f, indent=2)
+    def append_message(self, session_id: str, message: Dict[str, Any]):
+        """Append one message to the session's local file (one JSON object per line)"""
+        self.load_conversation(session_id).append(message)
+        if message['role'] == 'user':
+            self._user_counts[session_id] += 1
+        with open(self._file_path(session_id), 'a') as f:
+            f.write(json.dumps(message, separators=(",", ":")) + "\n")
     
     def load_conversation(self, session_id: str) -> List[Dict[str, Any]]:
-        """Load conversation from local file"""
-        file_path = self.storage_path / f"{session_id}.json"
-        if file_path.exists():
-            with open(file_path, 'r') as f:
-                return json.load(f)
-        return []
+        """Load conversation from local file; later calls are served from memory"""
+        conversation = self._cache.get(session_id)
+        if conversation is None:
+            conversation = []
+            file_path = self._file_path(session_id)
+            if file_path.exists():
+                with open(file_path, 'r') as f:
+                    conversation = [json.loads(line) for line in f.read().splitlines() if line]
+            self._cache[session_id] = conversation
+            self._user_counts[session_id] = sum(msg['role'] == 'user' for msg in conversation)
+        return conversation
     
     def get_memory_summary(self, session_id: str) -> str:
         """Generate a summary of conversation history"""
@@ -47,7 +58,7 @@ class LocalMemoryStore:
             return "No previous conversation history."
         
         # Simple summary - in practice, you'd use an LLM to summarize
-        total_exchanges = len([msg for msg in conversation if msg['role'] == 'user'])
+        total_exchanges = self._user_counts[session_id]
         recent_topics = [msg['content'][:50] + "..." for msg in conversation[-3:] if msg['role'] == 'user']
         
         return f"Session has {total_exchanges} exchanges. Recent topics: {', '.join(recent_topics)}"
@@ -55,52 +66,57 @@ class LocalMemoryStore:
 # Initialize memory store
 memory_store = LocalMemoryStore()
 
+# Initialize LLM once behind a semantic cache: a question close to one already
+# answered (same numbers, similar wording) is served without calling the model.
+# Only a session's opening turn goes through the cache; later turns depend on the history.
+# Opening turns carry no history, so they share one scope and identical openers hit across sessions
+chat_llm = ChatGoogleGenerativeAI(model="gemini-2.0-flash-exp")
+llm = CachedLLM(chat_llm)
+OPENING_TURN_SCOPE = "opening"
+
+# Static instructions go first and never change, so the prompt prefix stays identical
+# across turns; per-turn context (memory summary) goes in the trailing user message
+SYSTEM_PROMPT = SystemMessage(content="Please respond considering the conversation history and context.")
+_ROLE_MESSAGES = {"user": HumanMessage, "assistant": AIMessage}
+
 def memory_node(state: MemoryState) -> MemoryState:
     """Node that processes input with memory context"""
     user_input = state["input"]
     session_id = state["session_id"]
     
-    # Load existing conversation
+    # Load existing conversation (cached after the first turn of a session)
     conversation_history = memory_store.load_conversation(session_id)
     
-    # Add current input to history
-    conversation_history.append({
-        "role": "user",
-        "content": user_input,
-        "timestamp": datetime.datetime.now().isoformat()
-    })
-    
     # Get memory summary for context
     memory_summary = memory_store.get_memory_summary(session_id)
     
-    # Create context-aware prompt
-    context_prompt = f"""
-    Memory Summary: {memory_summary}
-    
-    Recent conversation history:
-    {chr(10).join([f"{msg['role']}: {msg['content']}" for msg in conversation_history[-5:]])}
-    
-    Current user input: {user_input}
-    
-    Please respond considering the conversation history and context.
-    """
-    
-    llm = ChatGoogleGenerativeAI(model="gemini-2.0-flash-exp")
+    # Create context-aware prompt: static system prefix, recent turns oldest-first, then this turn
+    context_messages = [
+        SYSTEM_PROMPT,
+        *(_ROLE_MESSAGES[msg["role"]](content=msg["content"]) for msg in conversation_history[-4:]),
+        HumanMessage(content=f"{user_input}\n\nMemory Summary: {memory_summary}")
+    ]
     
     try:
-        response = llm.invoke(context_prompt)
+        if conversation_history:
+            response = chat_llm.invoke(context_messages)
+        else:
+            response = llm.invoke(context_messages, cache_key=user_input, cache_scope=OPENING_TURN_SCOPE)
         ai_response = response.content
         
-        # Add AI response to history
-        conversation_history.append({
+        # Append this exchange to history; each message is one line added to the session file
+        now = datetime.datetime.now().isoformat()
+        memory_store.append_message(session_id, {
+            "role": "user",
+            "content": user_input,
+            "timestamp": now
+        })
+        memory_store.append_message(session_id, {
             "role": "assistant",
             "content": ai_response,
-            "timestamp": datetime.datetime.now().isoformat()
+            "timestamp": now
         })
         
-        # Save updated conversation
-        memory_store.save_conversation(session_id, conversation_history)
-        
         return {
             "input": user_input,
             "output": ai_response,
@@ -145,7 +161,7 @@ if __name__ == "__main__":
             print(f"📝 New session started: {current_session}")
             continue
         elif text.lower() == "sessions":
-            sessions = list(memory_store.storage_path.glob("*.json"))
+            sessions = list(memory_store.storage_path.glob("*.jsonl"))
             print(f"📁 Available sessions: {[s.stem for s in sessions]}")
             continue
         
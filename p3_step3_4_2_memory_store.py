@@ -1,20 +1,25 @@
 from langgraph.graph import StateGraph
 from langchain_google_genai import ChatGoogleGenerativeAI
-from dotenv import load_dotenv
-from typing import TypedDict, List, Dict, Any
-import os
+from langchain_core.messages import SystemMessage, HumanMessage, AIMessage
+from typing import TypedDict, List, Dict, Any, Sequence
+import asyncio
+import atexit
 import datetime
+import os
+import pickle
 from collections import defaultdict, deque
+from itertools import islice
+import config as _env  # noqa: F401  (loads .env once)
+from semantic_cache import CachedLLM
 
-# Load Gemini API Key
-load_dotenv()
-os.environ["GOOGLE_API_KEY"] = os.getenv("GOOGLE_API_KEY")
+# Chat message type for each stored role
+_ROLE_MESSAGES = {"user": HumanMessage, "assistant": AIMessage}
 
 # Define state schema
 class InMemoryState(TypedDict):
     input: str
     output: str
-    conversation_history: List[Dict[str, Any]]
+    conversation_history: Sequence[Dict[str, Any]]  # The store's live deque, not a copy
     session_id: str
     memory_summary: str
 
@@ -25,51 +30,80 @@ class InMemoryStore:
         self.conversations: Dict[str, deque] = defaultdict(lambda: deque(maxlen=max_history_per_session))
         self.session_metadata: Dict[str, Dict] = {}
         self.max_history = max_history_per_session
+        # Running per-session message counts, so summaries need not rescan the history
+        self._user_count: Dict[str, int] = defaultdict(int)
+        self._ai_count: Dict[str, int] = defaultdict(int)
+        # The same messages split by role, for callers that want only one side of the conversation
+        self.user_msgs: Dict[str, deque] = defaultdict(lambda: deque(maxlen=max_history_per_session))
+        self.ai_msgs: Dict[str, deque] = defaultdict(lambda: deque(maxlen=max_history_per_session))
+        # The last few messages already built as chat messages, ready to drop into a prompt
+        self._chat_messages: Dict[str, deque] = defaultdict(lambda: deque(maxlen=5))
+        # Hash of each session's last answered user input, to catch an input sent twice in a row
+        self.last_user_hash: Dict[str, int] = {}
     
     def add_message(self, session_id: str, role: str, content: str):
         """Add a message to session history"""
+        # One clock read per message, shared by the message and the session metadata
+        now = datetime.datetime.now().isoformat()
         message = {
             "role": role,
             "content": content,
-            "timestamp": datetime.datetime.now().isoformat()
+            "timestamp": now
         }
         self.conversations[session_id].append(message)
+        if role == "user":
+            self._user_count[session_id] += 1
+            self.user_msgs[session_id].append(message)
+        elif role == "assistant":
+            self._ai_count[session_id] += 1
+            self.ai_msgs[session_id].append(message)
+        self._chat_messages[session_id].append(_ROLE_MESSAGES[role](content=content))
         
         # Update session metadata
         if session_id not in self.session_metadata:
             self.session_metadata[session_id] = {
-                "created_at": datetime.datetime.now().isoformat(),
+                "created_at": now,
                 "message_count": 0
             }
         self.session_metadata[session_id]["message_count"] += 1
-        self.session_metadata[session_id]["last_activity"] = datetime.datetime.now().isoformat()
+        self.session_metadata[session_id]["last_activity"] = now
     
-    def get_conversation(self, session_id: str) -> List[Dict[str, Any]]:
-        """Get conversation history for a session"""
-        return list(self.conversations[session_id])
+    def get_conversation(self, session_id: str) -> deque:
+        """Get conversation history for a session (the live deque, not a copy)"""
+        return self.conversations[session_id]
     
     def get_recent_messages(self, session_id: str, count: int = 5) -> List[Dict[str, Any]]:
         """Get recent messages from a session"""
-        conversation = self.get_conversation(session_id)
-        return conversation[-count:] if conversation else []
+        conversation = self.conversations[session_id]
+        return list(islice(conversation, max(0, len(conversation) - count), None))
+    
+    def get_messages_by_role(self, session_id: str, role: str) -> deque:
+        """Get a session's user or assistant messages only, oldest first"""
+        return self.user_msgs[session_id] if role == "user" else self.ai_msgs[session_id]
+    
+    def get_recent_chat_messages(self, session_id: str) -> deque:
+        """Get the last 5 messages as chat messages, oldest first"""
+        return self._chat_messages[session_id]
     
     def get_memory_summary(self, session_id: str) -> str:
         """Generate memory summary"""
-        conversation = self.get_conversation(session_id)
-        if not conversation:
+        if not self.conversations[session_id]:
             return "New conversation started."
         
-        user_messages = [msg for msg in conversation if msg['role'] == 'user']
-        ai_messages = [msg for msg in conversation if msg['role'] == 'assistant']
-        
         metadata = self.session_metadata.get(session_id, {})
         
-        return f"Session: {len(user_messages)} user messages, {len(ai_messages)} AI responses. Started: {metadata.get('created_at', 'Unknown')}"
+        return f"Session: {self._user_count[session_id]} user messages, {self._ai_count[session_id]} AI responses. Started: {metadata.get('created_at', 'Unknown')}"
     
     def clear_session(self, session_id: str):
         """Clear a specific session"""
         if session_id in self.conversations:
             self.conversations[session_id].clear()
+            self._user_count.pop(session_id, None)
+            self._ai_count.pop(session_id, None)
+            self.user_msgs.pop(session_id, None)
+            self.ai_msgs.pop(session_id, None)
+            self._chat_messages.pop(session_id, None)
+            self.last_user_hash.pop(session_id, None)
             if session_id in self.session_metadata:
                 del self.session_metadata[session_id]
     
@@ -77,6 +111,38 @@ class InMemoryStore:
         """List all active sessions"""
         return list(self.conversations.keys())
     
+    def save(self, path: str):
+        """Snapshot all sessions to one pickle file (written to a temp file, then swapped in)"""
+        snapshot = {
+            "max_history": self.max_history,
+            "conversations": {sid: list(conv) for sid, conv in self.conversations.items()},
+            "session_metadata": self.session_metadata,
+            "user_count": dict(self._user_count),
+            "ai_count": dict(self._ai_count)
+        }
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'wb') as f:
+            pickle.dump(snapshot, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+    
+    @classmethod
+    def load(cls, path: str) -> "InMemoryStore":
+        """Restore a store from a snapshot written by save()"""
+        with open(path, 'rb') as f:
+            snapshot = pickle.load(f)
+        store = cls(max_history_per_session=snapshot["max_history"])
+        for sid, messages in snapshot["conversations"].items():
+            store.conversations[sid].extend(messages)
+            store.user_msgs[sid].extend(msg for msg in messages if msg["role"] == "user")
+            store.ai_msgs[sid].extend(msg for msg in messages if msg["role"] == "assistant")
+            store._chat_messages[sid].extend(
+                _ROLE_MESSAGES[msg["role"]](content=msg["content"]) for msg in messages[-5:]
+            )
+        store.session_metadata = snapshot["session_metadata"]
+        store._user_count.update(snapshot["user_count"])
+        store._ai_count.update(snapshot["ai_count"])
+        return store
+    
     def get_session_stats(self) -> Dict[str, Any]:
         """Get statistics about all sessions"""
         total_sessions = len(self.conversations)
@@ -91,43 +157,66 @@ class InMemoryStore:
 # Initialize in-memory store
 memory_store = InMemoryStore(max_history_per_session=50)
 
-def smart_memory_node(state: InMemoryState) -> InMemoryState:
+# Where the CLI snapshots the store on exit and restores it on start
+SNAPSHOT_PATH = "memory_store.pkl"
+
+# Initialize LLM once behind a semantic cache: a question close to one already
+# answered (same numbers, similar wording) is served without calling the model.
+# Only a session's opening turn goes through the cache; later turns depend on the history.
+# Opening turns carry no history, so they share one scope and identical openers hit across sessions
+chat_llm = ChatGoogleGenerativeAI(model="gemini-2.0-flash-exp")
+llm = CachedLLM(chat_llm)
+OPENING_TURN_SCOPE = "opening"
+
+# Static instructions go first and never change, so the prompt prefix stays identical
+# across turns; per-turn context (memory summary) goes in the trailing user message
+SYSTEM_PROMPT = SystemMessage(content="Please respond naturally, considering the conversation context.")
+
+async def smart_memory_node(state: InMemoryState) -> InMemoryState:
     """Node with intelligent memory management"""
     user_input = state["input"]
     session_id = state["session_id"]
     
+    # Same input as the last answered one (e.g. enter pressed twice): repeat that answer
+    input_hash = hash(" ".join(user_input.lower().split()))
+    if memory_store.last_user_hash.get(session_id) == input_hash and memory_store.ai_msgs[session_id]:
+        ai_response = memory_store.ai_msgs[session_id][-1]["content"]
+        memory_store.add_message(session_id, "user", user_input)
+        memory_store.add_message(session_id, "assistant", ai_response)
+        return {
+            "input": user_input,
+            "output": ai_response,
+            "conversation_history": memory_store.get_conversation(session_id),
+            "session_id": session_id,
+            "memory_summary": memory_store.get_memory_summary(session_id)
+        }
+    
     # Add user input to memory
     memory_store.add_message(session_id, "user", user_input)
     
-    # Get recent context (last 5 messages)
-    recent_messages = memory_store.get_recent_messages(session_id, 5)
+    # Get recent context (last 5 messages, already built when they were stored)
+    recent_messages = memory_store.get_recent_chat_messages(session_id)
     memory_summary = memory_store.get_memory_summary(session_id)
     
-    # Create intelligent context prompt
-    context_lines = []
-    if recent_messages:
-        context_lines.append("Recent conversation context:")
-        for msg in recent_messages[:-1]:  # Exclude current message
-            context_lines.append(f"{msg['role']}: {msg['content']}")
-        context_lines.append("")
-    
-    context_lines.append(f"Current user input: {user_input}")
-    context_lines.append(f"Memory summary: {memory_summary}")
-    context_lines.append("")
-    context_lines.append("Please respond naturally, considering the conversation context.")
-    
-    context_prompt = "\n".join(context_lines)
-    
-    llm = ChatGoogleGenerativeAI(model="gemini-2.0-flash-exp")
+    # Create intelligent context prompt: static system prefix, recent turns oldest-first, then this turn
+    context_messages = [
+        SYSTEM_PROMPT,
+        *islice(recent_messages, len(recent_messages) - 1),  # Exclude current message
+        HumanMessage(content=f"{user_input}\n\nMemory summary: {memory_summary}")
+    ]
     
     try:
-        response = llm.invoke(context_prompt)
+        if len(recent_messages) > 1:
+            response = await chat_llm.ainvoke(context_messages)
+        else:
+            response = await llm.ainvoke(context_messages, cache_key=user_input, cache_scope=OPENING_TURN_SCOPE)
         ai_response = response.content
         
         # Add AI response to memory
         memory_store.add_message(session_id, "assistant", ai_response)
+        memory_store.last_user_hash[session_id] = input_hash
         
-        # Get updated conversation history
+        # Get updated conversation history (a view of the session, no copy)
         conversation_history = memory_store.get_conversation(session_id)
         
         return {
@@ -141,6 +230,7 @@ def smart_memory_node(state: InMemoryState) -> InMemoryState:
     except Exception as e:
         error_msg = f"❌ Error: {str(e)}"
         memory_store.add_message(session_id, "assistant", error_msg)
+        memory_store.last_user_hash.pop(session_id, None)  # Let the same input retry
         
         return {
             "input": user_input,
@@ -157,6 +247,26 @@ builder.set_entry_point("smart_memory")
 builder.set_finish_point("smart_memory")
 graph = builder.compile()
 
+# Streaming: print the reply tokens as the model produces them
+async def stream_turn(state: InMemoryState) -> InMemoryState:
+    """Print smart_memory tokens as they arrive and return the final graph state"""
+    result = state
+    streamed = False
+    print("🤖 Gemini: ", end="", flush=True)
+    async for mode, chunk in graph.astream(state, stream_mode=["messages", "values"]):
+        if mode == "messages":
+            message, metadata = chunk
+            if metadata.get("langgraph_node") == "smart_memory":
+                print(message.content, end="", flush=True)
+                streamed = True
+        else:
+            result = chunk
+    # Replies served from a cache are not streamed, so print them whole
+    if not streamed:
+        print(result["output"], end="")
+    print()
+    return result
+
 # Enhanced CLI interface
 def print_commands():
     print("\n🔧 Available Commands:")
@@ -171,6 +281,11 @@ def print_commands():
 
 # Run with enhanced session management
 if __name__ == "__main__":
+    # Restore sessions from the last run and snapshot them again on exit
+    if os.path.exists(SNAPSHOT_PATH):
+        memory_store = InMemoryStore.load(SNAPSHOT_PATH)
+    atexit.register(lambda: memory_store.save(SNAPSHOT_PATH))
+    
     print("🧠 Smart In-Memory Agent Started!")
     print_commands()
     
@@ -228,10 +343,10 @@ if __name__ == "__main__":
             "memory_summary": ""
         }
         
-        result = graph.invoke(state)
+        # Run the graph, printing the reply as it streams
+        result = asyncio.run(stream_turn(state))
         
-        # Print the output with enhanced info
-        print("🤖 Gemini:", result["output"])
+        # Print the enhanced info
         print(f"💭 {result['memory_summary']}")
         print(f"📊 Messages in session: {len(result['conversation_history'])}")
         print("-" * 50)
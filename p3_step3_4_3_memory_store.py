@@ -1,18 +1,21 @@
 from langgraph.graph import StateGraph
 from langchain_google_genai import ChatGoogleGenerativeAI
-from dotenv import load_dotenv
 from typing import TypedDict, List, Dict, Any, Optional
+import asyncio
 import os
 import json
+import base64
+import zlib
 import datetime
 import redis
 from redis.connection import ConnectionPool
 import time
-import hashlib
-
-# Load environment variables
-load_dotenv()
-os.environ["GOOGLE_API_KEY"] = os.getenv("GOOGLE_API_KEY")
+import itertools
+import logging
+from collections import OrderedDict, deque
+from itertools import islice
+from operator import itemgetter
+import config as _env  # noqa: F401  (loads .env once)
 
 # Define state schema
 class RedisMemoryState(TypedDict):
@@ -23,111 +26,256 @@ class RedisMemoryState(TypedDict):
     memory_summary: str
     user_id: Optional[str]
 
+# Store errors go through a logger: records are formatted only if a handler emits them,
+# and with no logging configured, errors still reach stderr via logging's last-resort handler
+log = logging.getLogger(__name__)
+
+# Message contents longer than this are stored zlib-compressed (base64 so the entry stays JSON text)
+COMPRESS_MIN_BYTES = 512
+
+def _encode_message(message: Dict[str, Any]) -> str:
+    """Serialize a message for Redis, compressing a long content field"""
+    content = message["content"].encode()
+    if len(content) > COMPRESS_MIN_BYTES:
+        message = {**message, "content": base64.b64encode(zlib.compress(content, 1)).decode(), "z": 1}
+    return json.dumps(message, separators=(",", ":"))
+
+def _decode_message(raw: str) -> Dict[str, Any]:
+    message = json.loads(raw)
+    if message.pop("z", 0):
+        message["content"] = zlib.decompress(base64.b64decode(message["content"])).decode()
+    return message
+
+def _message_count(raw: Optional[str]) -> int:
+    """A session's message_count from Redis; a missing (expired) session counts as 0"""
+    return int(raw or 0)
+
 class RedisMemoryStore:
     """Production-ready Redis memory store"""
     
     def __init__(self, 
                  redis_url: str = "redis://localhost:6379",
-                 max_connections: int = 10,
+                 max_connections: Optional[int] = None,
                  session_ttl: int = 86400,  # 24 hours
                  max_messages_per_session: int = 1000):
         
         self.session_ttl = session_ttl
         self.max_messages = max_messages_per_session
         
-        # Create connection pool for better performance
+        # The CLI runs one turn at a time, so a few connections are plenty; REDIS_POOL_SIZE overrides
+        if max_connections is None:
+            max_connections = int(os.getenv("REDIS_POOL_SIZE", min(4, os.cpu_count() or 2)))
+        
+        # Create connection pool for better performance; replies come back as str,
+        # and idle connections are kept alive and health-checked instead of reopened
         self.pool = ConnectionPool.from_url(
             redis_url,
             max_connections=max_connections,
-            retry_on_timeout=True
+            retry_on_timeout=True,
+            decode_responses=True,
+            socket_keepalive=True,
+            health_check_interval=30
         )
-        self.redis_client = redis.Redis(connection_pool=self.pool)
+        # With a single connection, pin it to the client and skip the per-command pool checkout
+        self.redis_client = redis.Redis(connection_pool=self.pool, single_connection_client=max_connections == 1)
+        
+        # Process-local, write-through copy of each session's last messages (LRU over sessions),
+        # so reads right after this process's own writes skip the LRANGE. Each entry keeps the
+        # session's message_count it was read at; a different count in Redis (writes from another
+        # process, or the session expiring) means the copy is stale and the list is read again
+        self._recent_cache: OrderedDict[str, tuple[int, List[Dict[str, Any]]]] = OrderedDict()
+        self._recent_cache_limit = 100
+        self._recent_cache_sessions = 64
+        self._key_cache: OrderedDict[str, tuple[bytes, bytes]] = OrderedDict()
+        
+        # Message ids: a per-process prefix (pid + start time) and a counter, no hashing of content
+        self._id_prefix = f"{os.getpid():x}{int(time.time()):x}-"
+        self._id_counter = itertools.count()
         
         # Test connection
         try:
             self.redis_client.ping()
-            print("✅ Redis connection established")
+            log.info("Redis connection established")
         except redis.ConnectionError:
-            print("❌ Redis connection failed - make sure Redis is running")
+            log.error("Redis connection failed - make sure Redis is running")
             raise
     
-    def _get_session_key(self, session_id: str) -> str:
-        """Generate Redis key for session"""
-        return f"session:{session_id}"
-    
-    def _get_metadata_key(self, session_id: str) -> str:
-        """Generate Redis key for session metadata"""
-        return f"metadata:{session_id}"
+    def _keys(self, session_id: str) -> tuple[bytes, bytes]:
+        """Redis keys for a session's message list and metadata, built once per session"""
+        keys = self._key_cache.get(session_id)
+        if keys is None:
+            encoded = session_id.encode()
+            keys = self._key_cache[session_id] = (b"session:" + encoded, b"metadata:" + encoded)
+            if len(self._key_cache) > 4096:
+                self._key_cache.popitem(last=False)
+        return keys
     
     def _get_user_sessions_key(self, user_id: str) -> str:
         """Generate Redis key for user's sessions"""
         return f"user_sessions:{user_id}"
     
+    def _queue_message(self, pipe, session_id: str, role: str, content: str, user_id: Optional[str] = None) -> Dict[str, Any]:
+        """Queue the commands that append a message onto pipe; returns the message"""
+        # Create message object; timestamps are integer epoch milliseconds, read once per message
+        now_ms = int(time.time() * 1000)
+        message = {
+            "role": role,
+            "content": content,
+            "timestamp": now_ms,
+            "id": f"{self._id_prefix}{next(self._id_counter):x}"
+        }
+        
+        session_key, metadata_key = self._keys(session_id)
+        
+        # Add message to the end of the session list (stored oldest to newest)
+        pipe.rpush(session_key, _encode_message(message))
+        
+        # Trim list to max messages (keep most recent)
+        pipe.ltrim(session_key, -self.max_messages, -1)
+        
+        # Update metadata; HINCRBY counts server-side, so nothing is read before execute()
+        metadata = {"last_activity": now_ms}
+        if user_id:
+            metadata["user_id"] = user_id
+        pipe.hset(metadata_key, mapping=metadata)
+        pipe.hincrby(metadata_key, "message_count", 1)
+        
+        # Set TTL for session and metadata
+        pipe.expire(session_key, self.session_ttl)
+        pipe.expire(metadata_key, self.session_ttl)
+        
+        # Add session to user's session list if user_id provided
+        if user_id:
+            user_sessions_key = self._get_user_sessions_key(user_id)
+            pipe.sadd(user_sessions_key, session_id)
+            pipe.expire(user_sessions_key, self.session_ttl)
+        
+        return message
+    
+    def _cache_append(self, session_id: str, message: Dict[str, Any], message_count: int):
+        """Add this process's own write to the cached copy, dropping it if other writes came in between"""
+        entry = self._recent_cache.get(session_id)
+        if entry is None:
+            return
+        cached_count, cached = entry
+        if cached_count != message_count - 1:
+            del self._recent_cache[session_id]
+            return
+        cached.append(message)
+        del cached[:-self._recent_cache_limit]
+        self._recent_cache[session_id] = (message_count, cached)
+    
     def add_message(self, session_id: str, role: str, content: str, user_id: Optional[str] = None):
         """Add a message to session with atomic operations"""
         pipe = self.redis_client.pipeline()
         
         try:
-            # Create message object
-            message = {
-                "role": role,
-                "content": content,
-                "timestamp": datetime.datetime.now().isoformat(),
-                "id": hashlib.md5(f"{session_id}:{role}:{content}:{time.time()}".encode()).hexdigest()[:8]
-            }
-            
-            session_key = self._get_session_key(session_id)
-            metadata_key = self._get_metadata_key(session_id)
+            message = self._queue_message(pipe, session_id, role, content, user_id)
             
-            # Add message to session list
-            pipe.lpush(session_key, json.dumps(message))
+            # Execute all operations atomically; the fourth reply is the HINCRBY'd message_count
+            results = pipe.execute()
             
-            # Trim list to max messages (keep most recent)
-            pipe.ltrim(session_key, 0, self.max_messages - 1)
+            self._cache_append(session_id, message, results[3])
+            return message
             
-            # Update metadata
-            metadata = {
-                "last_activity": datetime.datetime.now().isoformat(),
-                "message_count": self.redis_client.llen(session_key) + 1,
-                "user_id": user_id
-            }
-            pipe.hset(metadata_key, mapping=metadata)
-            
-            # Set TTL for session and metadata
-            pipe.expire(session_key, self.session_ttl)
-            pipe.expire(metadata_key, self.session_ttl)
-            
-            # Add session to user's session list if user_id provided
-            if user_id:
-                user_sessions_key = self._get_user_sessions_key(user_id)
-                pipe.sadd(user_sessions_key, session_id)
-                pipe.expire(user_sessions_key, self.session_ttl)
+        except Exception:
+            log.exception("adding message failed for session %s", session_id)
+            raise
+    
+    def write_and_read_context(self, session_id: str, role: str, content: str,
+                               user_id: Optional[str] = None, limit: int = 100) -> tuple[List[Dict[str, Any]], Dict[str, Any], str]:
+        """Append a message and fetch the context that includes it in a single round-trip.
+        Returns the same (conversation, metadata, summary) triple as get_context_bundle."""
+        limit = min(limit, self._recent_cache_limit)
+        session_key, metadata_key = self._keys(session_id)
+        # Non-transactional: the reads are queued after the writes, so they already see the new message
+        pipe = self.redis_client.pipeline(transaction=False)
+        
+        try:
+            message = self._queue_message(pipe, session_id, role, content, user_id)
+            reread = session_id not in self._recent_cache
+            if reread:
+                pipe.lrange(session_key, -self._recent_cache_limit, -1)
+            pipe.hgetall(metadata_key)
+            results = pipe.execute()
             
-            # Execute all operations atomically
-            pipe.execute()
+            metadata = results[-1]
+            message_count = _message_count(metadata.get("message_count"))
+            if reread:
+                cached = self._parse_messages(results[-2])
+                self._cache_put(session_id, message_count, cached)
+            else:
+                self._cache_append(session_id, message, message_count)
+                cached = self._cache_get(session_id, message_count)
+                if cached is None:
+                    cached = self._reload(session_id, message_count)
             
-        except Exception as e:
-            print(f"❌ Error adding message: {e}")
+        except Exception:
+            log.exception("writing context failed for session %s", session_id)
             raise
+        
+        conversation = cached[-limit:]
+        return conversation, metadata, self._summarize(conversation[-50:], metadata)
+    
+    def _parse_messages(self, raw_messages: List[str]) -> List[Dict[str, Any]]:
+        """Parse LRANGE results; the list is stored in chronological order"""
+        conversation = []
+        for msg in raw_messages:
+            try:
+                conversation.append(_decode_message(msg))
+            except (json.JSONDecodeError, zlib.error, ValueError):
+                continue
+        return conversation
+    
+    def _cache_get(self, session_id: str, message_count: int) -> Optional[List[Dict[str, Any]]]:
+        """Cached messages, or None if there are none or they were read at a different message_count"""
+        entry = self._recent_cache.get(session_id)
+        if entry is None:
+            return None
+        if entry[0] != message_count:
+            del self._recent_cache[session_id]
+            return None
+        self._recent_cache.move_to_end(session_id)
+        return entry[1]
+    
+    def _cache_put(self, session_id: str, message_count: int, conversation: List[Dict[str, Any]]):
+        self._recent_cache[session_id] = (message_count, conversation)
+        self._recent_cache.move_to_end(session_id)
+        if len(self._recent_cache) > self._recent_cache_sessions:
+            self._recent_cache.popitem(last=False)
+    
+    def _reload(self, session_id: str, message_count: int) -> List[Dict[str, Any]]:
+        """Re-read a session's recent messages after the cached copy went stale"""
+        session_key, _ = self._keys(session_id)
+        conversation = self._parse_messages(self.redis_client.lrange(session_key, -self._recent_cache_limit, -1))
+        self._cache_put(session_id, message_count, conversation)
+        return conversation
     
     def get_conversation(self, session_id: str, limit: int = 100) -> List[Dict[str, Any]]:
-        """Get conversation history (most recent first)"""
+        """Get conversation history (oldest first)"""
         try:
-            session_key = self._get_session_key(session_id)
-            messages = self.redis_client.lrange(session_key, 0, limit - 1)
+            if limit > self._recent_cache_limit:
+                session_key, _ = self._keys(session_id)
+                return self._parse_messages(self.redis_client.lrange(session_key, -limit, -1))
             
-            # Parse and reverse to get chronological order
-            conversation = []
-            for msg in reversed(messages):
-                try:
-                    conversation.append(json.loads(msg.decode('utf-8')))
-                except json.JSONDecodeError:
-                    continue
-            
-            return conversation
+            session_key, metadata_key = self._keys(session_id)
+            if session_id in self._recent_cache:
+                # A cached copy costs one HGET to validate instead of the LRANGE
+                message_count = _message_count(self.redis_client.hget(metadata_key, "message_count"))
+                cached = self._cache_get(session_id, message_count)
+                if cached is None:
+                    cached = self._reload(session_id, message_count)
+            else:
+                pipe = self.redis_client.pipeline(transaction=False)
+                pipe.lrange(session_key, -self._recent_cache_limit, -1)
+                pipe.hget(metadata_key, "message_count")
+                raw_messages, raw_count = pipe.execute()
+                cached = self._parse_messages(raw_messages)
+                self._cache_put(session_id, _message_count(raw_count), cached)
+            return cached[-limit:]
             
-        except Exception as e:
-            print(f"❌ Error getting conversation: {e}")
+        except Exception:
+            log.exception("getting conversation failed for session %s", session_id)
             return []
     
     def get_recent_messages(self, session_id: str, count: int = 5) -> List[Dict[str, Any]]:
@@ -138,76 +286,103 @@ class RedisMemoryStore:
     def get_session_metadata(self, session_id: str) -> Dict[str, Any]:
         """Get session metadata"""
         try:
-            metadata_key = self._get_metadata_key(session_id)
-            metadata = self.redis_client.hgetall(metadata_key)
-            
-            # Decode bytes to strings
-            return {k.decode('utf-8'): v.decode('utf-8') for k, v in metadata.items()}
+            _, metadata_key = self._keys(session_id)
+            return self.redis_client.hgetall(metadata_key)
             
-        except Exception as e:
-            print(f"❌ Error getting metadata: {e}")
+        except Exception:
+            log.exception("getting metadata failed for session %s", session_id)
             return {}
     
+    def get_context_bundle(self, session_id: str, limit: int = 100) -> tuple[List[Dict[str, Any]], Dict[str, Any], str]:
+        """Fetch conversation and metadata in one round-trip; returns (conversation, metadata, summary).
+        The conversation is a copy, safe for callers to extend."""
+        limit = min(limit, self._recent_cache_limit)
+        session_key, metadata_key = self._keys(session_id)
+        try:
+            if session_id in self._recent_cache:
+                metadata = self.redis_client.hgetall(metadata_key)
+                message_count = _message_count(metadata.get("message_count"))
+                cached = self._cache_get(session_id, message_count)
+                if cached is None:
+                    cached = self._reload(session_id, message_count)
+            else:
+                pipe = self.redis_client.pipeline(transaction=False)
+                pipe.lrange(session_key, -self._recent_cache_limit, -1)
+                pipe.hgetall(metadata_key)
+                raw_messages, metadata = pipe.execute()
+                cached = self._parse_messages(raw_messages)
+                self._cache_put(session_id, _message_count(metadata.get("message_count")), cached)
+        except Exception:
+            log.exception("getting context failed for session %s", session_id)
+            return [], {}, "Error generating memory summary."
+        
+        conversation = cached[-limit:]
+        return conversation, metadata, self._summarize(conversation[-50:], metadata)
+    
     def get_memory_summary(self, session_id: str) -> str:
         """Generate intelligent memory summary"""
+        conversation = self.get_conversation(session_id, 50)  # Last 50 messages
+        metadata = self.get_session_metadata(session_id)
+        return self._summarize(conversation, metadata)
+    
+    def _summarize(self, conversation: List[Dict[str, Any]], metadata: Dict[str, Any]) -> str:
+        """Build the summary line from an already-fetched conversation and metadata"""
         try:
-            conversation = self.get_conversation(session_id, 50)  # Last 50 messages
-            metadata = self.get_session_metadata(session_id)
-            
             if not conversation:
                 return "New conversation session."
             
-            user_messages = [msg for msg in conversation if msg['role'] == 'user']
-            ai_messages = [msg for msg in conversation if msg['role'] == 'assistant']
+            # One pass: count user messages and keep the last 3 of them
+            user_count = 0
+            recent_user = deque(maxlen=3)
+            for msg in conversation:
+                if msg['role'] == 'user':
+                    user_count += 1
+                    recent_user.append(msg['content'][:30])
             
-            # Calculate session age
-            if metadata.get('last_activity'):
-                try:
-                    last_activity = datetime.datetime.fromisoformat(metadata['last_activity'])
-                    age = datetime.datetime.now() - last_activity
-                    age_str = f"{age.seconds // 3600}h {(age.seconds % 3600) // 60}m ago"
-                except:
-                    age_str = "recently"
+            # Calculate session age (sessions written before the switch to epoch ms show "recently")
+            last_activity = metadata.get('last_activity', "")
+            if last_activity.isdigit():
+                age_seconds = (int(time.time() * 1000) - int(last_activity)) // 1000
+                age_str = f"{age_seconds // 3600}h {(age_seconds % 3600) // 60}m ago"
             else:
                 age_str = "recently"
             
             # Recent topics (last 3 user messages)
-            recent_topics = [msg['content'][:30] + "..." for msg in user_messages[-3:]]
+            recent_topics = [topic + "..." for topic in recent_user]
             
-            return f"Session: {len(user_messages)} exchanges, last active {age_str}. Recent: {', '.join(recent_topics)}"
+            return f"Session: {user_count} exchanges, last active {age_str}. Recent: {', '.join(recent_topics)}"
             
-        except Exception as e:
-            print(f"❌ Error generating summary: {e}")
+        except Exception:
+            log.exception("generating summary failed")
             return "Error generating memory summary."
     
     def clear_session(self, session_id: str):
         """Clear a session and its metadata"""
         try:
-            session_key = self._get_session_key(session_id)
-            metadata_key = self._get_metadata_key(session_id)
+            session_key, metadata_key = self._keys(session_id)
             
             pipe = self.redis_client.pipeline()
             pipe.delete(session_key)
             pipe.delete(metadata_key)
             pipe.execute()
+            self._recent_cache.pop(session_id, None)
             
-        except Exception as e:
-            print(f"❌ Error clearing session: {e}")
+        except Exception:
+            log.exception("clearing session failed for session %s", session_id)
     
     def list_sessions(self, user_id: Optional[str] = None) -> List[str]:
         """List all sessions or user's sessions"""
         try:
             if user_id:
                 user_sessions_key = self._get_user_sessions_key(user_id)
-                sessions = self.redis_client.smembers(user_sessions_key)
-                return [s.decode('utf-8') for s in sessions]
+                return list(self.redis_client.smembers(user_sessions_key))
             else:
-                # Get all session keys
-                session_keys = self.redis_client.keys("session:*")
-                return [key.decode('utf-8').replace('session:', '') for key in session_keys]
+                # Get all session keys; SCAN walks the keyspace in steps instead of blocking the server like KEYS
+                session_keys = self.redis_client.scan_iter(match="session:*", count=500)
+                return [key[len('session:'):] for key in session_keys]
                 
-        except Exception as e:
-            print(f"❌ Error listing sessions: {e}")
+        except Exception:
+            log.exception("listing sessions failed")
             return []
     
     def get_redis_stats(self) -> Dict[str, Any]:
@@ -221,32 +396,39 @@ class RedisMemoryStore:
                 "keyspace_hits": info.get('keyspace_hits', 0),
                 "keyspace_misses": info.get('keyspace_misses', 0)
             }
-        except Exception as e:
-            print(f"❌ Error getting Redis stats: {e}")
+        except Exception:
+            log.exception("getting Redis stats failed")
             return {}
     
     def cleanup_expired_sessions(self):
         """Manual cleanup of expired sessions (Redis handles this automatically)"""
         try:
-            # Get all session keys
-            session_keys = self.redis_client.keys("session:*")
-            metadata_keys = self.redis_client.keys("metadata:*")
+            # Walk session keys with SCAN and probe their TTLs 200 keys per round-trip
+            session_keys = self.redis_client.scan_iter(match="session:*", count=500)
             
+            total_sessions = 0
             expired_count = 0
-            for key in session_keys:
-                ttl = self.redis_client.ttl(key)
-                if ttl == -1:  # No TTL set
-                    self.redis_client.expire(key, self.session_ttl)
-                elif ttl == -2:  # Key doesn't exist
-                    expired_count += 1
+            while batch := list(islice(session_keys, 200)):
+                total_sessions += len(batch)
+                pipe = self.redis_client.pipeline(transaction=False)
+                for key in batch:
+                    pipe.ttl(key)
+                ttls = pipe.execute()
+                
+                for key, ttl in zip(batch, ttls):
+                    if ttl == -1:  # No TTL set
+                        pipe.expire(key, self.session_ttl)
+                    elif ttl == -2:  # Key doesn't exist
+                        expired_count += 1
+                pipe.execute()
             
             return {
-                "total_sessions": len(session_keys),
+                "total_sessions": total_sessions,
                 "expired_sessions": expired_count
             }
             
-        except Exception as e:
-            print(f"❌ Error during cleanup: {e}")
+        except Exception:
+            log.exception("session cleanup failed")
             return {}
 
 # Initialize Redis memory store
@@ -261,47 +443,51 @@ except Exception as e:
     print("Please ensure Redis is running and accessible")
     exit(1)
 
-def redis_memory_node(state: RedisMemoryState) -> RedisMemoryState:
+# Initialize LLM once; every turn reuses the same client and its connections
+llm = ChatGoogleGenerativeAI(model="gemini-2.0-flash-exp")
+
+# Pulls (role, content) out of a stored message for the prompt's history lines
+_role_content = itemgetter("role", "content")
+
+async def redis_memory_node(state: RedisMemoryState) -> RedisMemoryState:
     """Node with Redis-backed memory"""
     user_input = state["input"]
     session_id = state["session_id"]
     user_id = state.get("user_id")
     
-    # Add user input to Redis
-    memory_store.add_message(session_id, "user", user_input, user_id)
-    
-    # Get recent context
-    recent_messages = memory_store.get_recent_messages(session_id, 6)
-    memory_summary = memory_store.get_memory_summary(session_id)
+    # Redis calls run in worker threads so they never block the event loop
+    # Store the user input and get history, metadata and summary back in one round-trip
+    conversation_history, _, memory_summary = await asyncio.to_thread(
+        memory_store.write_and_read_context, session_id, "user", user_input, user_id
+    )
+    recent_messages = conversation_history[-6:]
     
     # Create context-aware prompt
     context_lines = []
     if recent_messages:
         context_lines.append("Recent conversation context:")
-        for msg in recent_messages[:-1]:  # Exclude current message
-            context_lines.append(f"{msg['role']}: {msg['content']}")
+        # Exclude current message
+        context_lines.extend(f"{role}: {content}" for role, content in map(_role_content, recent_messages[:-1]))
         context_lines.append("")
     
-    context_lines.extend([
-        f"Current user input: {user_input}",
-        f"Session context: {memory_summary}",
-        "",
+    context_lines.append(
+        f"Current user input: {user_input}\n"
+        f"Session context: {memory_summary}\n"
+        "\n"
         "Please respond naturally, considering the conversation history and context."
-    ])
+    )
     
     context_prompt = "\n".join(context_lines)
     
-    llm = ChatGoogleGenerativeAI(model="gemini-2.0-flash-exp")
-    
     try:
-        response = llm.invoke(context_prompt)
+        response = await llm.ainvoke(context_prompt)
         ai_response = response.content
         
-        # Add AI response to Redis
-        memory_store.add_message(session_id, "assistant", ai_response, user_id)
-        
-        # Get updated conversation
-        conversation_history = memory_store.get_conversation(session_id)
+        # Add AI response to Redis, and to the history already in hand instead of re-reading it
+        conversation_history.append(
+            await asyncio.to_thread(memory_store.add_message, session_id, "assistant", ai_response, user_id)
+        )
+        conversation_history = conversation_history[-100:]
         
         return {
             "input": user_input,
@@ -314,12 +500,14 @@ def redis_memory_node(state: RedisMemoryState) -> RedisMemoryState:
         
     except Exception as e:
         error_msg = f"❌ Error: {str(e)}"
-        memory_store.add_message(session_id, "assistant", error_msg, user_id)
+        conversation_history.append(
+            await asyncio.to_thread(memory_store.add_message, session_id, "assistant", error_msg, user_id)
+        )
         
         return {
             "input": user_input,
             "output": error_msg,
-            "conversation_history": memory_store.get_conversation(session_id),
+            "conversation_history": conversation_history[-100:],
             "session_id": session_id,
             "memory_summary": memory_summary,
             "user_id": user_id
@@ -348,102 +536,128 @@ def print_redis_commands():
     print("  exit                 - Quit the program")
     print("-" * 60)
 
+# CLI command handlers; `cli` holds the current session and user
+def _cmd_user(cli: dict, arg: str):
+    if arg:
+        cli["user"] = arg.split()[0]
+        print(f"👤 User set to: {cli['user']}")
+    else:
+        print("❌ Usage: user <user_id>")
+
+def _cmd_new_session(cli: dict, arg: str):
+    if arg:
+        cli["session"] = f"session_{arg.split()[0]}"
+    else:
+        cli["session"] = f"session_{datetime.datetime.now().strftime('%H%M%S')}"
+    print(f"📝 New session started: {cli['session']}")
+
+def _cmd_switch(cli: dict, arg: str):
+    if arg:
+        session_name = arg.split()[0]
+        if not session_name.startswith("session_"):
+            session_name = f"session_{session_name}"
+        cli["session"] = session_name
+        print(f"📝 Switched to session: {cli['session']}")
+    else:
+        print("❌ Usage: switch <session>")
+
+def _cmd_help(cli: dict, arg: str):
+    print_redis_commands()
+
+def _cmd_sessions(cli: dict, arg: str):
+    sessions = memory_store.list_sessions()
+    if sessions:
+        print(f"📁 All sessions ({len(sessions)}):")
+        for session in sessions[:10]:  # Show first 10
+            metadata = memory_store.get_session_metadata(session)
+            user_info = f"[{metadata.get('user_id', 'unknown')}]" if metadata.get('user_id') else ""
+            print(f"  {session} {user_info} - {metadata.get('message_count', 0)} messages")
+        if len(sessions) > 10:
+            print(f"  ... and {len(sessions) - 10} more")
+    else:
+        print("📁 No sessions found")
+
+def _cmd_my_sessions(cli: dict, arg: str):
+    current_user = cli["user"]
+    if current_user:
+        sessions = memory_store.list_sessions(current_user)
+        if sessions:
+            print(f"📁 {current_user}'s sessions ({len(sessions)}):")
+            for session in sessions:
+                metadata = memory_store.get_session_metadata(session)
+                print(f"  {session} - {metadata.get('message_count', 0)} messages")
+        else:
+            print(f"📁 No sessions found for {current_user}")
+    else:
+        print("❌ Set user ID first with 'user <user_id>'")
+
+def _cmd_clear(cli: dict, arg: str):
+    memory_store.clear_session(cli["session"])
+    print(f"🗑️ Session {cli['session']} cleared")
+
+def _cmd_metadata(cli: dict, arg: str):
+    metadata = memory_store.get_session_metadata(cli["session"])
+    if metadata:
+        print(f"📊 Session Metadata for {cli['session']}:")
+        for key, value in metadata.items():
+            print(f"  {key}: {value}")
+    else:
+        print(f"📊 No metadata found for {cli['session']}")
+
+def _cmd_redis_stats(cli: dict, arg: str):
+    stats = memory_store.get_redis_stats()
+    print(f"📊 Redis Server Statistics:")
+    for key, value in stats.items():
+        print(f"  {key}: {value}")
+
+def _cmd_cleanup(cli: dict, arg: str):
+    result = memory_store.cleanup_expired_sessions()
+    print(f"🧹 Cleanup completed: {result}")
+
+# Commands that take an argument, matched on the first word
+CLI_COMMANDS = {
+    "user": _cmd_user,
+    "new_session": _cmd_new_session,
+    "switch": _cmd_switch
+}
+# Commands that must be the whole input, so a chat message starting with the word still reaches the agent
+CLI_PLAIN_COMMANDS = {
+    "help": _cmd_help,
+    "sessions": _cmd_sessions,
+    "my_sessions": _cmd_my_sessions,
+    "clear": _cmd_clear,
+    "metadata": _cmd_metadata,
+    "redis_stats": _cmd_redis_stats,
+    "cleanup": _cmd_cleanup
+}
+
 # Main application loop
 if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
     print("🚀 Redis Memory Agent Started!")
     print_redis_commands()
     
-    current_session = f"session_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}"
-    current_user = None
+    cli = {
+        "session": f"session_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}",
+        "user": None
+    }
     
-    print(f"📝 Current session: {current_session}")
+    print(f"📝 Current session: {cli['session']}")
     
     while True:
-        user_display = f"[{current_user}]" if current_user else ""
-        session_display = current_session.replace("session_", "")
+        user_display = f"[{cli['user']}]" if cli["user"] else ""
+        session_display = cli["session"].replace("session_", "")
         
         text = input(f"🧑 {user_display}[{session_display}] You: ")
         
-        if text.lower() in {"exit", "quit"}:
+        # One split and one dict lookup decide whether the input is a command
+        command, _, arg = text.strip().partition(" ")
+        command, arg = command.lower(), arg.strip()
+        if command in {"exit", "quit"} and not arg:
             break
-        elif text.lower() == "help":
-            print_redis_commands()
-            continue
-        elif text.lower().startswith("user "):
-            parts = text.split()
-            if len(parts) > 1:
-                current_user = parts[1]
-                print(f"👤 User set to: {current_user}")
-            else:
-                print("❌ Usage: user <user_id>")
-            continue
-        elif text.lower().startswith("new_session"):
-            parts = text.split()
-            if len(parts) > 1:
-                current_session = f"session_{parts[1]}"
-            else:
-                current_session = f"session_{datetime.datetime.now().strftime('%H%M%S')}"
-            print(f"📝 New session started: {current_session}")
-            continue
-        elif text.lower().startswith("switch "):
-            parts = text.split()
-            if len(parts) > 1:
-                session_name = parts[1]
-                if not session_name.startswith("session_"):
-                    session_name = f"session_{session_name}"
-                current_session = session_name
-                print(f"📝 Switched to session: {current_session}")
-            else:
-                print("❌ Usage: switch <session>")
-            continue
-        elif text.lower() == "sessions":
-            sessions = memory_store.list_sessions()
-            if sessions:
-                print(f"📁 All sessions ({len(sessions)}):")
-                for session in sessions[:10]:  # Show first 10
-                    metadata = memory_store.get_session_metadata(session)
-                    user_info = f"[{metadata.get('user_id', 'unknown')}]" if metadata.get('user_id') else ""
-                    print(f"  {session} {user_info} - {metadata.get('message_count', 0)} messages")
-                if len(sessions) > 10:
-                    print(f"  ... and {len(sessions) - 10} more")
-            else:
-                print("📁 No sessions found")
-            continue
-        elif text.lower() == "my_sessions":
-            if current_user:
-                sessions = memory_store.list_sessions(current_user)
-                if sessions:
-                    print(f"📁 {current_user}'s sessions ({len(sessions)}):")
-                    for session in sessions:
-                        metadata = memory_store.get_session_metadata(session)
-                        print(f"  {session} - {metadata.get('message_count', 0)} messages")
-                else:
-                    print(f"📁 No sessions found for {current_user}")
-            else:
-                print("❌ Set user ID first with 'user <user_id>'")
-            continue
-        elif text.lower() == "clear":
-            memory_store.clear_session(current_session)
-            print(f"🗑️ Session {current_session} cleared")
-            continue
-        elif text.lower() == "metadata":
-            metadata = memory_store.get_session_metadata(current_session)
-            if metadata:
-                print(f"📊 Session Metadata for {current_session}:")
-                for key, value in metadata.items():
-                    print(f"  {key}: {value}")
-            else:
-                print(f"📊 No metadata found for {current_session}")
-            continue
-        elif text.lower() == "redis_stats":
-            stats = memory_store.get_redis_stats()
-            print(f"📊 Redis Server Statistics:")
-            for key, value in stats.items():
-                print(f"  {key}: {value}")
-            continue
-        elif text.lower() == "cleanup":
-            result = memory_store.cleanup_expired_sessions()
-            print(f"🧹 Cleanup completed: {result}")
+        handler = CLI_COMMANDS.get(command) or (None if arg else CLI_PLAIN_COMMANDS.get(command))
+        if handler:
+            handler(cli, arg)
             continue
         
         # Process regular message
@@ -451,12 +665,12 @@ if __name__ == "__main__":
             "input": text,
             "output": "",
             "conversation_history": [],
-            "session_id": current_session,
+            "session_id": cli["session"],
             "memory_summary": "",
-            "user_id": current_user
+            "user_id": cli["user"]
         }
         
-        result = graph.invoke(state)
+        result = asyncio.run(graph.ainvoke(state))
         
         # Display response with Redis info
         print("🤖 Gemini:", result["output"])
@@ -465,7 +679,7 @@ if __name__ == "__main__":
         
         # Show metadata occasionally
         if len(result['conversation_history']) % 5 == 0:
-            metadata = memory_store.get_session_metadata(current_session)
+            metadata = memory_store.get_session_metadata(cli["session"])
             if metadata:
                 print(f"🔍 Session info: {metadata.get('message_count', 0)} total messages")
         
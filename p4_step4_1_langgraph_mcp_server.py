@@ -1,149 +1,161 @@
 import asyncio
+import hashlib
 import json
-from typing import Any, Dict, List, Optional, TypedDict
+import logging
+import logging.handlers
+import operator
+import os
+import queue
+import sys
+import time
+from collections import OrderedDict
+from typing import Annotated, Any, Dict, List, Optional, TypedDict
 from mcp.server import Server, NotificationOptions
 from mcp.server.models import InitializationOptions
 from mcp.server.stdio import stdio_server
-from mcp.types import Tool, TextContent, CallToolResult, Resource, GetResourceResult
-from langgraph.graph import StateGraph
-from langchain_google_genai import ChatGoogleGenerativeAI
+from mcp.types import Tool, TextContent, Resource
+from pydantic import AnyUrl
+from langgraph.graph import StateGraph, START, END
+from langgraph.types import Send
+from langchain_google_genai import ChatGoogleGenerativeAI, GoogleGenerativeAIEmbeddings
 from langchain_core.messages import HumanMessage, AIMessage
-from dotenv import load_dotenv
-import os
+from langchain_core.runnables import RunnableConfig
+from semantic_cache import CachedLLM
+import config as _env  # noqa: F401  (loads .env once)
+
+# stdout is the MCP transport, so server messages go to a logger that writes to stderr
+log = logging.getLogger(__name__)
+log.addHandler(logging.NullHandler())
 
-# Load environment variables
-load_dotenv()
-os.environ["GOOGLE_API_KEY"] = os.getenv("GOOGLE_API_KEY")
+def enable_stderr_log(level: int = logging.INFO) -> logging.handlers.QueueListener:
+    """Write log records to stderr from a background thread; the event loop only enqueues them"""
+    records = queue.SimpleQueue()
+    handler = logging.StreamHandler(sys.stderr)
+    handler.setFormatter(logging.Formatter("%(asctime)s %(message)s"))
+    listener = logging.handlers.QueueListener(records, handler)
+    log.addHandler(logging.handlers.QueueHandler(records))
+    log.setLevel(level)
+    listener.start()
+    return listener
 
 # ========== LangGraph State & Nodes ==========
 class AgentState(TypedDict):
-    messages: List[Dict[str, Any]]
+    # Append-only: nodes return just their new messages and LangGraph concatenates them
+    messages: Annotated[List[Dict[str, Any]], operator.add]
     current_step: str
     result: Optional[str]
     error: Optional[str]
 
-# Initialize LLM
+# Initialize LLM once; nodes are async so concurrent tool calls overlap their Gemini requests,
+# and all of them go through this one client and its connections
 llm = ChatGoogleGenerativeAI(model="gemini-2.0-flash-exp")
 
-def reasoning_node(state: AgentState) -> AgentState:
-    """Node that performs reasoning with Gemini"""
-    messages = state["messages"]
-    
-    try:
-        # Get the latest human message
-        latest_message = messages[-1]["content"] if messages else ""
-        
-        # Create reasoning prompt
-        reasoning_prompt = f"""
-        You are a helpful AI assistant. Analyze the following request and provide a thoughtful response:
-        
-        Request: {latest_message}
-        
-        Please provide a clear, helpful response.
-        """
-        
-        response = llm.invoke(reasoning_prompt)
-        
-        # Add AI response to messages
-        messages.append({
-            "role": "assistant",
-            "content": response.content
-        })
-        
-        return {
-            "messages": messages,
-            "current_step": "completed",
-            "result": response.content,
-            "error": None
-        }
-        
-    except Exception as e:
-        return {
-            "messages": messages,
-            "current_step": "error",
-            "result": None,
-            "error": str(e)
-        }
+# Exact-match response cache: repeated prompts to the same node skip the Gemini round trip
+LLM_CACHE_MAX = 512
+LLM_CACHE_TTL = 3600  # seconds
+_llm_cache: "OrderedDict[str, tuple[float, str]]" = OrderedDict()
+cache_stats = {"hits": 0, "misses": 0}
 
-def analysis_node(state: AgentState) -> AgentState:
-    """Node that performs detailed analysis"""
-    messages = state["messages"]
-    
-    try:
-        latest_message = messages[-1]["content"] if messages else ""
-        
-        analysis_prompt = f"""
-        Perform a detailed analysis of the following:
-        
-        Topic: {latest_message}
-        
-        Please provide:
-        1. Key points
-        2. Implications
-        3. Recommendations
-        4. Summary
-        
-        Format your response clearly with numbered sections.
-        """
-        
-        response = llm.invoke(analysis_prompt)
-        
-        messages.append({
-            "role": "assistant",
-            "content": response.content
-        })
-        
-        return {
-            "messages": messages,
-            "current_step": "completed",
-            "result": response.content,
-            "error": None
-        }
-        
-    except Exception as e:
-        return {
-            "messages": messages,
-            "current_step": "error",
-            "result": None,
-            "error": str(e)
-        }
+# Behind it, a semantic cache per node catches rewordings of the same request;
+# separate caches keep e.g. a reasoning answer from being served to the creative agent.
+# They wrap the same llm and share one embeddings client
+embeddings = GoogleGenerativeAIEmbeddings(model="models/text-embedding-004")
+semantic_llms = {node: CachedLLM(llm, embeddings=embeddings) for node in ("reasoning", "analysis", "creative")}
 
-def creative_node(state: AgentState) -> AgentState:
-    """Node that generates creative content"""
-    messages = state["messages"]
+async def cached_invoke(node: str, prompt: str, request: str, on_chunk=None) -> str:
+    """Return the response text for prompt, from the cache when an unexpired entry exists.
+    On an exact miss, request (the user's text) is matched against the node's semantic cache.
+    With on_chunk, the response is streamed and on_chunk(n) is awaited after the n-th chunk."""
+    key = hashlib.sha256(f"{llm.model}|{node}|{prompt}".encode()).hexdigest()
+    entry = _llm_cache.get(key)
+    if entry is not None and time.monotonic() - entry[0] < LLM_CACHE_TTL:
+        _llm_cache.move_to_end(key)
+        cache_stats["hits"] += 1
+        return entry[1]
     
-    try:
-        latest_message = messages[-1]["content"] if messages else ""
-        
-        creative_prompt = f"""
-        Generate creative content based on this request:
-        
-        Request: {latest_message}
-        
-        Be creative, engaging, and original. Use vivid language and interesting perspectives.
-        """
-        
-        response = llm.invoke(creative_prompt)
-        
-        messages.append({
-            "role": "assistant",
-            "content": response.content
-        })
-        
-        return {
-            "messages": messages,
-            "current_step": "completed",
-            "result": response.content,
-            "error": None
-        }
+    cache_stats["misses"] += 1
+    if on_chunk is None:
+        content = (await semantic_llms[node].ainvoke(prompt, cache_key=request)).content
+    else:
+        chunks = []
+        async for chunk in semantic_llms[node].astream(prompt, cache_key=request):
+            chunks.append(chunk.content)
+            await on_chunk(len(chunks))
+        content = "".join(chunks)
+    
+    _llm_cache[key] = (time.monotonic(), content)
+    _llm_cache.move_to_end(key)
+    if len(_llm_cache) > LLM_CACHE_MAX:
+        _llm_cache.popitem(last=False)
+    return content
+
+# Prompt templates, defined once; each call only fills in the request
+_REASONING_PROMPT = """\
+You are a helpful AI assistant. Analyze the following request and provide a thoughtful response:
+
+Request: {msg}
+
+Please provide a clear, helpful response.
+"""
+
+_ANALYSIS_PROMPT = """\
+Perform a detailed analysis of the following:
+
+Topic: {msg}
+
+Please provide:
+1. Key points
+2. Implications
+3. Recommendations
+4. Summary
+
+Format your response clearly with numbered sections.
+"""
+
+_CREATIVE_PROMPT = """\
+Generate creative content based on this request:
+
+Request: {msg}
+
+Be creative, engaging, and original. Use vivid language and interesting perspectives.
+"""
+
+def make_llm_node(prompt_template: str, node_name: str):
+    """Build a node that answers the latest message with Gemini using prompt_template"""
+    async def llm_node(state: AgentState, config: RunnableConfig) -> AgentState:
+        messages = state["messages"]
         
-    except Exception as e:
-        return {
-            "messages": messages,
-            "current_step": "error",
-            "result": None,
-            "error": str(e)
-        }
+        try:
+            # Get the latest human message
+            latest_message = messages[-1]["content"] if messages else ""
+            
+            # When the caller wants progress, stream the response and report each chunk
+            on_progress = config.get("configurable", {}).get("on_progress")
+            
+            prompt = prompt_template.format_map({"msg": latest_message})
+            content = await cached_invoke(node_name, prompt, latest_message, on_progress)
+            
+            return {
+                "messages": [{"role": "assistant", "content": content}],
+                "current_step": "completed",
+                "result": content,
+                "error": None
+            }
+            
+        except Exception as e:
+            return {
+                "messages": [],
+                "current_step": "error",
+                "result": None,
+                "error": str(e)
+            }
+    
+    llm_node.__name__ = f"{node_name}_node"
+    return llm_node
+
+reasoning_node = make_llm_node(_REASONING_PROMPT, "reasoning")
+analysis_node = make_llm_node(_ANALYSIS_PROMPT, "analysis")
+creative_node = make_llm_node(_CREATIVE_PROMPT, "creative")
 
 # ========== Create LangGraph Workflows ==========
 def create_reasoning_graph():
@@ -170,252 +182,370 @@ def create_creative_graph():
     builder.set_finish_point("creative")
     return builder.compile()
 
+# Static single-node graphs, compiled once at import for importers of this module
+# (tool calls run the nodes directly, see _TOOL_REGISTRY)
+reasoning_graph = create_reasoning_graph()
+analysis_graph = create_analysis_graph()
+creative_graph = create_creative_graph()
+
+# ========== Smart Agent: all three nodes in parallel ==========
+class SmartState(TypedDict):
+    query: str
+    # Each worker returns one finding; the reducer concatenates them
+    findings: Annotated[List[Dict[str, str]], operator.add]
+
+_SMART_WORKERS = {"reasoning": reasoning_node, "analysis": analysis_node, "creative": creative_node}
+
+def make_finding_node(node_name: str):
+    """Wrap an agent node so it reads SmartState and reports its answer as a finding"""
+    node = _SMART_WORKERS[node_name]
+    
+    async def finding_node(state: SmartState, config: RunnableConfig) -> Dict[str, Any]:
+        result = await node({
+            "messages": [{"role": "user", "content": state["query"]}],
+            "current_step": node_name,
+            "result": None,
+            "error": None
+        }, config)
+        text = f"Error: {result['error']}" if result["error"] else result["result"]
+        return {"findings": [{"node": node_name, "text": text}]}
+    
+    finding_node.__name__ = f"{node_name}_finding"
+    return finding_node
+
+def fan_out(state: SmartState) -> List[Send]:
+    """Send the query to every worker at once; they run in the same superstep"""
+    return [Send(node_name, state) for node_name in _SMART_WORKERS]
+
+def create_smart_graph():
+    """Create the fan-out workflow that runs every agent on one query"""
+    builder = StateGraph(SmartState)
+    for node_name in _SMART_WORKERS:
+        builder.add_node(node_name, make_finding_node(node_name))
+        builder.add_edge(node_name, END)
+    builder.add_conditional_edges(START, fan_out, list(_SMART_WORKERS))
+    return builder.compile()
+
+smart_graph = create_smart_graph()
+
 # ========== MCP Server Setup ==========
 server = Server("langgraph-mcp-server")
 
-# Global graphs
-reasoning_graph = None
-analysis_graph = None
-creative_graph = None
+# Tool and resource listings are static; build the models once instead of on every list request
+_TOOLS = [
+    Tool(
+        name="reasoning_agent",
+        description="Use LangGraph reasoning agent powered by Gemini to analyze and respond to questions",
+        inputSchema={
+            "type": "object",
+            "properties": {
+                "query": {
+                    "type": "string",
+                    "description": "The question or topic to reason about"
+                }
+            },
+            "required": ["query"]
+        }
+    ),
+    Tool(
+        name="analysis_agent",
+        description="Use LangGraph analysis agent to perform detailed analysis with structured output",
+        inputSchema={
+            "type": "object",
+            "properties": {
+                "topic": {
+                    "type": "string",
+                    "description": "The topic to analyze in detail"
+                }
+            },
+            "required": ["topic"]
+        }
+    ),
+    Tool(
+        name="creative_agent",
+        description="Use LangGraph creative agent to generate creative content, stories, poems, etc.",
+        inputSchema={
+            "type": "object",
+            "properties": {
+                "prompt": {
+                    "type": "string",
+                    "description": "The creative prompt or request"
+                }
+            },
+            "required": ["prompt"]
+        }
+    ),
+    Tool(
+        name="smart_agent",
+        description="Run the reasoning, analysis and creative agents in parallel on one query and return all their responses as a JSON list",
+        inputSchema={
+            "type": "object",
+            "properties": {
+                "query": {
+                    "type": "string",
+                    "description": "The question or topic for all agents"
+                }
+            },
+            "required": ["query"]
+        }
+    ),
+    Tool(
+        name="batch_agent",
+        description="Run several agent tool calls concurrently and return all their responses as a JSON list",
+        inputSchema={
+            "type": "object",
+            "properties": {
+                "calls": {
+                    "type": "array",
+                    "description": "The tool calls to run",
+                    "items": {
+                        "type": "object",
+                        "properties": {
+                            "name": {
+                                "type": "string",
+                                "description": "Agent tool name, e.g. reasoning_agent"
+                            },
+                            "arguments": {
+                                "type": "object",
+                                "description": "Arguments for that tool"
+                            }
+                        },
+                        "required": ["name", "arguments"]
+                    }
+                }
+            },
+            "required": ["calls"]
+        }
+    )
+]
 
 @server.list_tools()
 async def handle_list_tools() -> List[Tool]:
     """List available tools provided by this MCP server"""
-    return [
-        Tool(
-            name="reasoning_agent",
-            description="Use LangGraph reasoning agent powered by Gemini to analyze and respond to questions",
-            inputSchema={
-                "type": "object",
-                "properties": {
-                    "query": {
-                        "type": "string",
-                        "description": "The question or topic to reason about"
-                    }
-                },
-                "required": ["query"]
-            }
-        ),
-        Tool(
-            name="analysis_agent",
-            description="Use LangGraph analysis agent to perform detailed analysis with structured output",
-            inputSchema={
-                "type": "object",
-                "properties": {
-                    "topic": {
-                        "type": "string",
-                        "description": "The topic to analyze in detail"
-                    }
-                },
-                "required": ["topic"]
-            }
-        ),
-        Tool(
-            name="creative_agent",
-            description="Use LangGraph creative agent to generate creative content, stories, poems, etc.",
-            inputSchema={
-                "type": "object",
-                "properties": {
-                    "prompt": {
-                        "type": "string",
-                        "description": "The creative prompt or request"
-                    }
-                },
-                "required": ["prompt"]
-            }
-        )
-    ]
+    return _TOOLS
+
+# Agent tools: name -> (argument holding the user's text, graph entry step, node)
+# Each workflow is a single node, so tool calls run the node directly and skip the Pregel
+# superstep machinery; the compiled graphs above produce the same result
+_TOOL_REGISTRY = {
+    "reasoning_agent": ("query", "reasoning", reasoning_node),
+    "analysis_agent": ("topic", "analysis", analysis_node),
+    "creative_agent": ("prompt", "creative", creative_node)
+}
+
+async def _dispatch(name: str, arguments: Dict[str, Any], on_progress=None) -> str:
+    """Run one agent tool and return its response text; on_progress(n) is awaited per streamed chunk"""
+    entry = _TOOL_REGISTRY.get(name)
+    if entry is None:
+        return f"Unknown tool: {name}"
+    arg_key, step, node = entry
+    
+    state = {
+        "messages": [{"role": "user", "content": arguments.get(arg_key, "")}],
+        "current_step": step,
+        "result": None,
+        "error": None
+    }
+    
+    result = await node(state, {"configurable": {"on_progress": on_progress}})
+    
+    if result["error"]:
+        return f"Error: {result['error']}"
+    return result["result"]
 
 @server.call_tool()
-async def handle_call_tool(name: str, arguments: Dict[str, Any]) -> CallToolResult:
+async def handle_call_tool(name: str, arguments: Dict[str, Any]) -> List[TextContent]:
     """Handle tool calls from MCP clients"""
-    global reasoning_graph, analysis_graph, creative_graph
-    
     try:
-        if name == "reasoning_agent":
-            query = arguments.get("query", "")
-            
-            state = {
-                "messages": [{"role": "user", "content": query}],
-                "current_step": "reasoning",
-                "result": None,
-                "error": None
-            }
-            
-            result = reasoning_graph.invoke(state)
-            
-            if result["error"]:
-                return CallToolResult(
-                    content=[TextContent(type="text", text=f"Error: {result['error']}")]
-                )
-            
-            return CallToolResult(
-                content=[TextContent(type="text", text=result["result"])]
+        if name == "batch_agent":
+            # Run every call concurrently; one failing call doesn't discard the others' results
+            calls = arguments.get("calls", [])
+            results = await asyncio.gather(
+                *(_dispatch(call.get("name", ""), call.get("arguments", {})) for call in calls),
+                return_exceptions=True
             )
-        
-        elif name == "analysis_agent":
-            topic = arguments.get("topic", "")
-            
-            state = {
-                "messages": [{"role": "user", "content": topic}],
-                "current_step": "analysis",
-                "result": None,
-                "error": None
-            }
-            
-            result = analysis_graph.invoke(state)
-            
-            if result["error"]:
-                return CallToolResult(
-                    content=[TextContent(type="text", text=f"Error: {result['error']}")]
-                )
+            batch = [
+                {
+                    "name": call.get("name", ""),
+                    "result": f"Tool execution error: {result}" if isinstance(result, Exception) else result
+                }
+                for call, result in zip(calls, results)
+            ]
             
-            return CallToolResult(
-                content=[TextContent(type="text", text=result["result"])]
-            )
+            return [TextContent(type="text", text=json.dumps(batch))]
         
-        elif name == "creative_agent":
-            prompt = arguments.get("prompt", "")
-            
-            state = {
-                "messages": [{"role": "user", "content": prompt}],
-                "current_step": "creative",
-                "result": None,
-                "error": None
-            }
-            
-            result = creative_graph.invoke(state)
-            
-            if result["error"]:
-                return CallToolResult(
-                    content=[TextContent(type="text", text=f"Error: {result['error']}")]
-                )
+        if name == "smart_agent":
+            result = await smart_graph.ainvoke({"query": arguments.get("query", ""), "findings": []})
             
-            return CallToolResult(
-                content=[TextContent(type="text", text=result["result"])]
-            )
+            return [TextContent(type="text", text=json.dumps(result["findings"]))]
         
-        else:
-            return CallToolResult(
-                content=[TextContent(type="text", text=f"Unknown tool: {name}")]
-            )
+        # Clients that send a progress token get a notification per streamed chunk
+        on_progress = None
+        ctx = server.request_context
+        progress_token = ctx.meta.progressToken if ctx.meta else None
+        if progress_token is not None:
+            async def on_progress(chunks: int):
+                await ctx.session.send_progress_notification(progress_token, chunks)
+        
+        return [TextContent(type="text", text=await _dispatch(name, arguments, on_progress))]
     
     except Exception as e:
-        return CallToolResult(
-            content=[TextContent(type="text", text=f"Tool execution error: {str(e)}")]
-        )
+        log.exception("tool %s failed", name)
+        return [TextContent(type="text", text=f"Tool execution error: {str(e)}")]
+
+_RESOURCES = [
+    Resource(
+        uri="langgraph://workflows/info",
+        name="LangGraph Workflows Info",
+        description="Information about available LangGraph workflows",
+        mimeType="application/json"
+    ),
+    Resource(
+        uri="langgraph://graphs/structure",
+        name="Graph Structure",
+        description="Detailed structure of LangGraph workflows",
+        mimeType="application/json"
+    ),
+    Resource(
+        uri="langgraph://cache/stats",
+        name="Response Cache Stats",
+        description="Hit/miss counters of the LLM response cache",
+        mimeType="application/json"
+    )
+]
 
 @server.list_resources()
 async def handle_list_resources() -> List[Resource]:
     """List available resources"""
-    return [
-        Resource(
-            uri="langgraph://workflows/info",
-            name="LangGraph Workflows Info",
-            description="Information about available LangGraph workflows",
-            mimeType="application/json"
-        ),
-        Resource(
-            uri="langgraph://graphs/structure",
-            name="Graph Structure",
-            description="Detailed structure of LangGraph workflows",
-            mimeType="application/json"
-        )
-    ]
+    return _RESOURCES
+
+# Static resources never change, so their JSON text is built once at import
+_WORKFLOWS_INFO = {
+    "workflows": [
+        {
+            "name": "reasoning_agent",
+            "description": "General reasoning and question answering",
+            "nodes": ["reasoning"],
+            "model": "gemini-2.0-flash-exp"
+        },
+        {
+            "name": "analysis_agent", 
+            "description": "Detailed analysis with structured output",
+            "nodes": ["analysis"],
+            "model": "gemini-2.0-flash-exp"
+        },
+        {
+            "name": "creative_agent",
+            "description": "Creative content generation",
+            "nodes": ["creative"],
+            "model": "gemini-2.0-flash-exp"
+        },
+        {
+            "name": "smart_agent",
+            "description": "All three agents in parallel on one query",
+            "nodes": ["reasoning", "analysis", "creative"],
+            "model": "gemini-2.0-flash-exp"
+        }
+    ],
+    "total_workflows": 4,
+    "server_version": "1.0.0"
+}
+
+_GRAPH_STRUCTURE = {
+    "reasoning_graph": {
+        "entry_point": "reasoning",
+        "finish_point": "reasoning",
+        "nodes": ["reasoning"],
+        "edges": []
+    },
+    "analysis_graph": {
+        "entry_point": "analysis",
+        "finish_point": "analysis", 
+        "nodes": ["analysis"],
+        "edges": []
+    },
+    "creative_graph": {
+        "entry_point": "creative",
+        "finish_point": "creative",
+        "nodes": ["creative"],
+        "edges": []
+    },
+    "smart_graph": {
+        "entry_point": "__start__",
+        "finish_point": "__end__",
+        "nodes": ["reasoning", "analysis", "creative"],
+        "edges": [
+            ["__start__", "reasoning"], ["__start__", "analysis"], ["__start__", "creative"],
+            ["reasoning", "__end__"], ["analysis", "__end__"], ["creative", "__end__"]
+        ]
+    }
+}
+
+_STATIC_RESOURCES = {
+    "langgraph://workflows/info": json.dumps(_WORKFLOWS_INFO, indent=2),
+    "langgraph://graphs/structure": json.dumps(_GRAPH_STRUCTURE, indent=2)
+}
 
 @server.read_resource()
-async def handle_read_resource(uri: str) -> GetResourceResult:
+async def handle_read_resource(uri: AnyUrl) -> str:
     """Handle resource requests"""
-    if uri == "langgraph://workflows/info":
-        info = {
-            "workflows": [
-                {
-                    "name": "reasoning_agent",
-                    "description": "General reasoning and question answering",
-                    "nodes": ["reasoning"],
-                    "model": "gemini-2.0-flash-exp"
-                },
-                {
-                    "name": "analysis_agent", 
-                    "description": "Detailed analysis with structured output",
-                    "nodes": ["analysis"],
-                    "model": "gemini-2.0-flash-exp"
-                },
-                {
-                    "name": "creative_agent",
-                    "description": "Creative content generation",
-                    "nodes": ["creative"],
-                    "model": "gemini-2.0-flash-exp"
-                }
-            ],
-            "total_workflows": 3,
-            "server_version": "1.0.0"
-        }
-        
-        return GetResourceResult(
-            contents=[TextContent(type="text", text=json.dumps(info, indent=2))]
-        )
+    # The server passes a parsed AnyUrl; compare by its string form
+    uri = str(uri)
+    static = _STATIC_RESOURCES.get(uri)
+    if static is not None:
+        return static
     
-    elif uri == "langgraph://graphs/structure":
-        structure = {
-            "reasoning_graph": {
-                "entry_point": "reasoning",
-                "finish_point": "reasoning",
-                "nodes": ["reasoning"],
-                "edges": []
-            },
-            "analysis_graph": {
-                "entry_point": "analysis",
-                "finish_point": "analysis", 
-                "nodes": ["analysis"],
-                "edges": []
-            },
-            "creative_graph": {
-                "entry_point": "creative",
-                "finish_point": "creative",
-                "nodes": ["creative"],
-                "edges": []
-            }
-        }
-        
-        return GetResourceResult(
-            contents=[TextContent(type="text", text=json.dumps(structure, indent=2))]
-        )
+    if uri == "langgraph://cache/stats":
+        stats = {**cache_stats, "size": len(_llm_cache), "max_size": LLM_CACHE_MAX, "ttl_seconds": LLM_CACHE_TTL}
+        return json.dumps(stats, indent=2)
     
+    return f"Resource not found: {uri}"
+
+# Warm the Gemini chat and embeddings connections at startup (set LG_MCP_WARMUP=0 to skip)
+WARMUP = os.getenv("LG_MCP_WARMUP", "1") != "0"
+
+async def warm_up():
+    """Open the chat and embeddings connections so the first tool call doesn't pay for DNS, TLS and auth"""
+    results = await asyncio.gather(llm.ainvoke("ping"), embeddings.aembed_query("ping"), return_exceptions=True)
+    failures = [r for r in results if isinstance(r, Exception)]
+    if failures:
+        log.info("Warm-up incomplete: %s", failures[0])
     else:
-        return GetResourceResult(
-            contents=[TextContent(type="text", text=f"Resource not found: {uri}")]
-        )
+        log.info("Gemini connections warmed up")
 
 async def main():
     """Main function to start the MCP server"""
-    global reasoning_graph, analysis_graph, creative_graph
+    listener = enable_stderr_log()
     
-    # Initialize LangGraph workflows
-    print("🚀 Initializing LangGraph workflows...")
-    reasoning_graph = create_reasoning_graph()
-    analysis_graph = create_analysis_graph()
-    creative_graph = create_creative_graph()
-    print("✅ LangGraph workflows compiled successfully!")
+    # LangGraph workflows are compiled at import
+    log.info("LangGraph workflows compiled successfully")
     
     # Start MCP server
-    print("🌟 Starting LangGraph MCP Server...")
-    print("📡 Server provides 3 tools: reasoning_agent, analysis_agent, creative_agent")
-    print("📚 Server provides 2 resources: workflow info and graph structure")
+    log.info("Starting LangGraph MCP Server...")
+    log.info("Server provides 5 tools: reasoning_agent, analysis_agent, creative_agent, smart_agent, batch_agent")
+    log.info("Server provides 3 resources: workflow info, graph structure and cache stats")
     
-    async with stdio_server() as (read_stream, write_stream):
-        await server.run(
-            read_stream,
-            write_stream,
-            InitializationOptions(
-                server_name="langgraph-mcp-server",
-                server_version="1.0.0",
-                capabilities=server.get_capabilities(
-                    notification_options=NotificationOptions(),
-                    experimental_capabilities={}
+    # Runs alongside the MCP handshake instead of delaying it
+    warmup_task = asyncio.create_task(warm_up()) if WARMUP else None
+    
+    try:
+        async with stdio_server() as (read_stream, write_stream):
+            await server.run(
+                read_stream,
+                write_stream,
+                InitializationOptions(
+                    server_name="langgraph-mcp-server",
+                    server_version="1.0.0",
+                    capabilities=server.get_capabilities(
+                        notification_options=NotificationOptions(),
+                        experimental_capabilities={}
+                    )
                 )
             )
-        )
+    finally:
+        if warmup_task is not None:
+            warmup_task.cancel()
+        listener.stop()
 
 if __name__ == "__main__":
     asyncio.run(main())
@@ -7,13 +7,14 @@ This demonstrates how to interact with MCP tools and resources
 import asyncio
 import json
 from typing import Any, Dict, List
+from contextlib import AsyncExitStack
 from mcp.client.session import ClientSession
-from mcp.client.stdio import stdio_client
+from mcp.client.stdio import StdioServerParameters, stdio_client
 from rich.console import Console
 from rich.table import Table
 from rich.panel import Panel
 from rich.progress import Progress, SpinnerColumn, TextColumn
-import subprocess
+import os
 import sys
 
 console = Console()
@@ -21,39 +22,25 @@ console = Console()
 class LangGraphMCPClient:
     def __init__(self):
         self.session = None
-        self.server_process = None
-    
-    async def start_server(self):
-        """Start the MCP server as a subprocess"""
-        try:
-            console.print("🚀 [cyan]Starting LangGraph MCP Server...[/cyan]")
-            self.server_process = subprocess.Popen(
-                [sys.executable, "p4_step4_1_langgraph_mcp_server.py"],
-                stdin=subprocess.PIPE,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE
-            )
-            
-            # Give server time to start
-            await asyncio.sleep(2)
-            console.print("✅ [green]Server started successfully![/green]")
-            
-        except Exception as e:
-            console.print(f"❌ [red]Failed to start server: {e}[/red]")
-            raise
+        # Owns the server subprocess (via stdio_client) and the session; close() unwinds both
+        self._exit_stack = AsyncExitStack()
     
     async def connect(self):
-        """Connect to the MCP server"""
+        """Start the MCP server as a subprocess and connect to it over stdio"""
         try:
-            console.print("🔗 [cyan]Connecting to MCP server...[/cyan]")
-            
-            # Connect via stdio
-            read_stream, write_stream = await stdio_client(self.server_process)
+            console.print("🚀 [cyan]Starting LangGraph MCP Server...[/cyan]")
             
-            # Create session
-            self.session = ClientSession(read_stream, write_stream)
+            # stdio_client spawns the server and yields its streams once the pipes are wired,
+            # so initialize() below doubles as the readiness check
+            server_params = StdioServerParameters(
+                command=sys.executable,
+                args=["p4_step4_1_langgraph_mcp_server.py"],
+                env=dict(os.environ)
+            )
+            read_stream, write_stream = await self._exit_stack.enter_async_context(stdio_client(server_params))
             
-            # Initialize the session
+            # Create and initialize the session
+            self.session = await self._exit_stack.enter_async_context(ClientSession(read_stream, write_stream))
             await self.session.initialize()
             
             console.print("✅ [green]Connected to MCP server![/green]")
@@ -102,6 +89,16 @@ class LangGraphMCPClient:
         except Exception as e:
             return f"Error calling tool: {e}"
     
+    async def call_tools_batch(self, calls: List[Dict[str, Any]]) -> List[str]:
+        """Run several tool calls concurrently through the server's batch_agent tool"""
+        result = await self.call_tool("batch_agent", {"calls": calls})
+        
+        try:
+            return [item["result"] for item in json.loads(result)]
+        except (json.JSONDecodeError, TypeError, KeyError):
+            # call_tool returned an error message instead of the JSON list
+            return [result] * len(calls)
+    
     async def read_resource(self, uri: str) -> str:
         """Read a resource from the MCP server"""
         if not self.session:
@@ -119,29 +116,22 @@ class LangGraphMCPClient:
             return f"Error reading resource: {e}"
     
     async def close(self):
-        """Close the connection and stop the server"""
-        if self.session:
-            await self.session.close()
-        
-        if self.server_process:
-            self.server_process.terminate()
-            try:
-                await asyncio.wait_for(asyncio.create_task(
-                    asyncio.to_thread(self.server_process.wait)
-                ), timeout=5.0)
-            except asyncio.TimeoutError:
-                self.server_process.kill()
+        """Close the session and stop the server"""
+        self.session = None
+        await self._exit_stack.aclose()
 
 async def test_mcp_server():
     """Test the MCP server functionality"""
     client = LangGraphMCPClient()
+    # One live spinner region for the whole run; each call adds and removes its own task
+    progress = Progress(SpinnerColumn(), TextColumn("[progress.description]{task.description}"), console=console)
+    progress.start()
     
     try:
         console.print("🧪 [bold cyan]Testing LangGraph MCP Server[/bold cyan]")
         console.print()
         
         # Start server and connect
-        await client.start_server()
         await client.connect()
         
         # Test 1: List Tools
@@ -202,14 +192,16 @@ async def test_mcp_server():
             }
         ]
         
-        for i, test_case in enumerate(test_cases, 1):
+        # One batch_agent call runs all test cases concurrently on the server
+        task = progress.add_task(f"Calling {len(test_cases)} tools concurrently...", total=None)
+        results = await client.call_tools_batch(
+            [{"name": test_case["tool"], "arguments": test_case["args"]} for test_case in test_cases]
+        )
+        progress.remove_task(task)
+        
+        for i, (test_case, result) in enumerate(zip(test_cases, results), 1):
             console.print(f"\n📤 [blue]Test {i}:[/blue] {test_case['description']}")
             
-            with Progress(SpinnerColumn(), TextColumn("[progress.description]{task.description}")) as progress:
-                task = progress.add_task(f"Calling {test_case['tool']}...", total=None)
-                result = await client.call_tool(test_case["tool"], test_case["args"])
-                progress.update(task, completed=True)
-            
             console.print(Panel(
                 result,
                 title=f"🤖 {test_case['tool']} Response",
@@ -223,16 +215,16 @@ async def test_mcp_server():
         
         resource_uris = [
             "langgraph://workflows/info",
-            "langgraph://graphs/structure"
+            "langgraph://graphs/structure",
+            "langgraph://cache/stats"
         ]
         
         for uri in resource_uris:
             console.print(f"\n📖 [blue]Reading:[/blue] {uri}")
             
-            with Progress(SpinnerColumn(), TextColumn("[progress.description]{task.description}")) as progress:
-                task = progress.add_task("Reading resource...", total=None)
-                content = await client.read_resource(uri)
-                progress.update(task, completed=True)
+            task = progress.add_task("Reading resource...", total=None)
+            content = await client.read_resource(uri)
+            progress.remove_task(task)
             
             try:
                 # Try to parse as JSON for better formatting
@@ -254,6 +246,7 @@ async def test_mcp_server():
         console.print(f"❌ [red]Test failed: {e}[/red]")
     
     finally:
+        progress.stop()
         await client.close()
 
 async def interactive_mcp_chat():
@@ -273,7 +266,6 @@ async def interactive_mcp_chat():
         console.print()
         
         # Start server and connect
-        await client.start_server()
         await client.connect()
         
         while True:
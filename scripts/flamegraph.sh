@@ -0,0 +1,12 @@
+#!/usr/bin/env bash
+# Record a flamegraph of the batch path with py-spy.
+# Usage: scripts/flamegraph.sh prompts.txt [module] [output.svg]
+set -euo pipefail
+
+PROMPTS="${1:?usage: scripts/flamegraph.sh prompts.txt [module] [output.svg]}"
+MODULE="${2:-p2_step2_2_tool_integration}"
+OUTPUT="${3:-flame.svg}"
+
+cd "$(dirname "$0")/.."
+py-spy record -o "$OUTPUT" -- python scripts/profile_graph.py "$PROMPTS" "$MODULE"
+echo "🔥 Flamegraph written to $OUTPUT"
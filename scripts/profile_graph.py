@@ -0,0 +1,44 @@
+"""
+Profile a graph's batch path with cProfile.
+
+Usage:
+    python scripts/profile_graph.py prompts.txt [module] [output]
+
+`module` is any step file exposing run_batch() and load_prompts()
+(default: p2_step2_2_tool_integration). Stats are written to
+profile.pstats and the top entries are printed by cumulative time.
+"""
+import asyncio
+import cProfile
+import importlib
+import pstats
+import sys
+from pathlib import Path
+
+# Step files live in the repository root
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+def main():
+    if len(sys.argv) < 2:
+        print(__doc__)
+        sys.exit(1)
+
+    prompts_path = sys.argv[1]
+    module_name = sys.argv[2] if len(sys.argv) > 2 else "p2_step2_2_tool_integration"
+    output = sys.argv[3] if len(sys.argv) > 3 else "profile.pstats"
+
+    module = importlib.import_module(module_name)
+    prompts = module.load_prompts(prompts_path)
+
+    cProfile.runctx(
+        "asyncio.run(module.run_batch(prompts))",
+        globals(),
+        {"asyncio": asyncio, "module": module, "prompts": prompts},
+        output,
+    )
+
+    print(f"📊 Profile written to {output}")
+    pstats.Stats(output).sort_stats("cumulative").print_stats(25)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+# Semantic response cache shared by the phase 3 agents.
+# Wraps a chat model so prompts that are near-duplicates of an earlier one
+# (same system instructions, similar variable text) are answered from memory.
+from langchain_google_genai import GoogleGenerativeAIEmbeddings
+from collections import deque
+import math
+import os
+import re
+
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.92"))
+
+# Numbers must match exactly for a hit: "15 * 23" and "15 * 24" embed almost identically
+_NUMBER_RE = re.compile(r"\d+(?:\.\d+)?")
+
+def _normalize(vector: list[float]) -> list[float]:
+    norm = math.sqrt(sum(x * x for x in vector)) or 1.0
+    return [x / norm for x in vector]
+
+def _split_prompt(prompt, cache_key: str | None = None, cache_scope: str | None = None) -> tuple[str, str]:
+    """Split a prompt into its static prefix (system messages) and the variable text to embed.
+    cache_key, when given, is embedded instead of the last message (e.g. just the user's question).
+    cache_scope, when given, is part of the prefix, so entries only match within that scope (e.g. a session)."""
+    if isinstance(prompt, str):
+        prefix, text = "", cache_key or prompt
+    else:
+        prefix = "\n".join(msg.content for msg in prompt if msg.type == "system")
+        text = cache_key or prompt[-1].content
+    if cache_scope is not None:
+        prefix = f"{cache_scope}\x00{prefix}"
+    return prefix, text
+
+class CachedLLM:
+    """Chat model wrapper that serves near-identical prompts from a semantic cache"""
+
+    def __init__(self, llm, threshold: float = SEMANTIC_CACHE_THRESHOLD, maxlen: int = 256, embeddings=None):
+        self.llm = llm
+        self.threshold = threshold
+        # Pass embeddings to share one embeddings client (and its connections) between caches
+        self.embeddings = embeddings or GoogleGenerativeAIEmbeddings(model="models/text-embedding-004")
+        self._entries = deque(maxlen=maxlen)
+
+    def _lookup(self, prefix: str, text: str, vector: list[float]):
+        numbers = _NUMBER_RE.findall(text)
+        for cached_prefix, cached_numbers, cached_vector, response in self._entries:
+            if cached_prefix != prefix or cached_numbers != numbers:
+                continue
+            if sum(a * b for a, b in zip(vector, cached_vector)) >= self.threshold:
+                return response
+        return None
+
+    def _store(self, prefix: str, text: str, vector: list[float], response):
+        self._entries.append((prefix, _NUMBER_RE.findall(text), vector, response))
+
+    def invoke(self, prompt, *, cache_key: str | None = None, cache_scope: str | None = None, **kwargs):
+        prefix, text = _split_prompt(prompt, cache_key, cache_scope)
+        vector = _normalize(self.embeddings.embed_query(text))
+        cached = self._lookup(prefix, text, vector)
+        if cached is not None:
+            return cached
+        response = self.llm.invoke(prompt, **kwargs)
+        self._store(prefix, text, vector, response)
+        return response
+
+    async def ainvoke(self, prompt, *, cache_key: str | None = None, cache_scope: str | None = None, **kwargs):
+        prefix, text = _split_prompt(prompt, cache_key, cache_scope)
+        vector = _normalize(await self.embeddings.aembed_query(text))
+        cached = self._lookup(prefix, text, vector)
+        if cached is not None:
+            return cached
+        response = await self.llm.ainvoke(prompt, **kwargs)
+        self._store(prefix, text, vector, response)
+        return response
+
+    async def astream(self, prompt, *, cache_key: str | None = None, cache_scope: str | None = None, **kwargs):
+        """Stream the response; a cache hit arrives as a single chunk"""
+        prefix, text = _split_prompt(prompt, cache_key, cache_scope)
+        vector = _normalize(await self.embeddings.aembed_query(text))
+        cached = self._lookup(prefix, text, vector)
+        if cached is not None:
+            yield cached
+            return
+        response = None
+        async for chunk in self.llm.astream(prompt, **kwargs):
+            response = chunk if response is None else response + chunk
+            yield chunk
+        if response is not None:
+            self._store(prefix, text, vector, response)
+
+    def __getattr__(self, name):
+        # Anything else (stream, bind_tools, ...) goes straight to the wrapped model
+        return getattr(self.llm, name)
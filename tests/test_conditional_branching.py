@@ -0,0 +1,27 @@
+import os
+
+import pytest
+
+# The module builds its Gemini client at import; keyword-rule inputs never reach it
+os.environ.setdefault("GOOGLE_API_KEY", "test-key")
+
+from p2_step2_3_conditional_branching import _classify
+
+
+@pytest.mark.parametrize("text", [
+    "how do i write a cover letter",
+    "how can i write a sql join",
+    "how do i write a haiku",
+])
+def test_how_to_write_is_help(text):
+    intent, _, reason = _classify(text)
+    assert (intent, reason) == ("HELP", "keyword match")
+
+
+@pytest.mark.parametrize("text", [
+    "write me a poem about rain",
+    "tell me a short story",
+])
+def test_creative_forms_are_creative(text):
+    intent, _, reason = _classify(text)
+    assert (intent, reason) == ("CREATIVE", "keyword match")